@@ -0,0 +1,318 @@
+"""
+Embedding and chat-model backends for bot.py and build_index.py.
+
+Selected with environment variables (all optional):
+  VEHS_BACKEND      openai (default) | local   -- default for both kinds below
+  VEHS_EMBEDDINGS   openai | hashing | sentence-transformers
+  VEHS_LLM          openai | extractive
+  VEHS_EMBEDDING_MODEL / VEHS_CHAT_MODEL   model names for the openai and
+                    sentence-transformers backends
+
+The local backends make no network calls:
+  - HashingEmbeddings: word unigram/bigram feature hashing into a fixed-size,
+    L2-normalized vector (deterministic across processes and machines).
+  - sentence-transformers: a local sentence embedding model (optional dependency).
+  - ExtractiveChatModel: answers the bot's two prompts without a model, by
+    rule-based filter extraction and a templated, extractive Markdown answer
+    built from the analytics and snippets in the prompt.
+
+An index must be queried with the embedder it was built with; build_index.py
+records embedding_signature() next to the FAISS files and bot.py checks it.
+"""
+import json
+import os
+import re
+import threading
+import zlib
+from collections import OrderedDict
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+import telemetry
+
+DEFAULT_EMBEDDING_MODEL = "text-embedding-3-small"
+DEFAULT_CHAT_MODEL = "gpt-4o-mini"
+DEFAULT_SENTENCE_MODEL = "all-MiniLM-L6-v2"
+SIGNATURE_FILE = "embeddings.json"
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_ISO_DATE_RE = re.compile(r"\b(\d{4}-\d{2}-\d{2})\b")
+_SNIPPET_RE = re.compile(r"^\[([^\]:]*):([^\]]*)\]\s*(.*)$")
+_HAZARD_RE = re.compile(r"'hazard': '([^']*)', 'count': (\d+)")
+# Rows of prompt_context.analytics_table: | rank | hazard | count | ...
+_HAZARD_ROW_RE = re.compile(r"^\| *\d+ *\| *([^|]+?) *\| *(\d+) *\|", re.MULTILINE)
+
+
+def _backend_setting(kind: str) -> str:
+    local_default = {"VEHS_EMBEDDINGS": "hashing", "VEHS_LLM": "extractive"}[kind]
+    default = local_default if os.getenv("VEHS_BACKEND", "openai").lower() == "local" else "openai"
+    return os.getenv(kind, default).lower()
+
+
+def needs_openai_key() -> bool:
+    """True when the configured embeddings or chat model call the OpenAI API"""
+    return "openai" in (_backend_setting("VEHS_EMBEDDINGS"), _backend_setting("VEHS_LLM"))
+
+
+# ---------- Embeddings ----------
+
+class HashingEmbeddings(Embeddings):
+    """Feature-hashed bag of word unigrams and bigrams; no model, no network"""
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+
+    def _embed(self, text: str) -> List[float]:
+        tokens = _TOKEN_RE.findall((text or "").lower())
+        grams = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        vec = np.zeros(self.dim, dtype=np.float32)
+        if grams:
+            # crc32 rather than hash(): Python's string hash is salted per process
+            h = np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint32, count=len(grams))
+            np.add.at(vec, h % self.dim, np.where(h >> 31, -1.0, 1.0).astype(np.float32))
+            vec = np.sign(vec) * np.log1p(np.abs(vec))
+            norm = np.linalg.norm(vec)
+            if norm > 0:
+                vec /= norm
+        return vec.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+class SentenceEmbeddings(Embeddings):
+    """Local sentence-transformers model (pip install sentence-transformers)"""
+
+    def __init__(self, model_name: str = DEFAULT_SENTENCE_MODEL):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ImportError(
+                "VEHS_EMBEDDINGS=sentence-transformers needs the sentence-transformers package"
+            ) from e
+        self.model_name = model_name
+        self.model = SentenceTransformer(model_name)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.model.encode(list(texts), normalize_embeddings=True).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+class CachedQueryEmbeddings(Embeddings):
+    """LRU cache in front of embed_query; calls and cache hits are reported to telemetry"""
+
+    def __init__(self, inner: Embeddings, maxsize: int = 256):
+        self.inner = inner
+        self.maxsize = maxsize
+        self._cache: "OrderedDict[str, List[float]]" = OrderedDict()
+        # Shared by concurrent requests (Streamlit sessions, batch workers)
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        telemetry.record_embedding(texts)
+        return self.inner.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        vector = self._lookup([text]).get(text)
+        telemetry.record_cache(vector is not None)
+        if vector is not None:
+            return vector
+        telemetry.record_embedding([text])
+        vector = self.inner.embed_query(text)
+        self._store({text: vector})
+        return vector
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embed many queries with one request for the uncached ones; later embed_query calls hit the cache"""
+        vectors = self._lookup(texts)
+        missing = [t for t in dict.fromkeys(texts) if t not in vectors]
+        for text in texts:
+            telemetry.record_cache(text in vectors)
+        if missing:
+            telemetry.record_embedding(missing)
+            new = dict(zip(missing, self.inner.embed_documents(missing)))
+            self._store(new)
+            vectors.update(new)
+        # Built from this call's own lookups: storing may already have evicted some of them
+        return [vectors[t] for t in texts]
+
+    def _lookup(self, texts: List[str]) -> Dict[str, List[float]]:
+        with self._lock:
+            found = {}
+            for text in texts:
+                if text in self._cache:
+                    self._cache.move_to_end(text)
+                    found[text] = self._cache[text]
+            return found
+
+    def _store(self, vectors: Dict[str, List[float]]):
+        with self._lock:
+            for text, vector in vectors.items():
+                self._cache[text] = vector
+                self._cache.move_to_end(text)
+            while len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+
+
+def get_embeddings() -> Embeddings:
+    backend = _backend_setting("VEHS_EMBEDDINGS")
+    if backend == "hashing":
+        return HashingEmbeddings()
+    if backend == "sentence-transformers":
+        return SentenceEmbeddings(os.getenv("VEHS_EMBEDDING_MODEL", DEFAULT_SENTENCE_MODEL))
+    if backend == "openai":
+        from langchain_openai import OpenAIEmbeddings
+        return OpenAIEmbeddings(model=os.getenv("VEHS_EMBEDDING_MODEL", DEFAULT_EMBEDDING_MODEL))
+    raise ValueError(f"Unknown VEHS_EMBEDDINGS backend '{backend}'")
+
+
+def embedding_signature(embeddings: Embeddings) -> Dict[str, Any]:
+    """What an index was built with; queries must use an embedder with the same signature"""
+    if isinstance(embeddings, CachedQueryEmbeddings):
+        return embedding_signature(embeddings.inner)
+    if isinstance(embeddings, HashingEmbeddings):
+        return {"backend": "hashing", "dim": embeddings.dim}
+    if isinstance(embeddings, SentenceEmbeddings):
+        return {"backend": "sentence-transformers", "model": embeddings.model_name}
+    return {"backend": type(embeddings).__name__, "model": getattr(embeddings, "model", None)}
+
+
+def write_signature(embeddings: Embeddings, index_dir: str):
+    with open(os.path.join(index_dir, SIGNATURE_FILE), "w", encoding="utf-8") as f:
+        json.dump(embedding_signature(embeddings), f)
+
+
+def read_signature(index_dir: str) -> Optional[Dict[str, Any]]:
+    path = os.path.join(index_dir, SIGNATURE_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+# ---------- Extractive answerer ----------
+
+def _relative_range(ql: str, today: date) -> Dict[str, str]:
+    """Date filters for phrases like 'last quarter', 'last month', 'this year'"""
+    if "last quarter" in ql or "previous quarter" in ql:
+        q_start = date(today.year, 3 * ((today.month - 1) // 3) + 1, 1)
+        end = q_start - timedelta(days=1)
+        start = date(end.year, 3 * ((end.month - 1) // 3) + 1, 1)
+    elif "last month" in ql or "previous month" in ql:
+        end = today.replace(day=1) - timedelta(days=1)
+        start = end.replace(day=1)
+    elif "last year" in ql or "previous year" in ql:
+        start, end = date(today.year - 1, 1, 1), date(today.year - 1, 12, 31)
+    elif "this year" in ql:
+        start, end = date(today.year, 1, 1), today
+    elif "this month" in ql:
+        start, end = today.replace(day=1), today
+    else:
+        return {}
+    return {"start_date": start.isoformat(), "end_date": end.isoformat()}
+
+
+def extract_filters(text: str, vocabulary: Optional[Dict[str, Iterable[str]]] = None,
+                    today: Optional[date] = None) -> Dict[str, str]:
+    """Rule-based location/department/date filters from a question.
+
+    vocabulary maps a filter key ('location', 'department') to the values that
+    occur in the data; a value is picked when it appears as a whole word in the
+    text (longest match wins).
+    """
+    filters: Dict[str, str] = {}
+    ql = (text or "").lower()
+    for key, values in (vocabulary or {}).items():
+        matches = [v for v in values if v and re.search(rf"\b{re.escape(v.lower())}\b", ql)]
+        if matches:
+            filters[key] = max(matches, key=len)
+    dates = _ISO_DATE_RE.findall(text or "")
+    if dates:
+        filters["start_date"] = min(dates)
+        if len(dates) > 1:
+            filters["end_date"] = max(dates)
+    else:
+        filters.update(_relative_range(ql, today or date.today()))
+    return filters
+
+
+def _overlap(query_tokens: set, text: str) -> float:
+    tokens = set(_TOKEN_RE.findall(text.lower()))
+    return len(query_tokens & tokens) / (1 + len(tokens)) ** 0.5
+
+
+def extractive_answer(prompt: str) -> str:
+    """Templated Markdown answer from the sections of a synthesis prompt"""
+    question = ""
+    for line in prompt.splitlines():
+        if line.startswith(("User question:", "Question:")):
+            question = line.split(":", 1)[1].strip()
+            break
+    query_tokens = set(_TOKEN_RE.findall(question.lower()))
+    snippets = [m.groups() for m in map(_SNIPPET_RE.match, prompt.splitlines()) if m]
+    hazards = [(name, int(count)) for name, count in _HAZARD_ROW_RE.findall(prompt) or _HAZARD_RE.findall(prompt)]
+
+    ranked = sorted(snippets, key=lambda s: -_overlap(query_tokens, s[2]))
+    sheets: Dict[str, int] = {}
+    for sheet, _, _ in snippets:
+        sheets[sheet] = sheets.get(sheet, 0) + 1
+
+    summary = f"Based on {len(snippets)} retrieved records"
+    if hazards:
+        top = ", ".join(f"{name} ({count})" for name, count in hazards[:3])
+        summary += f", the most frequent hazard themes are {top}"
+    summary += "."
+    if ranked:
+        summary += f" The closest match is [{ranked[0][0]}:{ranked[0][1]}]: {ranked[0][2][:160]}"
+
+    lines = ["### Summary", summary, "", "### Context overview"]
+    by_sheet = ", ".join(f"{sheet} ({n})" for sheet, n in sheets.items()) or "no records"
+    lines.append(f"Retrieved {len(snippets)} items from {by_sheet}.")
+    lines += ["", "### Data insights"]
+    lines += [f"- [{sheet}:{rid}] {text[:200]}" for sheet, rid, text in ranked[:5]] or ["- No matching records."]
+    if hazards:
+        lines += ["", "### Details"]
+        lines += [f"{i}. {name}: {count} findings" for i, (name, count) in enumerate(hazards, 1)]
+    if snippets:
+        lines += ["", "### Citations", ", ".join(f"[{sheet}:{rid}]" for sheet, rid, _ in snippets)]
+    return "\n".join(lines)
+
+
+class ExtractiveChatModel(BaseChatModel):
+    """Chat model stand-in that answers bot.py's prompts without calling a model"""
+    filter_vocabulary: Dict[str, List[str]] = {}
+
+    @property
+    def _llm_type(self) -> str:
+        return "vehs-extractive"
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        system = "\n".join(str(m.content) for m in messages if m.type == "system")
+        human = "\n".join(str(m.content) for m in messages if m.type == "human")
+        if "Extract optional filters" in system:
+            content = json.dumps(extract_filters(human, self.filter_vocabulary))
+        else:
+            content = extractive_answer(human)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=content))])
+
+
+def get_chat_model(filter_vocabulary: Optional[Dict[str, List[str]]] = None) -> BaseChatModel:
+    backend = _backend_setting("VEHS_LLM")
+    if backend == "extractive":
+        return ExtractiveChatModel(filter_vocabulary=filter_vocabulary or {})
+    if backend == "openai":
+        from langchain_openai import ChatOpenAI
+        return ChatOpenAI(model=os.getenv("VEHS_CHAT_MODEL", DEFAULT_CHAT_MODEL), temperature=0.2)
+    raise ValueError(f"Unknown VEHS_LLM backend '{backend}'")
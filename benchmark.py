@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark suite for the VEHS bot.
+
+Generates a synthetic processed dataset (synthetic_data.make_processed_sheets)
+and times the hot paths against the local backends from backends.py (hashing
+embeddings, extractive answerer), so no OpenAI key or network is involved:
+  - build_index:      to_docs + FAISS build (build_index.py), with the per-sheet
+                      document templates and with full row dumps (build_index_legacy)
+  - hazard_analytics: bot.hazard_analytics over a rotating set of filters
+  - retrieve_docs:    bot.retrieve_docs (FAISS similarity search), with multi-query
+                      retrieval (retrieval.py) and as a single search
+  - chunking:         long rows as overlapping passages vs truncated at 800 chars:
+                      vectors, index size, build time, and the hit rate of queries
+                      taken from the end of long records (a top-k result contains the text)
+  - rerank:           retrieval.rerank alone on over-fetched candidate sets, and
+                      bot.retrieve_docs with the reranker switched off
+  - synthesis:        bot.synthesize_answer with the compact, token-budgeted
+                      context (prompt_context.py) vs the old dict-repr context
+  - fast_path:        bot.app.invoke on ranking questions the router answers
+                      from analytics alone (no LLM, no vector search)
+  - graph:            bot.app.invoke end to end
+
+Each run appends one JSON line to the results file with p50/p95 latency,
+throughput and peak RSS per benchmark plus the workload settings, so runs
+can be compared over time.
+
+Usage:
+  python benchmark.py                                   # 2000 rows per sheet
+  python benchmark.py --rows 20000 --tag-mix "PPE Compliance=3,LOPC/Leakage=1" --only hazard_analytics
+  python benchmark.py --llm-latency-ms 800 --embed-latency-ms 50   # simulate remote backends
+  python benchmark.py --only synthesis --llm-ms-per-1k-tokens 400  # prompt size vs latency
+"""
+import os
+# bot.py builds its backends at import time; use the offline ones
+os.environ["VEHS_BACKEND"] = "local"
+os.environ.pop("VEHS_EMBEDDINGS", None)
+os.environ.pop("VEHS_LLM", None)
+os.environ.setdefault("KMP_DUPLICATE_LIB_OK", "TRUE")
+
+import itertools
+import json
+import platform
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+import backends
+import data_store
+import prompt_context
+import retrieval
+import synthetic_data
+import telemetry
+from vehs_pipeline import peak_rss_mb
+
+RESULTS_PATH = "benchmark_results.jsonl"
+BENCHMARKS = ["build_index", "chunking", "hazard_analytics", "retrieve_docs", "rerank", "synthesis", "fast_path", "graph"]
+
+QUESTIONS = [
+    "What are the most concerned hazards and what steps should we take to avoid it turning into an incident?",
+    "Which PPE issues keep coming up in audit findings?",
+    "Summarize recent leak and LOPC findings.",
+    "What did inspections find about housekeeping?",
+    "List open incidents involving permits.",
+    "What PPE issues show up in incidents and what did audits find about permits?",
+]
+
+# Questions bot.classify_intent routes to the no-LLM analytics answer
+ANALYTICS_QUESTIONS = [
+    "Top hazards last quarter?",
+    "Which hazards are most common and how do we prevent them?",
+    "How many PPE findings this year?",
+]
+
+
+
+class SlowHashingEmbeddings(backends.HashingEmbeddings):
+    """Hashing embedder with a simulated per-request latency (remote embedding API)"""
+
+    def __init__(self, dim: int, latency: float = 0.0):
+        super().__init__(dim)
+        self.latency = latency
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.latency:
+            time.sleep(self.latency)
+        return super().embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        if self.latency:
+            time.sleep(self.latency)
+        return super().embed_query(text)
+
+
+class SlowExtractiveChatModel(backends.ExtractiveChatModel):
+    """Extractive answerer with a simulated per-call latency (remote LLM), optionally growing with prompt size"""
+    latency: float = 0.0
+    latency_per_1k_tokens: float = 0.0
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        delay = self.latency
+        if self.latency_per_1k_tokens:
+            delay += self.latency_per_1k_tokens * sum(telemetry.count_tokens(str(m.content)) for m in messages) / 1000
+        if delay:
+            time.sleep(delay)
+        return super()._generate(messages, stop, run_manager, **kwargs)
+
+
+def parse_tag_mix(spec: Optional[str]) -> Optional[Dict[str, float]]:
+    """'PPE Compliance=3,LOPC/Leakage=1' -> {'PPE Compliance': 3.0, 'LOPC/Leakage': 1.0}"""
+    if not spec:
+        return None
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in synthetic_data.TAG_PHRASES:
+            raise ValueError(f"Unknown tag '{name}'; choose from {sorted(synthetic_data.TAG_PHRASES)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def filter_sets(sheets: Dict[str, pd.DataFrame], date_start: Optional[str], date_span_days: int) -> List[Dict[str, Any]]:
+    """A rotating mix of no filter, location, department and date-range filters"""
+    hazards = sheets.get("Hazard ID", pd.DataFrame())
+    filters: List[Dict[str, Any]] = [{}]
+    for col in ["location", "department"]:
+        if col in hazards.columns:
+            filters += [{col: str(v)} for v in hazards[col].dropna().astype(str).unique()[:3]]
+    start = pd.Timestamp(date_start) if date_start else hazards.get("occurrence_date", pd.Series(dtype="datetime64[ns]")).min()
+    if pd.notna(start):
+        end = start + pd.Timedelta(days=max(date_span_days // 4, 1))
+        filters.append({"start_date": start.strftime("%Y-%m-%d"), "end_date": end.strftime("%Y-%m-%d")})
+    return filters
+
+
+def measure(fn: Callable[[Any], Any], inputs: List[Any], warmup: int = 1, items: Optional[int] = None) -> Dict[str, Any]:
+    """Latency percentiles and throughput of fn over inputs (after warmup calls)"""
+    for x in inputs[:warmup]:
+        fn(x)
+    latencies = []
+    start = time.perf_counter()
+    for x in inputs:
+        t = time.perf_counter()
+        fn(x)
+        latencies.append((time.perf_counter() - t) * 1000)
+    total = time.perf_counter() - start
+    ms = np.array(latencies)
+    result = {
+        "n": len(latencies),
+        "p50_ms": round(float(np.percentile(ms, 50)), 2),
+        "p95_ms": round(float(np.percentile(ms, 95)), 2),
+        "mean_ms": round(float(ms.mean()), 2),
+        "max_ms": round(float(ms.max()), 2),
+        "throughput_per_s": round(len(latencies) / total, 2) if total > 0 else None,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    if items is not None:
+        result["items"] = items
+        result["items_per_s"] = round(items * len(latencies) / total, 1) if total > 0 else None
+    return result
+
+
+def run_benchmarks(args) -> Dict[str, Any]:
+    tag_mix = parse_tag_mix(args.tag_mix)
+    selected = [b.strip() for b in args.only.split(",")] if args.only else BENCHMARKS
+
+    print(f"Generating {args.rows} rows per sheet...")
+    sheets = synthetic_data.make_processed_sheets(
+        args.rows, tag_mix=tag_mix, date_start=args.date_start,
+        date_span_days=args.date_span_days, seed=args.seed,
+    )
+    # Round-trip through the columnar store so the bot sees exactly what load_sheets gives it
+    with tempfile.TemporaryDirectory(prefix="vehs_bench_") as data_dir:
+        data_store.write_sheets(sheets, data_dir, source="synthetic")
+        sheets = data_store.load_sheets(data_dir, xlsx_path="")
+
+    import bot
+    import build_index
+
+    embeddings = SlowHashingEmbeddings(args.embedding_size, latency=args.embed_latency_ms / 1000)
+    bot.LLM = SlowExtractiveChatModel(filter_vocabulary=bot.filter_vocabulary(sheets),
+                                      latency=args.llm_latency_ms / 1000,
+                                      latency_per_1k_tokens=args.llm_ms_per_1k_tokens / 1000)
+    bot.EMB = embeddings
+    bot.SHEETS = sheets
+
+    docs = build_index.to_docs(sheets)
+    if args.index == "flat":
+        build = lambda: build_index.build_vector_store(build_index.to_docs(sheets), embeddings, verbose=False)
+        build_legacy = lambda: build_index.build_vector_store(build_index.to_docs(sheets, {}), embeddings, verbose=False)
+        bot.VSTORE = build_index.build_vector_store(docs, embeddings, verbose=False)
+        bot.RETRIEVER = bot.VSTORE.as_retriever(search_kwargs={"k": 6})
+    else:
+        build = lambda: build_index.build_partitions(build_index.to_docs(sheets), embeddings)
+        build_legacy = lambda: build_index.build_partitions(build_index.to_docs(sheets, {}), embeddings)
+        bot.VSTORE = retrieval.PartitionedStore(build_index.build_partitions(docs, embeddings))
+        bot.RETRIEVER = None
+
+    filters = filter_sets(sheets, args.date_start, args.date_span_days)
+    queries = [(QUESTIONS[i % len(QUESTIONS)], filters[i % len(filters)]) for i in range(args.iterations)]
+    results: Dict[str, Any] = {}
+
+    if "build_index" in selected:
+        print("Benchmarking build_index (document templates and full row dumps)...")
+        builds = [("build_index_legacy", {}, build_legacy), ("build_index", None, build)]
+        for label, templates, fn in builds:
+            layout = build_index.to_docs(sheets, templates)
+            tokens = [telemetry.count_tokens(d.page_content) for d in layout]
+            results[label] = measure(lambda _: fn(), list(range(args.index_repeats)), warmup=0, items=len(layout))
+            results[label]["tokens_per_doc"] = round(float(np.mean(tokens)), 1)
+            results[label]["embedding_tokens"] = int(sum(tokens))
+    if "chunking" in selected:
+        print("Benchmarking chunking (passages vs truncated rows)...")
+        chunked = build_index.to_docs(sheets)
+        # Queries from the last passage of long records: text a truncated document does not contain
+        tails = [d for d in chunked if d.metadata.get("chunks") and d.metadata["chunk"] == d.metadata["chunks"] - 1]
+        tails = tails[::max(1, len(tails) // args.iterations)][:args.iterations]
+        probes = [(d.metadata["source_sheet"], d.metadata["record_id"], " ".join(d.page_content.split()[-25:]))
+                  for d in tails]
+        for label, layout in [("index_truncated", build_index.to_docs(sheets, chunk=False)), ("index_chunked", chunked)]:
+            started = time.perf_counter()
+            store = retrieval.PartitionedStore(build_index.build_partitions(layout, embeddings))
+            build_s = time.perf_counter() - started
+            hits = 0
+            if probes:
+                vectors = embeddings.embed_documents([p[2] for p in probes])
+                for probe, found in zip(probes, store.search_by_vectors(vectors, bot.RETRIEVAL_K * retrieval.FETCH_MULTIPLIER)):
+                    top = retrieval.dedupe_hits([found])[:bot.RETRIEVAL_K]
+                    # Synthetic records reuse narratives, so a hit is any result holding the queried text
+                    hits += any(probe[2] in " ".join(d.page_content.split()) for d, _ in top)
+            results[label] = measure(lambda p: store.search_by_vectors(embeddings.embed_documents([p[2]]), bot.RETRIEVAL_K),
+                                     probes or [("", "", "probe")])
+            results[label].update({
+                "vectors": len(layout),
+                "index_mb": round(len(layout) * args.embedding_size * 4 / 2 ** 20, 2),
+                "build_s": round(build_s, 2),
+                "tail_hit_rate": round(hits / len(probes), 3) if probes else None,
+                "probes": len(probes),
+            })
+    if "hazard_analytics" in selected:
+        print("Benchmarking hazard_analytics...")
+        results["hazard_analytics"] = measure(lambda q: bot.hazard_analytics(q[1], top_n=6), queries)
+    if "retrieve_docs" in selected:
+        print("Benchmarking retrieve_docs (multi-query and single search)...")
+        multi_setting = bot.MULTI_QUERY
+        for label, multi in [("retrieve_docs_single", False), ("retrieve_docs", True)]:
+            bot.MULTI_QUERY = multi
+            sheets_seen: List[int] = []
+
+            def retrieve(q):
+                docs = bot.retrieve_docs({"query": q[0], "filters": q[1]})["retrieved"]
+                sheets_seen.append(len({(d.metadata or {}).get("source_sheet") for d in docs}))
+
+            results[label] = measure(retrieve, queries, warmup=0)
+            results[label]["sheets_per_result"] = round(float(np.mean(sheets_seen)), 2)
+        bot.MULTI_QUERY = multi_setting
+    if "rerank" in selected:
+        print("Benchmarking rerank (scoring alone, and retrieve_docs without it)...")
+        severity = {s: bot.record_severity(s) for s in sheets}
+        candidate_sets = []
+        for q, f in queries:
+            state = {"query": q, "filters": f}
+            vectors = embeddings.embed_documents(bot.retrieval_texts(state))
+            hits = retrieval.search_by_vectors(bot.VSTORE, vectors, retrieval.RERANK_CANDIDATES, bot.search_sheets(state))
+            candidate_sets.append((q, f, retrieval.dedupe_hits(hits)[:retrieval.RERANK_CANDIDATES]))
+        results["rerank"] = measure(lambda c: retrieval.rerank(c[0], c[2], c[1], severity), candidate_sets)
+        results["rerank"]["candidates_mean"] = round(float(np.mean([len(c[2]) for c in candidate_sets])), 1)
+        rerank_setting = bot.RERANK
+        bot.RERANK = False
+        results["retrieve_norerank"] = measure(lambda q: bot.retrieve_docs({"query": q[0], "filters": q[1]}), queries)
+        bot.RERANK = rerank_setting
+    if "synthesis" in selected:
+        print("Benchmarking synthesis (compact vs legacy context)...")
+        states = []
+        for q, f in queries[:args.graph_iterations]:
+            state = {"query": q, "filters": f, "analytics": bot.cached_hazard_analytics(f, top_n=6)}
+            state.update(bot.retrieve_docs(state))
+            states.append(state)
+        compact_setting = bot.COMPACT_CONTEXT
+        for label, compact in [("synthesis_legacy", False), ("synthesis", True)]:
+            bot.COMPACT_CONTEXT = compact
+            build = prompt_context.build_context if compact else prompt_context.legacy_context
+            tokens = [build(s["query"], s["analytics"] if bot.is_hazard_query(s["query"]) else None,
+                            s["retrieved"])["tokens"] for s in states]
+            results[label] = measure(bot.synthesize_answer, states)
+            results[label]["context_tokens_mean"] = round(float(np.mean(tokens)), 1)
+            results[label]["context_tokens_max"] = int(max(tokens))
+        bot.COMPACT_CONTEXT = compact_setting
+    thread_ids = itertools.count()
+    if "fast_path" in selected:
+        print("Benchmarking fast_path...")
+        fast_queries = [(ANALYTICS_QUESTIONS[i % len(ANALYTICS_QUESTIONS)], {}) for i in range(args.graph_iterations)]
+        results["fast_path"] = measure(
+            lambda q: bot.app.invoke({"query": q[0], "filters": {}, "metrics": []},
+                                     config={"configurable": {"thread_id": f"bench-{next(thread_ids)}"}}),
+            fast_queries,
+        )
+    if "graph" in selected:
+        print("Benchmarking graph...")
+        graph_queries = queries[:args.graph_iterations]
+
+        def invoke(q):
+            state = {"query": q[0], "filters": {}, "retrieved": [], "analytics": {}, "answer": "", "metrics": []}
+            final = bot.app.invoke(state, config={"configurable": {"thread_id": f"bench-{next(thread_ids)}"}})
+            node_ms.extend(final.get("metrics") or [])
+
+        node_ms: List[Dict[str, Any]] = []
+        results["graph"] = measure(invoke, graph_queries)
+        # Per-node breakdown from the graph's own telemetry records
+        by_node = pd.DataFrame(node_ms).groupby("node")["duration_ms"] if node_ms else None
+        if by_node is not None:
+            results["graph"]["nodes_p50_ms"] = by_node.median().round(2).to_dict()
+
+    return {
+        "created": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "workload": {
+            "rows_per_sheet": args.rows,
+            "docs": len(docs),
+            "tag_mix": tag_mix or "uniform",
+            "date_start": args.date_start,
+            "date_span_days": args.date_span_days,
+            "seed": args.seed,
+            "embedding_size": args.embedding_size,
+            "index": args.index,
+            "llm_latency_ms": args.llm_latency_ms,
+            "llm_ms_per_1k_tokens": args.llm_ms_per_1k_tokens,
+            "context_token_budget": prompt_context.CONTEXT_TOKEN_BUDGET,
+            "embed_latency_ms": args.embed_latency_ms,
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "results": results,
+    }
+
+
+def main(argv: Optional[list] = None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Benchmark VEHS bot hot paths on synthetic data")
+    parser.add_argument("--rows", type=int, default=2000, help="Rows per synthetic sheet (default: %(default)s)")
+    parser.add_argument("--tag-mix", help="Relative hazard tag weights, e.g. 'PPE Compliance=3,LOPC/Leakage=1'")
+    parser.add_argument("--date-start", help="Earliest synthetic record date (YYYY-MM-DD)")
+    parser.add_argument("--date-span-days", type=int, default=365)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--iterations", type=int, default=50, help="Calls per analytics/retrieval benchmark")
+    parser.add_argument("--graph-iterations", type=int, default=10, help="Full graph invocations")
+    parser.add_argument("--index-repeats", type=int, default=2, help="Full index builds to time")
+    parser.add_argument("--embedding-size", type=int, default=256)
+    parser.add_argument("--index", choices=["partitioned", "flat"], default="partitioned",
+                        help="Per-sheet FAISS partitions (as build_index.py writes) or one combined index")
+    parser.add_argument("--llm-latency-ms", type=float, default=0, help="Simulated latency per LLM call")
+    parser.add_argument("--llm-ms-per-1k-tokens", type=float, default=0,
+                        help="Extra simulated LLM latency per 1000 prompt tokens")
+    parser.add_argument("--embed-latency-ms", type=float, default=0, help="Simulated latency per embedding request")
+    parser.add_argument("--only", help=f"Comma-separated subset of {','.join(BENCHMARKS)}")
+    parser.add_argument("--output", default=RESULTS_PATH, help="JSON Lines results file (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    run = run_benchmarks(args)
+    with open(args.output, "a", encoding="utf-8") as f:
+        f.write(json.dumps(run, default=str) + "\n")
+
+    print(f"\n{'benchmark':<18}{'p50 ms':>10}{'p95 ms':>10}{'ops/s':>10}{'RSS MB':>10}")
+    for name, r in run["results"].items():
+        print(f"{name:<18}{r['p50_ms']:>10}{r['p95_ms']:>10}{r['throughput_per_s']:>10}{r['peak_rss_mb'] or '-':>10}")
+    if "synthesis" in run["results"] and "synthesis_legacy" in run["results"]:
+        before, after = run["results"]["synthesis_legacy"], run["results"]["synthesis"]
+        print(f"\nSynthesis context tokens: {before['context_tokens_mean']} -> {after['context_tokens_mean']} (mean), "
+              f"p50 {before['p50_ms']} -> {after['p50_ms']} ms")
+    if "build_index" in run["results"] and "build_index_legacy" in run["results"]:
+        before, after = run["results"]["build_index_legacy"], run["results"]["build_index"]
+        print(f"\nIndex tokens per doc: {before['tokens_per_doc']} -> {after['tokens_per_doc']}, "
+              f"embedding tokens {before['embedding_tokens']} -> {after['embedding_tokens']}, "
+              f"build p50 {before['p50_ms']} -> {after['p50_ms']} ms")
+    if "index_chunked" in run["results"] and "index_truncated" in run["results"]:
+        before, after = run["results"]["index_truncated"], run["results"]["index_chunked"]
+        print(f"\nChunking: vectors {before['vectors']} -> {after['vectors']}, index {before['index_mb']} -> "
+              f"{after['index_mb']} MB, build {before['build_s']} -> {after['build_s']} s, "
+              f"tail hit rate {before['tail_hit_rate']} -> {after['tail_hit_rate']} ({after['probes']} long records)")
+    if "rerank" in run["results"]:
+        r = run["results"]["rerank"]
+        print(f"\nRerank: p50 {r['p50_ms']} ms over {r['candidates_mean']} candidates (mean)")
+    print(f"\nAppended results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -16,18 +16,35 @@ os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
 
 import json
 import re
-from typing import Optional, List, Dict, Any, TypedDict
+import threading
+from collections import OrderedDict
+from typing import Optional, List, Dict, Any, TypedDict, Annotated
 
+import numpy as np
 import pandas as pd
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 from langchain_community.vectorstores import FAISS
 from langchain.prompts import ChatPromptTemplate
 from langchain_core.documents import Document
 from langgraph.graph import StateGraph, END
 from langgraph.checkpoint.memory import MemorySaver
 
-XLSX_PATH = "EPCL_VEHS_Data_Processed.xlsx"
+import backends
+import data_store
+import prompt_context
+import releases
+import retrieval
+import telemetry
+
+XLSX_PATH = data_store.XLSX_PATH
+DATA_DIR = data_store.DATA_DIR
 PERSIST_DIR = "vehsvdb"
+# VEHS_COMPACT_CONTEXT=0 sends the old dict-repr analytics and raw snippets (for comparisons)
+COMPACT_CONTEXT = os.getenv("VEHS_COMPACT_CONTEXT", "1") != "0"
+# VEHS_MULTI_QUERY=0 always runs a single similarity search per question
+MULTI_QUERY = os.getenv("VEHS_MULTI_QUERY", "1") != "0"
+# VEHS_RERANK=0 keeps the plain vector-distance order
+RERANK = os.getenv("VEHS_RERANK", "1") != "0"
+RETRIEVAL_K = 6
 
 # --------- Load sheets once for analytics ---------
 SHEETS: Dict[str, pd.DataFrame] = {}
@@ -43,27 +60,98 @@ def is_hazard_query(q: str) -> bool:
         "ppe", "housekeeping", "barric", "permit", "lopc", "leak", "isolation plan",
     ]
     return any(t in ql for t in hazard_terms)
-if os.path.exists(XLSX_PATH):
-    SHEETS = pd.read_excel(XLSX_PATH, sheet_name=None)
-    for name, df in SHEETS.items():
-        for col in df.columns:
-            if any(k in col.lower() for k in ["date", "entered", "start"]):
-                df[col] = pd.to_datetime(df[col], errors="coerce")
-else:
-    print(f"Warning: {XLSX_PATH} not found. Analytics may not work until the file is present.")
-
-# --------- Vector store / retriever ---------
-EMB = OpenAIEmbeddings(model="text-embedding-3-small")
-try:
-    VSTORE = FAISS.load_local(PERSIST_DIR, EMB, allow_dangerous_deserialization=True)
-    RETRIEVER = VSTORE.as_retriever(search_kwargs={"k": 6})
-except Exception as e:
-    VSTORE = None
-    RETRIEVER = None
-    print(f"Warning: Could not load FAISS index from '{PERSIST_DIR}'. Build it first via `python build_index.py`.\n{e}")
+
+
+# Ranking/frequency wording: the question wants the analytics table, not individual records
+ANALYTICS_CUES = re.compile(
+    r"\b(top|most|main|biggest|leading|worst|rank(ing|ed)?|frequent|common|recurring|keeps? coming up|count|how many|"
+    r"number of|concern(ed|ing|s)?|prevent(ion|ive)?|steps|avoid)\b"
+)
+# Wording that needs the retrieved rows themselves (narratives, specific records, explanations)
+RETRIEVAL_CUES = re.compile(
+    r"\b(why|what happened|describe|explain|details?|root cause|summari[sz]e|summary|tell me about|example|"
+    r"list|show me|which (incident|audit|inspection|finding)s?|who|when did)\b"
+    r"|\b[a-z]{2,}-\d{2,}"  # record IDs like HSE-2023-0142
+)
+# Rankings/counts of locations or departments: hazard_analytics only ranks hazard themes
+BREAKDOWN_CUES = re.compile(
+    r"\b((which|what) (departments?|locations?|sites?|areas?|units?)|(departments?|locations?|sites?|areas?|units?) "
+    r"(with|had|has|have)|(by|per|each) (department|location|site|area|unit))\b"
+    r"|\b\w+ (locations?|departments?)\b"
+)
+
+
+def question_text(q: str) -> str:
+    """The user's question without the conversation context the UI prepends ("Context: ... Question: ...")"""
+    marker = q.rfind("Question:") if q else -1
+    return q[marker + len("Question:"):].strip() if marker != -1 else (q or "")
+
+
+def classify_intent(q: str) -> str:
+    """'analytics' (answerable from hazard_analytics + PLAYBOOK), 'hazard' or 'general'; no model call.
+
+    A question is analytics-only when it asks to rank or count hazard themes (a ranking cue plus
+    "hazard" or a TAG_RULES pattern) and does not ask for narratives, specific records or a
+    location/department breakdown. hazard_analytics never reads the Incident sheet, so incident
+    counts ("how many incidents ...", "top incident locations") go to retrieval.
+    """
+    ql = question_text(q).lower()
+    theme = "hazard" in ql or any(re.search(pat, ql) for _, pat in TAG_RULES)
+    if not (theme or is_hazard_query(ql)):
+        return "general"
+    if theme and ANALYTICS_CUES.search(ql) and not RETRIEVAL_CUES.search(ql) and not BREAKDOWN_CUES.search(ql):
+        return "analytics"
+    return "hazard"
+
+
+# --------- Data + vector store (the current release, see releases.py) ---------
+# Backends are chosen by VEHS_BACKEND / VEHS_EMBEDDINGS / VEHS_LLM (see backends.py)
+# Repeated questions reuse their query embedding (cache hits are counted in telemetry)
+EMB = backends.CachedQueryEmbeddings(backends.get_embeddings())
+DATA_DIR, PERSIST_DIR, RELEASE = releases.resolve(DATA_DIR, PERSIST_DIR)
+
+
+def load_release(data_dir: str, index_dir: str) -> Dict[str, Any]:
+    """{"sheets", "vstore", "retriever"} read from one dataset and index directory"""
+    # Prefer the pipeline's Parquet dataset; fall back to the processed xlsx
+    sheets = data_store.load_sheets(data_dir, XLSX_PATH)
+    if not sheets:
+        print(f"Warning: neither {data_dir}/ nor {XLSX_PATH} found. Analytics may not work until the data is present.")
+    signature = backends.read_signature(index_dir)
+    if signature is not None and signature != backends.embedding_signature(EMB):
+        print(f"Warning: '{index_dir}' was built with {signature}, but the configured embedder is "
+              f"{backends.embedding_signature(EMB)}. Rebuild the index or change VEHS_EMBEDDINGS.")
+    try:
+        # One sub-index per sheet when build_index.py wrote partitions, else the single combined index
+        vstore = retrieval.PartitionedStore.load(index_dir, EMB) \
+            or FAISS.load_local(index_dir, EMB, allow_dangerous_deserialization=True)
+        retriever = vstore.as_retriever(search_kwargs={"k": 6}) if isinstance(vstore, FAISS) else None
+    except Exception as e:
+        vstore = retriever = None
+        print(f"Warning: Could not load FAISS index from '{index_dir}'. Build it first via `python build_index.py`.\n{e}")
+    return {"sheets": sheets, "vstore": vstore, "retriever": retriever}
+
+
+_release = load_release(DATA_DIR, PERSIST_DIR)
+SHEETS = _release["sheets"]
+VSTORE = _release["vstore"]
+RETRIEVER = _release["retriever"]
 
 # --------- LLM ---------
-LLM = ChatOpenAI(model="gpt-4o-mini", temperature=0.2)
+def filter_vocabulary(sheets: Dict[str, pd.DataFrame]) -> Dict[str, List[str]]:
+    """Distinct location/department values, used by the extractive backend to parse filters"""
+    vocab: Dict[str, List[str]] = {}
+    for key in ["location", "department"]:
+        values = set()
+        for df in sheets.values():
+            if key in df.columns:
+                values.update(str(v) for v in df[key].dropna().unique())
+        vocab[key] = sorted(v for v in values if v.strip() and v.lower() not in {"nan", "not specified", "not assigned"})
+    return vocab
+
+
+FILTER_VOCABULARY = filter_vocabulary(SHEETS)
+LLM = backends.get_chat_model(FILTER_VOCABULARY)
 
 # --------- Hazard tagging rules and playbook ---------
 TAG_RULES: List[tuple[str, str]] = [
@@ -137,17 +225,93 @@ def tag_text(txt: str) -> List[str]:
     return tags or ["Other"]
 
 
+def tag_series(text: pd.Series) -> pd.Series:
+    """tag_text over a column: one regex pass per rule instead of per row"""
+    lower = text.fillna("").astype(str).str.lower().tolist()
+    hits = np.array([[re.search(pat, t) is not None for t in lower] for _, pat in TAG_RULES], dtype=bool).reshape(len(TAG_RULES), -1).T
+    names = [name for name, _ in TAG_RULES]
+    return pd.Series([[names[j] for j in np.flatnonzero(row)] or ["Other"] for row in hits], index=text.index, dtype=object)
+
+
+# Text that hazard_analytics tags, per sheet
+TAG_TEXT_COLUMNS: Dict[str, List[str]] = {
+    "Hazard ID": ["title", "description", "violation_type_hazard_id"],
+    "Audit Findings": ["audit_title", "finding"],
+    "Inspection Findings": ["audit_title", "finding", "question"],
+}
+
+# Tags depend only on a row's text, so each sheet is tagged once and reused for every filter set
+_sheet_tags: Dict[str, tuple] = {}
+
+
+def sheet_tags(sheet_name: str) -> pd.Series:
+    """Hazard tags for every row of SHEETS[sheet_name]; recomputed when the sheet object is replaced"""
+    df = SHEETS[sheet_name]
+    cached = _sheet_tags.get(sheet_name)
+    if cached is None or cached[0] is not df:
+        cached = (df, tag_series(join_text(df, TAG_TEXT_COLUMNS[sheet_name])))
+        _sheet_tags[sheet_name] = cached
+    return cached[1]
+
+
+# Record severity for the reranker, keyed like the index metadata: {sheet: {record_id: 0-3}}
+_record_severity: Dict[str, tuple] = {}
+
+
+def severity_table(df: pd.DataFrame) -> Dict[str, float]:
+    """Worst consequence (to_sev) per record, record ids as build_index assigns them"""
+    id_cols = [c for c in df.columns if any(k in c.lower() for k in ["incident_id", "audit_id", "hazard_id", "record_id", "id", "finding_id"])]
+    sev_cols = [c for c in df.columns if "worst_case_consequence" in c.lower()]
+    if not id_cols or not sev_cols:
+        return {}
+    # build_index uses the first non-empty id column of each row
+    ids = df[id_cols].bfill(axis=1).iloc[:, 0]
+    sev = pd.concat([df[c].astype("category").map(to_sev).astype(float) for c in sev_cols], axis=1).max(axis=1)
+    keep = ids.notna() & sev.notna()
+    return sev[keep].groupby(ids[keep].astype(str)).max().to_dict()
+
+
+def record_severity(sheet_name: str) -> Dict[str, float]:
+    """severity_table of SHEETS[sheet_name]; recomputed when the sheet object is replaced"""
+    df = SHEETS[sheet_name]
+    cached = _record_severity.get(sheet_name)
+    if cached is None or cached[0] is not df:
+        cached = (df, severity_table(df))
+        _record_severity[sheet_name] = cached
+    return cached[1]
+
+
+def join_text(df: pd.DataFrame, cols: List[str]) -> pd.Series:
+    """Space-joined string form of the given columns (empty when none are present)"""
+    cols = [c for c in cols if c in df.columns]
+    if not cols:
+        return pd.Series("", index=df.index)
+    out = df[cols[0]].astype(str)
+    for c in cols[1:]:
+        out = out + " " + df[c].astype(str)
+    return out
+
+
+def _contains(col: pd.Series, pattern: str) -> pd.Series:
+    """Case-insensitive match; categorical columns test each category once instead of every row."""
+    if isinstance(col.dtype, pd.CategoricalDtype):
+        hits = col.cat.categories.astype(str).str.contains(pattern, case=False, na=False)
+        return pd.Series(np.isin(col.cat.codes.to_numpy(), np.flatnonzero(hits)), index=col.index)
+    return col.astype(str).str.contains(pattern, case=False, na=False)
+
+
 def apply_filters(df: pd.DataFrame, f: Dict[str, Any]) -> pd.DataFrame:
-    out = df.copy()
+    # Boolean indexing already returns new frames; callers copy before adding columns
+    out = df
     loc = f.get("location")
     dept = f.get("department")
     start = pd.to_datetime(f.get("start_date"), errors="coerce") if f.get("start_date") else None
     end = pd.to_datetime(f.get("end_date"), errors="coerce") if f.get("end_date") else None
 
     if loc and "location" in out.columns:
-        out = out[out["location"].astype(str).str.contains(str(loc), case=False, na=False)]
+        out = out[_contains(out["location"], str(loc))]
     if dept and "department" in out.columns:
-        out = out[out["department"].astype(str).str.contains(str(dept), case=False, na=False)]
+        out = out[_contains(out["department"], str(dept))]
 
     # Try likely date columns
     date_cols = [c for c in out.columns if any(k in c.lower() for k in ["occurrence", "reported", "start", "entered"]) ]
@@ -163,8 +327,6 @@ def apply_filters(df: pd.DataFrame, f: Dict[str, Any]) -> pd.DataFrame:
 # ---------- Analytics ----------
 
 def hazard_analytics(filters: Dict[str, Any], top_n: int = 5) -> Dict[str, Any]:
-    from collections import defaultdict
-
     def safe_col(df: pd.DataFrame, name: str, default=None):
         return df[name] if name in df.columns else pd.Series([default] * len(df), index=df.index)
 
@@ -177,12 +339,7 @@ def hazard_analytics(filters: Dict[str, Any], top_n: int = 5) -> Dict[str, Any]:
             df = df.copy()
             sev_series = safe_col(df, "worst_case_consequence_potential_hazard_id")
             df["severity"] = sev_series.map(to_sev)
-            text_cols = [c for c in ["title", "description", "violation_type_hazard_id"] if c in df.columns]
-            if text_cols:
-                df["text"] = df[text_cols].astype(str).agg(" ".join, axis=1)
-            else:
-                df["text"] = ""
-            df["tags"] = df["text"].map(tag_text)
+            df["tags"] = sheet_tags("Hazard ID").reindex(df.index)
             df["date"] = pd.to_datetime(df.get("occurrence_date"), errors="coerce")
             keep_cols = [c for c in ["tags", "severity", "date", "incident_id", "location", "department"] if c in df.columns]
             frames.append(("haz", df[keep_cols]))
@@ -194,12 +351,7 @@ def hazard_analytics(filters: Dict[str, Any], top_n: int = 5) -> Dict[str, Any]:
             df = df.copy()
             sev_series = safe_col(df, "worst_case_consequence")
             df["severity"] = sev_series.map(to_sev)
-            text_cols = [c for c in ["audit_title", "finding"] if c in df.columns]
-            if text_cols:
-                df["text"] = df[text_cols].astype(str).agg(" ".join, axis=1)
-            else:
-                df["text"] = ""
-            df["tags"] = df["text"].map(tag_text)
+            df["tags"] = sheet_tags("Audit Findings").reindex(df.index)
             df["date"] = pd.to_datetime(df.get("start_date"), errors="coerce")
             keep_cols = [c for c in ["tags", "severity", "date", "audit_id", "location"] if c in df.columns or c in ["tags", "severity", "date"]]
             frames.append(("aud", df[keep_cols]))
@@ -210,56 +362,42 @@ def hazard_analytics(filters: Dict[str, Any], top_n: int = 5) -> Dict[str, Any]:
         if not df.empty:
             df = df.copy()
             df["severity"] = 1
-            text_cols = [c for c in ["audit_title", "finding", "question"] if c in df.columns]
-            if text_cols:
-                df["text"] = df[text_cols].astype(str).agg(" ".join, axis=1)
-            else:
-                df["text"] = ""
-            df["tags"] = df["text"].map(tag_text)
+            df["tags"] = sheet_tags("Inspection Findings").reindex(df.index)
             df["date"] = pd.to_datetime(df.get("start_date"), errors="coerce")
             keep_cols = [c for c in ["tags", "severity", "date", "audit_id", "location"] if c in df.columns or c in ["tags", "severity", "date"]]
             frames.append(("ins", df[keep_cols]))
 
-    # Combine scoring
-    agg: Dict[str, Dict[str, Any]] = defaultdict(lambda: {"count": 0, "sev_sum": 0, "sev_n": 0, "recent": 0, "samples": []})
-
+    # Combine scoring: one row per (record, tag), aggregated per tag in first-seen order
     horizon = pd.Timestamp.today() - pd.Timedelta(days=180)
-
+    parts = []
     for source_name, df in frames:
-        for _, r in df.iterrows():
-            tags = r["tags"] if isinstance(r.get("tags"), list) else [r.get("tags")]
-            for t in tags:
-                if t is None:
-                    continue
-                a = agg[t]
-                a["count"] += 1
-                sev = r.get("severity")
-                if pd.notna(sev):
-                    a["sev_sum"] += sev
-                    a["sev_n"] += 1
-                d = r.get("date")
-                try:
-                    if pd.notna(d) and d >= horizon:
-                        a["recent"] += 1
-                except Exception:
-                    pass
-                # Keep a few sample IDs for citations
-                rid = r.get("incident_id") if "incident_id" in r else r.get("audit_id")
-                if rid is not None and len(a["samples"]) < 5:
-                    a["samples"].append({"source": source_name, "id": rid})
+        id_col = "incident_id" if "incident_id" in df.columns else "audit_id"
+        parts.append(pd.DataFrame({
+            "tag": df["tags"],
+            "severity": pd.to_numeric(df["severity"], errors="coerce"),
+            "recent": pd.to_datetime(df["date"], errors="coerce") >= horizon,
+            "source": source_name,
+            "id": df[id_col] if id_col in df.columns else None,
+        }))
+    rows = pd.concat(parts, ignore_index=True).explode("tag") if parts else pd.DataFrame(columns=["tag"])
+    rows = rows[rows["tag"].notna()]
 
     scored = []
-    for tag, val in agg.items():
-        avg_sev = (val["sev_sum"] / val["sev_n"]) if val["sev_n"] else 1.0
-        concern = val["count"] + 0.75 * avg_sev + 0.5 * val["recent"]
+    for tag, g in rows.groupby("tag", sort=False):
+        sev_n = int(g["severity"].notna().sum())
+        avg_sev = float(g["severity"].sum() / sev_n) if sev_n else 1.0
+        recent = int(g["recent"].sum())
+        concern = len(g) + 0.75 * avg_sev + 0.5 * recent
+        # Keep a few sample IDs for citations
+        samples = g.loc[g["id"].notna(), ["source", "id"]].head(5)
         scored.append(
             {
                 "hazard": tag,
-                "count": val["count"],
+                "count": len(g),
                 "avg_sev": round(avg_sev, 2),
-                "recent": val["recent"],
+                "recent": recent,
                 "concern_score": round(concern, 2),
-                "samples": val["samples"],
+                "samples": samples.to_dict("records"),
                 "steps": PLAYBOOK.get(tag, PLAYBOOK["Other"]),
             }
         )
@@ -267,13 +405,85 @@ def hazard_analytics(filters: Dict[str, Any], top_n: int = 5) -> Dict[str, Any]:
     return {"top": scored[:top_n]}
 
 
+# Tag the sheets up front so the first question does not pay for it
+for _sheet_name in TAG_TEXT_COLUMNS:
+    if _sheet_name in SHEETS:
+        sheet_tags(_sheet_name)
+for _sheet_name in SHEETS:
+    record_severity(_sheet_name)
+
+
 # ------------- LangGraph state + nodes -------------
 class GraphState(TypedDict):
     query: str
+    intent: str
     filters: Dict[str, Any]
     retrieved: List[Document]
     analytics: Dict[str, Any]
     answer: str
+    # Per-node latency/token/cache records for the current turn (see telemetry.py)
+    metrics: Annotated[List[Dict[str, Any]], telemetry.add_node_metrics]
+
+
+# 0) route node: pure-analytics questions skip the LLM, the vector search and synthesis
+
+def route(state: GraphState) -> GraphState:
+    return {"intent": classify_intent(state.get("query", ""))}
+
+
+def next_after_route(state: GraphState) -> str:
+    return "answer_from_analytics" if state.get("intent") == "analytics" else "parse_filters"
+
+
+def render_analytics_answer(question: str, filters: Dict[str, Any], analytics: Dict[str, Any]) -> str:
+    """Templated Markdown answer (same headings as the synthesis prompts) from hazard_analytics output"""
+    top = analytics.get("top") or []
+    scope = ", ".join(f"{k.replace('_', ' ')} {v}" for k, v in filters.items()) or "all records"
+    if not top:
+        return f"### Summary\nNo hazard findings match {scope}. Try widening the location, department or date filters."
+
+    def cite(h: Dict[str, Any]) -> List[str]:
+        return [f"[{prompt_context.SAMPLE_SHEETS.get(s['source'], s['source'])}:{s['id']}]" for s in h.get("samples") or []]
+
+    lead = top[0]
+    others = ", ".join(f"{h['hazard']} ({h['count']})" for h in top[1:3])
+    lines = [
+        "### Summary",
+        f"For {scope}, the most concerning hazard theme is **{lead['hazard']}** ({lead['count']} findings, "
+        f"{lead['recent']} in the last 180 days, average severity {lead['avg_sev']})"
+        + (f", followed by {others}." if others else ".")
+        + f" First priority: {lead['steps'][0]}",
+        "",
+        "### Details",
+    ]
+    for i, h in enumerate(top, 1):
+        refs = " ".join(cite(h)[:3])
+        lines.append(f"{i}. **{h['hazard']}**: {h['count']} findings, {h['recent']} recent, "
+                     f"avg severity {h['avg_sev']}, concern score {h['concern_score']} {refs}".rstrip())
+    lines += ["", "### Actions"]
+    seen = set()
+    for h in top:
+        for step in h.get("steps") or []:
+            if step not in seen:
+                seen.add(step)
+                lines.append(f"- {h['hazard']}: {step}")
+    citations = list(dict.fromkeys(c for h in top for c in cite(h)[:3]))
+    if citations:
+        lines += ["", "### Citations", ", ".join(citations)]
+    return "\n".join(lines)
+
+
+def answer_from_analytics(state: GraphState) -> GraphState:
+    q = state.get("query", "")
+    # Rule-based filters; anything the caller passed (e.g. the UI sidebar) wins
+    filters = {**backends.extract_filters(question_text(q), FILTER_VOCABULARY), **(state.get("filters") or {})}
+    analytics = cached_hazard_analytics(filters, top_n=6) if SHEETS else {"top": []}
+    return {
+        "filters": filters,
+        "retrieved": [],
+        "analytics": analytics,
+        "answer": render_analytics_answer(question_text(q), filters, analytics),
+    }
 
 
 # 1) parse_filters node
@@ -293,6 +503,7 @@ def parse_filters(state: GraphState) -> GraphState:
     q = state["query"]
     messages = filter_prompt.format_messages(query=q)
     resp = LLM.invoke(messages)
+    telemetry.record_llm_usage(resp, messages)
     # Best-effort JSON extraction
     filt: Dict[str, Any] = {}
     try:
@@ -311,40 +522,91 @@ def parse_filters(state: GraphState) -> GraphState:
 
 # 2) retrieve_docs node
 
-def retrieve_docs(state: GraphState) -> GraphState:
-    q = state["query"]
+def retrieval_query(state: GraphState) -> str:
+    """The text that is embedded for the similarity search: question plus location/department filters"""
     f = state.get("filters", {})
     filt_terms = " ".join(str(v) for v in [f.get("location"), f.get("department")] if v)
-    full_query = f"{q} {filt_terms}".strip()
-    docs: List[Document] = []
-    if VSTORE is not None:
-        # Get similarity scores and attach to metadata for UI display
-        try:
-            results = VSTORE.similarity_search_with_score(full_query, k=6)
-            docs = []
-            for d, score in results:
-                md = d.metadata or {}
-                md["score"] = float(score) if score is not None else None
-                d.metadata = md
-                docs.append(d)
-        except Exception:
-            # Fallback to retriever if similarity with score not available
-            if RETRIEVER is not None:
-                docs = RETRIEVER.invoke(full_query)
-    elif RETRIEVER is not None:
-        # Use the modern retriever API to avoid deprecation warnings
-        docs = RETRIEVER.invoke(full_query)
-    else:
+    return f"{state['query']} {filt_terms}".strip()
+
+
+def retrieval_texts(state: GraphState) -> List[str]:
+    """Every text retrieve_docs embeds for this state: the sub-queries of a compound question, else one query"""
+    if not MULTI_QUERY:
+        return [retrieval_query(state)]
+    question = question_text(state["query"])
+    subqueries = retrieval.split_query(question)
+    if len(subqueries) < 2 and len(retrieval.mentioned_sheets(question)) < 2:
+        return [retrieval_query(state)]
+    suffix = retrieval_query({"query": "", "filters": state.get("filters", {})})
+    return [f"{q} {suffix}".strip() for q in subqueries]
+
+
+def search_sheets(state: GraphState) -> Optional[List[str]]:
+    """Partitions the router picks for this question (None when the index is not partitioned)"""
+    if not isinstance(VSTORE, retrieval.PartitionedStore):
+        return None
+    question = question_text(state["query"])
+    return VSTORE.route(question, state.get("filters"), hazard=is_hazard_query(question))
+
+
+def retrieve_docs(state: GraphState, k: int = RETRIEVAL_K) -> GraphState:
+    if VSTORE is None:
         print("Retriever not available (missing FAISS index). Run `python build_index.py` first.")
+        return {"retrieved": []}
+    texts = retrieval_texts(state)
+    try:
+        # One embedding request for all sub-queries, one batched search over the routed partitions
+        vectors = EMB.embed_queries(texts) if hasattr(EMB, "embed_queries") else EMB.embed_documents(texts)
+        fetch_k = max(k * retrieval.FETCH_MULTIPLIER, retrieval.RERANK_CANDIDATES if RERANK else 0)
+        hits = retrieval.search_by_vectors(VSTORE, vectors, fetch_k, search_sheets(state))
+        question = question_text(state["query"])
+        ranked = retrieval.dedupe_hits(hits)
+        if RERANK:
+            # Rerank the closest candidates; the rest stay behind them for the sheet quotas
+            n = retrieval.RERANK_CANDIDATES
+            ranked = retrieval.rerank(question, ranked[:n], state.get("filters"),
+                                      {s: record_severity(s) for s in SHEETS}) + ranked[n:]
+        docs = retrieval.select_hits(ranked, k, quota_sheets=retrieval.mentioned_sheets(question))
+    except Exception as e:
+        if RETRIEVER is None:
+            raise
+        print(f"Batched search failed, using the retriever: {e}")
+        docs = RETRIEVER.invoke(retrieval_query(state))
     # Return only updated key
     return {"retrieved": docs}
 
 
 # 3) hazard_analytics node
 
+ANALYTICS_CACHE_SIZE = 64
+_analytics_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+# Streamlit sessions share the cache from their own threads
+_analytics_lock = threading.Lock()
+
+
+def cached_hazard_analytics(filters: Dict[str, Any], top_n: int = 5) -> Dict[str, Any]:
+    """hazard_analytics memoized per (filters, top_n); cleared when a new release is swapped in"""
+    key = json.dumps({"filters": filters, "top_n": top_n}, sort_keys=True, default=str)
+    with _analytics_lock:
+        result = _analytics_cache.get(key)
+        if result is not None:
+            _analytics_cache.move_to_end(key)
+    telemetry.record_cache(result is not None)
+    if result is not None:
+        return result
+    # Computed outside the lock so one slow filter set does not hold up the others
+    result = hazard_analytics(filters, top_n=top_n)
+    with _analytics_lock:
+        _analytics_cache[key] = result
+        _analytics_cache.move_to_end(key)
+        while len(_analytics_cache) > ANALYTICS_CACHE_SIZE:
+            _analytics_cache.popitem(last=False)
+    return result
+
+
 def run_analytics(state: GraphState) -> GraphState:
     f = state.get("filters", {})
-    ana = hazard_analytics(f, top_n=6) if SHEETS else {"top": []}
+    ana = cached_hazard_analytics(f, top_n=6) if SHEETS else {"top": []}
     # Return only updated key
     return {"analytics": ana}
 
@@ -374,7 +636,7 @@ hazard_synth_prompt = ChatPromptTemplate.from_messages(
             "User question: {query}\n\n"
             "Filters: {filters}\n\n"
             "Context profile: {context_profile}\n\n"
-            "Top hazards (JSON): {analytics}\n\n"
+            "Top hazards:\n{analytics}\n\n"
             "Retrieved snippets (for context):\n{snippets}",
         ),
     ]
@@ -407,61 +669,49 @@ general_qa_prompt = ChatPromptTemplate.from_messages(
 
 
 def synthesize_answer(state: GraphState) -> GraphState:
-    # Build small snippet list + citations
-    snippets: List[str] = []
-    retrieved_docs = state.get("retrieved", [])
-    for d in retrieved_docs[:5]:
-        meta = d.metadata or {}
-        cid = meta.get("record_id") or ""
-        src = meta.get("source_sheet") or ""
-        content = (d.page_content or "")[:350].replace("\n", " ")
-        snippets.append(f"[{src}:{cid}] {content}")
-
-    # Build a lightweight profile of the retrieved context for clearer descriptions
-    from collections import Counter
-    sheet_counts = Counter()
-    ids: List[str] = []
-    for d in retrieved_docs:
-        md = d.metadata or {}
-        sheet = md.get("source_sheet") or "Unknown"
-        sheet_counts[sheet] += 1
-        rid = md.get("record_id")
-        if rid:
-            ids.append(f"{sheet}:{rid}")
-    counts_str = ", ".join(f"{k}={v}" for k, v in sheet_counts.items()) or "none"
-    ids_str = ", ".join(ids[:10]) or "none"
-    context_profile = f"total={len(retrieved_docs)}; by_sheet={counts_str}; ids={ids_str}"
-
     q = state.get("query", "")
-    if is_hazard_query(q):
+    hazard_query = is_hazard_query(q)
+    # Analytics table + ranked snippets, capped at prompt_context.CONTEXT_TOKEN_BUDGET tokens
+    build = prompt_context.build_context if COMPACT_CONTEXT else prompt_context.legacy_context
+    ctx = build(q, state.get("analytics", {}) if hazard_query else None, state.get("retrieved", []))
+
+    if hazard_query:
         messages = hazard_synth_prompt.format_messages(
             query=q,
             filters=state.get("filters", {}),
-            analytics=state.get("analytics", {}),
-            context_profile=context_profile,
-            snippets="\n".join(snippets),
+            analytics=ctx["analytics"],
+            context_profile=ctx["context_profile"],
+            snippets=ctx["snippets"],
         )
     else:
         messages = general_qa_prompt.format_messages(
             query=q,
             filters=state.get("filters", {}),
-            context_profile=context_profile,
-            snippets="\n".join(snippets),
+            context_profile=ctx["context_profile"],
+            snippets=ctx["snippets"],
         )
     resp = LLM.invoke(messages)
+    telemetry.record_llm_usage(resp, messages)
     # Return only updated key
     return {"answer": resp.content}
 
 
 # Build graph
 graph = StateGraph(GraphState)
-graph.add_node("parse_filters", parse_filters)
-graph.add_node("retrieve_docs", retrieve_docs)
-graph.add_node("run_analytics", run_analytics)
-graph.add_node("synthesize_answer", synthesize_answer)
+graph.add_node("route", telemetry.instrument("route", route))
+graph.add_node("answer_from_analytics", telemetry.instrument("answer_from_analytics", answer_from_analytics))
+graph.add_node("parse_filters", telemetry.instrument("parse_filters", parse_filters))
+graph.add_node("retrieve_docs", telemetry.instrument("retrieve_docs", retrieve_docs))
+graph.add_node("run_analytics", telemetry.instrument("run_analytics", run_analytics))
+graph.add_node("synthesize_answer", telemetry.instrument("synthesize_answer", synthesize_answer))
 
 # Edges
-graph.set_entry_point("parse_filters")
+graph.set_entry_point("route")
+graph.add_conditional_edges("route", next_after_route, {
+    "answer_from_analytics": "answer_from_analytics",
+    "parse_filters": "parse_filters",
+})
+graph.add_edge("answer_from_analytics", END)
 graph.add_edge("parse_filters", "retrieve_docs")
 graph.add_edge("retrieve_docs", "run_analytics")
 graph.add_edge("run_analytics", "synthesize_answer")
@@ -471,20 +721,197 @@ memory = MemorySaver()  # optional checkpointing
 app = graph.compile(checkpointer=memory)
 
 
+# ------------- Release hot-swap -------------
+# Requests run under SWAP_LOCK.reading() (see serving()); a swap waits for them to finish
+SWAP_LOCK = releases.SwapLock()
+_watcher: Optional[releases.PointerWatcher] = None
+
+
+def serving():
+    """Context manager for one request: the data and index cannot be swapped while it runs"""
+    return SWAP_LOCK.reading()
+
+
+def install_release(version: str) -> bool:
+    """Load and warm a published release in the calling thread, then swap it in between requests"""
+    global SHEETS, VSTORE, RETRIEVER, FILTER_VOCABULARY, LLM, DATA_DIR, PERSIST_DIR, RELEASE
+    data_dir, index_dir = releases.release_dirs(version)
+    loaded = load_release(data_dir, index_dir)
+    sheets = loaded["sheets"]
+    if not sheets or loaded["vstore"] is None:
+        print(f"Warning: release {version} is incomplete; still serving {RELEASE or DATA_DIR}")
+        return False
+    # Everything derived from the sheets is computed before the swap, off the request path
+    tags = {name: (sheets[name], tag_series(join_text(sheets[name], cols)))
+            for name, cols in TAG_TEXT_COLUMNS.items() if name in sheets}
+    severity = {name: (df, severity_table(df)) for name, df in sheets.items()}
+    vocabulary = filter_vocabulary(sheets)
+    llm = backends.get_chat_model(vocabulary)
+
+    with SWAP_LOCK.writing():
+        SHEETS, VSTORE, RETRIEVER = sheets, loaded["vstore"], loaded["retriever"]
+        FILTER_VOCABULARY, LLM = vocabulary, llm
+        DATA_DIR, PERSIST_DIR, RELEASE = data_dir, index_dir, version
+        _sheet_tags.clear()
+        _sheet_tags.update(tags)
+        _record_severity.clear()
+        _record_severity.update(severity)
+        with _analytics_lock:
+            _analytics_cache.clear()
+    print(f"Serving release {version}")
+    return True
+
+
+def watch_releases(interval: float = releases.POLL_SECONDS) -> releases.PointerWatcher:
+    """Start (once per process) the thread that swaps in each newly published release"""
+    global _watcher
+    if _watcher is None:
+        _watcher = releases.PointerWatcher(install_release, RELEASE, interval=interval)
+        _watcher.start()
+    return _watcher
+
+
+# ------------- Batch mode -------------
+BATCH_WORKERS = 4
+FILTER_KEYS = ["location", "department", "start_date", "end_date"]
+
+
+def read_batch_questions(path: str) -> List[Dict[str, Any]]:
+    """Questions from a JSONL or CSV file.
+
+    Each row has a "question" plus optional "id" and filters, given either as a
+    "filters" object (JSONL) or as location/department/start_date/end_date
+    fields. Rows with any filter set skip filter parsing.
+    """
+    if path.lower().endswith(".csv"):
+        rows = pd.read_csv(path, dtype=str, keep_default_na=False).to_dict("records")
+    else:
+        with open(path, encoding="utf-8") as fh:
+            rows = [json.loads(line) for line in fh if line.strip()]
+    items = []
+    for i, row in enumerate(rows, 1):
+        question = str(row.get("question") or "").strip()
+        if not question:
+            print(f"Skipping row {i}: no question")
+            continue
+        filters = dict(row.get("filters") or {})
+        filters.update({k: row[k] for k in FILTER_KEYS if row.get(k)})
+        items.append({"id": str(row.get("id") or i), "question": question, "filters": filters})
+    return items
+
+
+def answer_batch(items: List[Dict[str, Any]], workers: int = BATCH_WORKERS):
+    """Answer many questions, yielding {"id", "question", "intent", "filters", "answer", "citations"} as each finishes.
+
+    Compared with one graph run per question: filter parsing only runs for
+    rows without filters, all retrieval queries are embedded in one batched
+    request, analytics run once per distinct filter set, and the LLM calls
+    run concurrently on a bounded thread pool.
+    """
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    states: List[Dict[str, Any]] = [
+        {"id": it["id"], "query": it["question"], "filters": it["filters"], "intent": classify_intent(it["question"])}
+        for it in items
+    ]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # 1) Filters: explicit ones are used as given; analytics-intent rows use the rule-based parser
+        to_parse = [s for s in states if not s["filters"] and s["intent"] != "analytics"]
+        for s, fut in [(s, pool.submit(parse_filters, s)) for s in to_parse]:
+            s["filters"] = fut.result()["filters"]
+        for s in states:
+            if s["intent"] == "analytics":
+                s["filters"] = {**backends.extract_filters(question_text(s["query"]), FILTER_VOCABULARY), **s["filters"]}
+        print(f"Filters ready ({len(to_parse)} parsed)")
+
+        # 2) One embedding request for every distinct retrieval query; retrieve_docs then hits the cache
+        rag = [s for s in states if s["intent"] != "analytics"]
+        if rag and VSTORE is not None and hasattr(EMB, "embed_queries"):
+            queries = list(dict.fromkeys(t for s in rag for t in retrieval_texts(s)))
+            EMB.embed_queries(queries)
+            print(f"Embedded {len(queries)} distinct queries in one request")
+        for s in rag:
+            s["retrieved"] = retrieve_docs(s)["retrieved"]
+
+        # 3) Analytics once per distinct filter set
+        analytics: Dict[str, Dict[str, Any]] = {}
+        for s in states:
+            key = json.dumps(s["filters"], sort_keys=True, default=str)
+            if key not in analytics:
+                analytics[key] = hazard_analytics(s["filters"], top_n=6) if SHEETS else {"top": []}
+            s["analytics"] = analytics[key]
+        print(f"Analytics computed for {len(analytics)} filter sets")
+
+        # 4) Answers: templated for analytics intents, LLM synthesis on the pool for the rest
+        def finish(s: Dict[str, Any]) -> Dict[str, Any]:
+            if s["intent"] == "analytics":
+                answer = render_analytics_answer(question_text(s["query"]), s["filters"], s["analytics"])
+            else:
+                answer = synthesize_answer(s)["answer"]
+            citations = [f"{(d.metadata or {}).get('source_sheet')}:{(d.metadata or {}).get('record_id')}"
+                         for d in s.get("retrieved") or []]
+            return {"id": s["id"], "question": s["query"], "intent": s["intent"], "filters": s["filters"],
+                    "answer": answer, "citations": citations}
+
+        for fut in as_completed([pool.submit(finish, s) for s in states]):
+            yield fut.result()
+
+
+def run_batch(path: str, output: str, markdown: Optional[str] = None, workers: int = BATCH_WORKERS):
+    """Answer every question in `path`, streaming JSONL (and optionally Markdown) as answers complete"""
+    import time
+
+    items = read_batch_questions(path)
+    print(f"Answering {len(items)} questions from {path} with {workers} workers...")
+    started = time.perf_counter()
+    md = open(markdown, "w", encoding="utf-8") if markdown else None
+    try:
+        with open(output, "w", encoding="utf-8") as out:
+            for n, result in enumerate(answer_batch(items, workers), 1):
+                out.write(json.dumps(result, default=str) + "\n")
+                out.flush()
+                if md:
+                    scope = ", ".join(f"{k}={v}" for k, v in result["filters"].items()) or "no filters"
+                    md.write(f"## {result['id']}. {result['question']}\n\n_{scope}_\n\n{result['answer']}\n\n")
+                    md.flush()
+                print(f"  [{n}/{len(items)}] {result['id']} ({result['intent']})")
+    finally:
+        if md:
+            md.close()
+    print(f"Answered {len(items)} questions in {time.perf_counter() - started:.1f}s -> {output}"
+          + (f", {markdown}" if markdown else ""))
+
+
 # Simple CLI
 if __name__ == "__main__":
-    import sys
-
-    if len(sys.argv) > 1:
-        question = " ".join(sys.argv[1:])
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Answer VEHS hazard questions")
+    parser.add_argument("question", nargs="*", help="Question to answer (default: the standard hazard question)")
+    parser.add_argument("--batch", help="JSONL or CSV file of questions (and optional filters) to answer")
+    parser.add_argument("--output", default="batch_answers.jsonl", help="Batch results, JSON Lines (default: %(default)s)")
+    parser.add_argument("--markdown", help="Also write the batch answers as a Markdown report")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS, help="Concurrent LLM calls in batch mode")
+    args = parser.parse_args()
+
+    if args.batch:
+        run_batch(args.batch, args.output, args.markdown, args.workers)
+        raise SystemExit(0)
+
+    if args.question:
+        question = " ".join(args.question)
     else:
         question = (
             "What are the most concerned hazards and what steps should we take to avoid it turning into an incident?"
         )
 
-    state: GraphState = {"query": question, "filters": {}, "retrieved": [], "analytics": {}, "answer": ""}
+    state: GraphState = {"query": question, "filters": {}, "retrieved": [], "analytics": {}, "answer": "", "metrics": []}
     # Provide a thread_id to satisfy MemorySaver (checkpointer) requirements
     config = {"configurable": {"thread_id": "cli-session"}}
     final = app.invoke(state, config=config)
     print("\n=== ANSWER ===\n")
     print(final.get("answer", "No answer produced."))
+    print("\n=== TIMINGS ===")
+    for m in final.get("metrics", []):
+        print(f"  {m['node']:<18} {m['duration_ms']:>9.1f} ms  tokens in/out {m['input_tokens']}/{m['output_tokens']}"
+              f"  cache {m['cache_hits']}/{m['cache_hits'] + m['cache_misses']}")
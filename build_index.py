@@ -2,41 +2,139 @@
 Build a FAISS vector store from the Excel workbook sheets with useful metadata for citations.
 
 Usage:
-  python build_index.py
+  python build_index.py                          # rebuild the partitions whose documents changed
+  python build_index.py --sheets "Audit Findings,Audit"   # rebuild only these partitions
+  python build_index.py --full                   # rebuild every partition
+  python build_index.py --report                 # tokens per doc: templates vs full row dumps
+  python build_index.py --templates my_templates.json     # override DOC_TEMPLATES
+  python build_index.py --data-dir releases/<v>/vehs_data --index-dir releases/<v>/vehsvdb  # a release
+
+Documents are built from per-sheet templates (DOC_TEMPLATES): only the
+listed text fields are embedded, the listed structured fields are kept as
+metadata. Sheets without a template fall back to a key:value dump of the row.
+Rows whose template text is longer than MAX_DOC_CHARS are split into
+overlapping passages (CHUNK_CHARS / CHUNK_OVERLAP), each a document of its
+own that repeats the row's header fields and carries the parent record_id;
+retrieval.dedupe_hits collapses them back to one hit per record.
 
 Inputs:
-  - EPCL_VEHS_Data_Processed.xlsx
+  - vehs_data/ (Parquet dataset written by vehs_pipeline.py), or
+  - EPCL_VEHS_Data_Processed.xlsx as a fallback
 Outputs:
-  - vehsvdb/ (FAISS index directory)
+  - vehsvdb/partitions/<sheet>/ (one FAISS index per source sheet)
+  - vehsvdb/partitions.json (docs, content hash and build time per partition)
 """
+import hashlib
+import json
+import os
+import shutil
+import time
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import Callable, List, Dict, Any, Optional
 
 import pandas as pd
 from langchain_core.documents import Document
-from langchain_openai import OpenAIEmbeddings
 from langchain_community.vectorstores import FAISS
 
-XLSX_PATH = "EPCL_VEHS_Data_Processed.xlsx"
+import backends
+import data_store
+import retrieval
+from telemetry import count_tokens
+
+XLSX_PATH = data_store.XLSX_PATH
+DATA_DIR = data_store.DATA_DIR
 TXT_PATH = "excel_analysis_report.txt"
 PERSIST_DIR = "vehsvdb"
+MAX_DOC_CHARS = 800
+CHUNK_CHARS = 600
+CHUNK_OVERLAP = 120
+
+# Per-sheet document templates: "text" fields are embedded (as "field: value" lines, in this
+# order), "metadata" fields are stored alongside for filtering/ranking. Enrichment columns
+# (risk scores, *_is_missing flags, cost estimates) stay out of the embedded text.
+# "header" fields (default: the first text field) are repeated in every passage of a long row.
+DOC_TEMPLATES: Dict[str, Dict[str, List[str]]] = {
+    "Incident": {
+        "text": ["title", "incident_type", "category", "location", "department", "description",
+                 "sequence_of_events", "why_1", "answer_1", "why_2", "answer_2", "why_3", "answer_3",
+                 "root_cause", "key_factor", "contributing_factor", "conclusion", "corrective_actions"],
+        "metadata": ["status", "incident_type", "category", "worst_case_consequence_incident",
+                     "actual_consequence_incident", "severity_score", "risk_score"],
+    },
+    "Hazard ID": {
+        "text": ["title", "incident_type", "violation_type_hazard_id", "location", "department",
+                 "description", "corrective_actions"],
+        "metadata": ["status", "incident_type", "worst_case_consequence_potential_hazard_id",
+                     "severity_score", "risk_score"],
+    },
+    "Audit": {
+        "text": ["audit_title", "audit_location", "checklist_category", "question", "answer", "finding",
+                 "recommendation", "finding_location"],
+        "metadata": ["audit_status", "audit_category", "audit_rating", "worst_case_consequence"],
+    },
+    "Audit Findings": {
+        "text": ["audit_title", "audit_location", "checklist_category", "question", "answer", "finding",
+                 "recommendation", "finding_location"],
+        "metadata": ["audit_status", "audit_category", "audit_rating", "worst_case_consequence"],
+    },
+    "Inspection": {
+        "text": ["audit_title", "audit_location", "checklist_category", "question", "answer", "finding",
+                 "finding_location", "action_item_title", "action_item_description"],
+        "metadata": ["audit_status", "audit_category", "worst_case_consequence", "action_item_status",
+                     "action_item_priority"],
+    },
+    "Inspection Findings": {
+        "text": ["audit_title", "audit_location", "checklist_category", "question", "answer", "finding",
+                 "finding_location", "action_item_title", "action_item_description"],
+        "metadata": ["audit_status", "audit_category", "action_item_status", "action_item_priority"],
+    },
+}
 
 
-def coerce_dt(s):
-    return pd.to_datetime(s, errors="coerce")
+def load_templates(path: Optional[str]) -> Dict[str, Dict[str, List[str]]]:
+    """DOC_TEMPLATES, with the sheets defined in a JSON file (same shape) replacing the defaults"""
+    templates = dict(DOC_TEMPLATES)
+    if path:
+        with open(path, encoding="utf-8") as f:
+            templates.update(json.load(f))
+    return templates
 
 
-def load_sheets(xlsx: str) -> Dict[str, pd.DataFrame]:
-    sheets = pd.read_excel(xlsx, sheet_name=None)
-    # Coerce common date columns found in reports
-    for name, df in sheets.items():
-        for col in df.columns:
-            if any(k in col.lower() for k in ["date", "entered", "start"]):
-                df[col] = coerce_dt(df[col])
+def load_sheets(xlsx: str, data_dir: str = DATA_DIR) -> Dict[str, pd.DataFrame]:
+    # Reads the columnar dataset when present, else the xlsx; declared dtypes are applied
+    memory: Dict[str, Dict[str, float]] = {}
+    sheets = data_store.load_sheets(data_dir, xlsx, memory_report=memory)
+    for name, m in memory.items():
+        print(f"{name}: {m['before_mb']} MB -> {m['after_mb']} MB")
     return sheets
 
 
-def to_docs(sheets: Dict[str, pd.DataFrame]) -> List[Document]:
+def chunk_text(text: str, size: int = CHUNK_CHARS, overlap: int = CHUNK_OVERLAP) -> List[str]:
+    """Passages of at most `size` chars, consecutive ones sharing ~`overlap` chars, cut at spaces"""
+    text = " ".join(text.split())
+    chunks: List[str] = []
+    start = 0
+    while start < len(text):
+        end = min(len(text), start + size)
+        if end < len(text):
+            cut = text.rfind(" ", start + size - overlap, end)
+            end = cut if cut > start else end
+        chunks.append(text[start:end].strip())
+        if end >= len(text):
+            break
+        nxt = max(start + 1, end - overlap)
+        space = text.find(" ", nxt, end)
+        start = space + 1 if space != -1 else nxt
+    return [c for c in chunks if c]
+
+
+def to_docs(sheets: Dict[str, pd.DataFrame], templates: Optional[Dict[str, Dict[str, List[str]]]] = None,
+            chunk: bool = True) -> List[Document]:
+    """One document per row, or per passage of a long templated row (chunk=False truncates instead).
+
+    templates default to DOC_TEMPLATES ({} gives full row dumps everywhere).
+    """
+    templates = DOC_TEMPLATES if templates is None else templates
     docs: List[Document] = []
 
     def add_doc(content: str, meta: Dict[str, Any]):
@@ -45,7 +143,7 @@ def to_docs(sheets: Dict[str, pd.DataFrame]) -> List[Document]:
             return
         docs.append(Document(page_content=content, metadata=meta))
 
-    def serialize_row(r: pd.Series, max_chars: int = 800) -> str:
+    def serialize_row(r: pd.Series, max_chars: int = MAX_DOC_CHARS) -> str:
         # Fallback: include a compact key:value dump of the row for general QA
         parts = []
         for k, v in r.items():
@@ -57,6 +155,9 @@ def to_docs(sheets: Dict[str, pd.DataFrame]) -> List[Document]:
                 break
         return " | ".join(parts)
 
+    def present(v: Any) -> bool:
+        return pd.notna(v) and str(v).strip() != "" and str(v).lower() != "nan"
+
     # Generic pass: index all sheets
     for sheet_name, df in sheets.items():
         if df is None or df.empty:
@@ -67,6 +168,10 @@ def to_docs(sheets: Dict[str, pd.DataFrame]) -> List[Document]:
         loc_col = "location" if "location" in df_local.columns else None
         dept_col = "department" if "department" in df_local.columns else None
         date_cols = [c for c in df_local.columns if any(k in c.lower() for k in ["occurrence", "reported", "start", "entered", "date"]) ]
+        template = templates.get(sheet_name)
+        text_cols = [c for c in (template or {}).get("text", []) if c in df_local.columns]
+        meta_cols = [c for c in (template or {}).get("metadata", []) if c in df_local.columns]
+        header_cols = [c for c in (template or {}).get("header", text_cols[:1]) if c in text_cols]
 
         for idx, r in df_local.iterrows():
             # Best-effort ID selection
@@ -79,7 +184,15 @@ def to_docs(sheets: Dict[str, pd.DataFrame]) -> List[Document]:
             if not rid:
                 rid = f"{sheet_name}-{idx}"
 
-            text = serialize_row(r)
+            passages: List[str] = []
+            if template:
+                text = serialize_row(r[text_cols], max_chars=10 ** 9 if chunk else MAX_DOC_CHARS)
+                if chunk and len(text) > MAX_DOC_CHARS:
+                    header = serialize_row(r[header_cols])
+                    body = serialize_row(r[[c for c in text_cols if c not in header_cols]], max_chars=10 ** 9)
+                    passages = [f"{header} | {p}" if header else p for p in chunk_text(body)]
+            else:
+                text = serialize_row(r)
             meta: Dict[str, Any] = {
                 "source_sheet": sheet_name,
                 "record_id": rid,
@@ -90,7 +203,14 @@ def to_docs(sheets: Dict[str, pd.DataFrame]) -> List[Document]:
                 meta["department"] = r.get(dept_col)
             if date_cols:
                 meta["date"] = r.get(date_cols[0])
-            add_doc(text, meta)
+            for c in meta_cols:
+                if present(r.get(c)):
+                    meta[c] = r.get(c)
+            if passages:
+                for i, passage in enumerate(passages):
+                    add_doc(passage, {**meta, "chunk": i, "chunks": len(passages)})
+            else:
+                add_doc(text, meta)
 
     # Also index supplemental analysis report text if present
     txt_path = Path(TXT_PATH)
@@ -112,40 +232,184 @@ def to_docs(sheets: Dict[str, pd.DataFrame]) -> List[Document]:
     return docs
 
 
-def main():
-    if not Path(XLSX_PATH).exists():
-        raise FileNotFoundError(
-            f"Missing {XLSX_PATH}. Place it in the current directory before running."
-        )
-    sheets = load_sheets(XLSX_PATH)
-    docs = to_docs(sheets)
-    total = len(docs)
-    print(f"Prepared {total} docs")
+def doc_report(docs: List[Document]) -> Dict[str, Dict[str, float]]:
+    """Per-sheet document count and embedding tokens (mean, p95, total per document)"""
+    report: Dict[str, Dict[str, float]] = {}
+    for sheet, group in group_by_sheet(docs).items():
+        tokens = pd.Series([count_tokens(d.page_content) for d in group])
+        report[sheet] = {"docs": len(group), "tokens_mean": round(float(tokens.mean()), 1),
+                         "tokens_p95": round(float(tokens.quantile(0.95)), 1), "tokens_total": int(tokens.sum())}
+    return report
 
-    if total == 0:
-        raise RuntimeError("No documents prepared for indexing.")
 
-    embeddings = OpenAIEmbeddings(model="text-embedding-3-small")
+def print_doc_report(before: Dict[str, Dict[str, float]], after: Dict[str, Dict[str, float]]):
+    """Tokens per doc and total embedding tokens (the build cost) for two document layouts"""
+    print(f"{'sheet':<22}{'docs':>7}{'tokens/doc':>20}{'p95':>16}{'embedding tokens':>26}")
+    for sheet in sorted(set(before) | set(after)):
+        b, a = before.get(sheet, {}), after.get(sheet, {})
+        print(f"{sheet:<22}{a.get('docs', b.get('docs', 0)):>7}"
+              f"{b.get('tokens_mean', 0):>9} -> {a.get('tokens_mean', 0):<7}"
+              f"{b.get('tokens_p95', 0):>6} -> {a.get('tokens_p95', 0):<6}"
+              f"{b.get('tokens_total', 0):>12} -> {a.get('tokens_total', 0):<10}")
+    total_b = sum(r["tokens_total"] for r in before.values())
+    total_a = sum(r["tokens_total"] for r in after.values())
+    if total_b:
+        print(f"Embedding tokens: {total_b} -> {total_a} ({100 * (total_a - total_b) / total_b:+.1f}%)")
+
+
+BATCH_SIZE = 64  # keep batches modest to stay under token limits
+
 
-    # Build FAISS index in batches to avoid token-per-request limits
+def build_vector_store(docs: List[Document], embeddings, batch_size: int = BATCH_SIZE,
+                       verbose: bool = True, on_batch: Optional[Callable[[int, int], None]] = None) -> FAISS:
+    # Build FAISS index in batches to avoid token-per-request limits; on_batch(done, total) after each
     texts = [d.page_content for d in docs]
     metas = [d.metadata for d in docs]
-    BATCH_SIZE = 64  # keep batches modest to stay under token limits
+    total = len(texts)
 
     vs = None
-    for i in range(0, total, BATCH_SIZE):
-        bt = texts[i:i+BATCH_SIZE]
-        bm = metas[i:i+BATCH_SIZE]
+    for i in range(0, total, batch_size):
+        bt = texts[i:i+batch_size]
+        bm = metas[i:i+batch_size]
         if vs is None:
             vs = FAISS.from_texts(bt, embeddings, metadatas=bm)
         else:
             vs.add_texts(bt, metadatas=bm)
-        print(f"Indexed {min(i+BATCH_SIZE, total)}/{total}")
+        if verbose:
+            print(f"Indexed {min(i+batch_size, total)}/{total}")
+        if on_batch is not None:
+            on_batch(min(i + batch_size, total), total)
+    return vs
+
+
+def content_hash(docs: List[Document]) -> str:
+    """Fingerprint of a partition's documents; unchanged partitions are not re-embedded"""
+    h = hashlib.sha1()
+    for d in docs:
+        h.update(str(d.metadata.get("record_id")).encode("utf-8"))
+        h.update(d.page_content.encode("utf-8"))
+    return h.hexdigest()
+
+
+def group_by_sheet(docs: List[Document]) -> Dict[str, List[Document]]:
+    groups: Dict[str, List[Document]] = {}
+    for d in docs:
+        groups.setdefault(d.metadata.get("source_sheet") or "Unknown", []).append(d)
+    return groups
+
+
+def build_partitions(docs: List[Document], embeddings, verbose: bool = False) -> Dict[str, FAISS]:
+    """In-memory {sheet: FAISS} for retrieval.PartitionedStore"""
+    return {sheet: build_vector_store(group, embeddings, verbose=verbose) for sheet, group in group_by_sheet(docs).items()}
+
+
+def write_partitions_file(entries: Dict[str, Dict[str, Any]], index_dir: str):
+    tmp = os.path.join(index_dir, retrieval.PARTITIONS_FILE + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(entries, f, indent=2)
+    os.replace(tmp, os.path.join(index_dir, retrieval.PARTITIONS_FILE))
+
+
+def save_partitions(docs: List[Document], embeddings, index_dir: str = PERSIST_DIR,
+                    sheets: Optional[List[str]] = None, full: bool = False,
+                    progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Dict[str, Any]]:
+    """Write one FAISS index per sheet and partitions.json; returns the partition entries.
+
+    Only partitions whose documents changed are rebuilt, unless full is set or the
+    embedder changed; with sheets given, only those partitions are considered.
+    partitions.json is rewritten after every partition, so an interrupted build
+    resumes where it stopped. progress(event) receives {"event": "embedded",
+    "sheet", "done", "total"} per batch and {"event": "saved" | "unchanged",
+    "sheet", "docs"} per partition; an exception raised from it aborts the build.
+    """
+    existing = retrieval.read_partitions(index_dir)
+    valid = existing
+    if existing and backends.read_signature(index_dir) != backends.embedding_signature(embeddings):
+        if sheets is not None:
+            raise ValueError("The embedder changed since the last build; rebuild every partition with --full")
+        full = True
+        valid = {}
+    os.makedirs(index_dir, exist_ok=True)
+    backends.write_signature(embeddings, index_dir)
+    # The file only ever lists partitions built with this embedder
+    entries: Dict[str, Dict[str, Any]] = dict(valid)
+    write_partitions_file(entries, index_dir)
+    groups = group_by_sheet(docs)
+    for sheet, group in groups.items():
+        if sheets is not None and sheet not in sheets:
+            continue
+        old = valid.get(sheet)
+        digest = content_hash(group)
+        if old and not full and old["content_hash"] == digest and os.path.isdir(os.path.join(index_dir, old["dir"])):
+            print(f"{sheet}: unchanged ({len(group)} docs)")
+            if progress:
+                progress({"event": "unchanged", "sheet": sheet, "docs": len(group)})
+            continue
+        started = time.perf_counter()
+        on_batch = (lambda done, total, sheet=sheet: progress({"event": "embedded", "sheet": sheet,
+                                                              "done": done, "total": total})) if progress else None
+        vs = build_vector_store(group, embeddings, verbose=False, on_batch=on_batch)
+        rel_dir = retrieval.partition_dir(sheet)
+        vs.save_local(os.path.join(index_dir, rel_dir))
+        entries[sheet] = {"dir": rel_dir, "docs": len(group),
+                          "records": len({d.metadata.get("record_id") for d in group}), "content_hash": digest,
+                          "built": time.strftime("%Y-%m-%d %H:%M:%S"),
+                          "build_seconds": round(time.perf_counter() - started, 2)}
+        write_partitions_file(entries, index_dir)
+        print(f"{sheet}: indexed {len(group)} docs in {entries[sheet]['build_seconds']}s")
+        if progress:
+            progress({"event": "saved", "sheet": sheet, "docs": len(group)})
+
+    # Partitions of sheets that no longer produce documents
+    for sheet, old in existing.items():
+        if sheet not in groups and (sheets is None or sheet in sheets):
+            shutil.rmtree(os.path.join(index_dir, old["dir"]), ignore_errors=True)
+            entries.pop(sheet, None)
+    write_partitions_file(entries, index_dir)
+    return entries
+
+
+def main(argv: Optional[list] = None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Build the per-sheet FAISS indexes")
+    parser.add_argument("--sheets", help="Comma-separated partitions (source sheets) to rebuild; default: all that changed")
+    parser.add_argument("--full", action="store_true", help="Rebuild every partition even if unchanged")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="Parquet dataset to index (default: %(default)s)")
+    parser.add_argument("--index-dir", default=PERSIST_DIR, help="Where the partitions are written (default: %(default)s)")
+    parser.add_argument("--templates", default=os.getenv("VEHS_DOC_TEMPLATES"),
+                        help="JSON file of per-sheet document templates overriding DOC_TEMPLATES")
+    parser.add_argument("--report", action="store_true",
+                        help="Print tokens per doc for the templates vs full row dumps and exit (no embedding)")
+    args = parser.parse_args(argv)
+
+    if not data_store.data_available(args.data_dir, XLSX_PATH):
+        raise FileNotFoundError(
+            f"Missing {args.data_dir}/ and {XLSX_PATH}. Run vehs_pipeline.py or place the workbook "
+            "in the current directory before running."
+        )
+    only = [x.strip() for x in args.sheets.split(",")] if args.sheets else None
+    sheets = load_sheets(XLSX_PATH, args.data_dir)
+    selected = {name: df for name, df in sheets.items() if only is None or name in only}
+    templates = load_templates(args.templates)
+    if args.report:
+        print_doc_report(doc_report(to_docs(selected, templates={})), doc_report(to_docs(selected, templates)))
+        return
+    docs = to_docs(selected, templates)
+    if only is not None:
+        docs = [d for d in docs if d.metadata.get("source_sheet") in only]
+    total = len(docs)
+    print(f"Prepared {total} docs")
+
+    if total == 0:
+        raise RuntimeError("No documents prepared for indexing.")
+
+    # Selected by VEHS_BACKEND / VEHS_EMBEDDINGS (see backends.py); the bot must use the same embedder
+    embeddings = backends.get_embeddings()
 
     # Persist
-    Path(PERSIST_DIR).mkdir(exist_ok=True)
-    vs.save_local(PERSIST_DIR)
-    print(f"Saved FAISS index to {PERSIST_DIR}")
+    Path(args.index_dir).mkdir(parents=True, exist_ok=True)
+    entries = save_partitions(docs, embeddings, args.index_dir, sheets=only, full=args.full)
+    print(f"Saved {len(entries)} FAISS partitions to {args.index_dir}/{retrieval.PARTITIONS_SUBDIR}")
 
 
 if __name__ == "__main__":
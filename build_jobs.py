@@ -0,0 +1,378 @@
+"""
+Background index builds and data ingests for the Streamlit app.
+
+BuildJob runs the build_index.py steps (load sheets -> to_docs -> embed and
+save each partition) in a separate process, so chat requests keep their
+CPU/GIL and the app never waits on embedding calls. The worker reports
+progress over a bounded queue:
+  {"event": "prepared", ...}                     documents built from the sheets
+  {"event": "embedded", "sheet", ...}            after every embedding batch
+  {"event": "saved" | "unchanged", "sheet", ...} per partition
+  {"event": "finished" | "cancelled" | "failed", ...} once, at the end
+Every event carries the running totals (docs_prepared, docs_embedded,
+docs_added, partitions_done), so updates the worker drops while the queue
+is full (nobody polling) lose nothing.
+
+cancel() sets an event the worker checks after every batch. Because
+build_index.save_partitions rewrites partitions.json after each partition,
+resume() (a new job on the same directories) only re-embeds the partitions
+that were not finished. The job's parameters and last status are kept in
+<index_dir>/build_job.json, so an interrupted build can be resumed after an
+app restart. With a release name the finished index is published
+(releases.publish), which the running app then swaps in.
+
+IngestJob does the same for a newly uploaded raw VEHS export: the worker
+runs VEHSDataPipeline on it (incremental against the release's seeded data,
+one sheet at a time) into the release's data directory, then builds the
+index as above and publishes. Before that it reports
+  {"event": "processing"}  and  {"event": "processed", ...}
+with rows/s, MB/s and the worker's peak RSS. The cap is on resident memory,
+not address space: a watchdog thread in the worker checks the peak RSS every
+MEMORY_CHECK_SECONDS and, once it passes INGEST_MEMORY_MB (during processing
+or the embedding build), fails the job and ends the worker, so a workbook too
+large for the host never pushes the app into swap. Address-space limits
+(RLIMIT_AS) are not used because pyarrow, BLAS and torch reserve far more
+address space than they touch.
+"""
+import contextlib
+import json
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from typing import Any, BinaryIO, Callable, Dict, List, Optional
+
+PROGRESS_QUEUE_SIZE = 64
+JOB_FILE = "build_job.json"
+FINAL_EVENTS = {"finished", "cancelled", "failed"}
+# Largest accepted upload (Streamlit's own server.maxUploadSize defaults to 200 MB as well)
+MAX_UPLOAD_MB = float(os.getenv("VEHS_MAX_UPLOAD_MB", "200"))
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+# Peak RSS cap of the ingest worker in MB (0 = no cap); processing a 100 MB export peaks at about 3 GB
+INGEST_MEMORY_MB = int(os.getenv("VEHS_INGEST_MEMORY_MB", "6144"))
+MEMORY_CHECK_SECONDS = 0.5
+INGEST_REPORT = "ingest_report.json"
+
+
+class BuildCancelled(Exception):
+    pass
+
+
+def _reporter(events: "mp.Queue", cancel: "mp.synchronize.Event", totals: Dict[str, Any]) -> Callable:
+    """Worker-side progress callback: folds `event` into `totals` and queues both (dropped when the queue is full)"""
+    embedded: Dict[str, int] = {}
+
+    def emit(event: Dict[str, Any]):
+        if cancel.is_set():
+            raise BuildCancelled()
+        if event["event"] == "embedded":
+            embedded[event["sheet"]] = event["done"]
+            totals["docs_embedded"] = sum(embedded.values())
+        elif event["event"] in ("saved", "unchanged"):
+            totals["docs_added"] += event["docs"]
+            totals["partitions_done"] += 1
+        try:
+            events.put_nowait({**event, **totals})
+        except queue.Full:
+            pass
+
+    return emit
+
+
+def _finish(events: "mp.Queue", final: Dict[str, Any], totals: Dict[str, Any]):
+    try:
+        events.put({**final, **totals}, timeout=60)
+    except queue.Full:
+        pass
+
+
+def _build(params: Dict[str, Any], emit: Callable, totals: Dict[str, Any]) -> int:
+    """build_index steps over params' directories; returns the number of partitions"""
+    import backends
+    import build_index
+    import data_store
+
+    sheets = data_store.load_sheets(params["data_dir"], build_index.XLSX_PATH)
+    if not sheets:
+        raise FileNotFoundError(f"No dataset in {params['data_dir']}/")
+    only = params.get("sheets")
+    docs = build_index.to_docs({n: df for n, df in sheets.items() if only is None or n in only},
+                               build_index.load_templates(params.get("templates")))
+    if only is not None:
+        docs = [d for d in docs if d.metadata.get("source_sheet") in only]
+    totals["docs_prepared"] = len(docs)
+    del sheets
+    emit({"event": "prepared"})
+    entries = build_index.save_partitions(docs, backends.get_embeddings(), params["index_dir"],
+                                          sheets=only, full=params.get("full", False), progress=emit)
+    return len(entries)
+
+
+def _worker(params: Dict[str, Any], events: "mp.Queue", cancel: "mp.synchronize.Event"):
+    """Process entry point: one build_index run over params' directories, reporting to `events`"""
+    # Imported here so the parent process does not pay for them again (spawn start method)
+    import releases
+
+    totals = {"docs_prepared": 0, "docs_embedded": 0, "docs_added": 0, "partitions_done": 0}
+    emit = _reporter(events, cancel, totals)
+    try:
+        partitions = _build(params, emit, totals)
+        if params.get("release"):
+            releases.publish(params["release"])
+        final = {"event": "finished", "partitions": partitions}
+    except BuildCancelled:
+        final = {"event": "cancelled"}
+    except Exception as e:
+        final = {"event": "failed", "error": f"{type(e).__name__}: {e}"}
+    _finish(events, final, totals)
+
+
+def _watch_memory(megabytes: int, events: "mp.Queue", totals: Dict[str, Any]):
+    """Start a worker-side thread that fails the job once the process's peak RSS passes `megabytes`.
+
+    The pipeline and the embedding build never hand control back while they run,
+    so the check runs beside them and ends the process itself (nothing is
+    published yet at that point). No-op where peak RSS is unavailable (Windows).
+    """
+    from vehs_pipeline import peak_rss_mb
+
+    def watch():
+        while True:
+            time.sleep(MEMORY_CHECK_SECONDS)
+            peak = peak_rss_mb()
+            if peak is not None and peak > megabytes:
+                _finish(events, {"event": "failed", "error": f"Memory cap exceeded: peak RSS {peak:,.0f} MB "
+                                                             f"> {megabytes} MB (VEHS_INGEST_MEMORY_MB)"},
+                        {**totals, "peak_rss_mb": peak})
+                # Flush the queue's feeder thread before exiting
+                events.close()
+                events.join_thread()
+                os._exit(1)
+
+    if megabytes and peak_rss_mb() is not None:
+        threading.Thread(target=watch, name="vehs-memory-watch", daemon=True).start()
+
+
+def _ingest_worker(params: Dict[str, Any], events: "mp.Queue", cancel: "mp.synchronize.Event"):
+    """Process entry point: VEHSDataPipeline on the uploaded export, then the index build, then publish"""
+    import releases
+    import vehs_pipeline
+
+    totals = {"docs_prepared": 0, "docs_embedded": 0, "docs_added": 0, "partitions_done": 0,
+              "stage": "indexing", "docs_per_s": 0.0, "peak_rss_mb": None}
+    emit = _reporter(events, cancel, totals)
+    try:
+        _watch_memory(params.get("memory_mb"), events, totals)
+        if params.get("process", True):
+            totals.update(stage="processing", rows_processed=0, upload_mb=0.0, rows_per_s=0.0, mb_per_s=0.0)
+            emit({"event": "processing"})
+            totals["upload_mb"] = round(os.path.getsize(params["upload"]) / 1024 ** 2, 1)
+            started = time.perf_counter()
+            # Chained/incremental: one sheet's raw and processed frames alive at a time, unchanged records reused
+            pipeline = vehs_pipeline.VEHSDataPipeline(params["upload"])
+            report = pipeline.run_pipeline(chained=True, incremental=params.get("incremental", True),
+                                           data_dir=params["data_dir"], excel_output=False)
+            elapsed = max(time.perf_counter() - started, 1e-9)
+            totals.update(rows_processed=pipeline.run_profile.get("rows", 0),
+                          rows_per_s=round(pipeline.run_profile.get("rows", 0) / elapsed, 1),
+                          mb_per_s=round(totals["upload_mb"] / elapsed, 2),
+                          peak_rss_mb=vehs_pipeline.peak_rss_mb(), stage="indexing")
+            with open(os.path.join(os.path.dirname(params["data_dir"]), INGEST_REPORT), "w") as f:
+                json.dump(report, f, indent=2, default=str)
+            del pipeline, report
+            emit({"event": "processed"})
+        totals["stage"] = "indexing"
+        started = time.perf_counter()
+        partitions = _build(params, emit, totals)
+        totals.update(docs_per_s=round(totals["docs_embedded"] / max(time.perf_counter() - started, 1e-9), 1),
+                      peak_rss_mb=vehs_pipeline.peak_rss_mb())
+        if params.get("release"):
+            releases.publish(params["release"])
+        final = {"event": "finished", "partitions": partitions}
+    except BuildCancelled:
+        final = {"event": "cancelled"}
+    except Exception as e:
+        final = {"event": "failed", "error": f"{type(e).__name__}: {e}"}
+    _finish(events, final, totals)
+
+
+def stage_upload(source: BinaryIO, path: str, max_mb: float = MAX_UPLOAD_MB) -> float:
+    """Copy an uploaded workbook to `path` in UPLOAD_CHUNK_BYTES pieces; returns its size in MB.
+
+    Raises ValueError, leaving nothing behind, for empty or oversized files and
+    files that are not xlsx (zip) workbooks.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    size = 0
+    try:
+        with open(path + ".tmp", "wb") as out:
+            while True:
+                chunk = source.read(UPLOAD_CHUNK_BYTES)
+                if not chunk:
+                    break
+                if not size and not chunk.startswith(b"PK"):
+                    raise ValueError("The upload is not an .xlsx workbook")
+                size += len(chunk)
+                if size > max_mb * 1024 ** 2:
+                    raise ValueError(f"The upload is larger than {max_mb:g} MB")
+                out.write(chunk)
+        if not size:
+            raise ValueError("The upload is empty")
+    except BaseException:
+        # open() itself may have failed (permissions, missing directory); keep that error
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(path + ".tmp")
+        raise
+    os.replace(path + ".tmp", path)
+    return round(size / 1024 ** 2, 1)
+
+
+class BuildJob:
+    """One index build in a worker process; poll() folds its progress events into `status`"""
+
+    KIND = "build"
+    STATUS_FIELDS = ("docs_prepared", "docs_embedded", "docs_added", "partitions_done")
+    worker = staticmethod(_worker)
+
+    def __init__(self, data_dir: str, index_dir: str, sheets: Optional[List[str]] = None, full: bool = False,
+                 release: Optional[str] = None, templates: Optional[str] = None):
+        self.params = {"data_dir": data_dir, "index_dir": index_dir, "sheets": sheets, "full": full,
+                       "release": release, "templates": templates}
+        self.status: Dict[str, Any] = {"state": "pending", "docs_prepared": 0, "docs_embedded": 0, "docs_added": 0,
+                                       "partitions_done": 0, "sheet": None, "error": None}
+        self.process: Optional[mp.Process] = None
+        self.events: Optional["mp.Queue"] = None
+        self.cancel_event = None
+        self.started: Optional[float] = None
+
+    def start(self) -> "BuildJob":
+        ctx = mp.get_context("spawn")
+        self.events = ctx.Queue(PROGRESS_QUEUE_SIZE)
+        self.cancel_event = ctx.Event()
+        self.process = ctx.Process(target=self.worker, args=(self.params, self.events, self.cancel_event),
+                                   name=f"vehs-{self.KIND}", daemon=True)
+        self.started = time.time()
+        self.process.start()
+        self.status["state"] = "running"
+        self._save()
+        return self
+
+    @property
+    def running(self) -> bool:
+        return self.status["state"] == "running"
+
+    def poll(self) -> Dict[str, Any]:
+        """Apply the queued progress events (never blocks); returns the status"""
+        while self.events is not None:
+            try:
+                event = self.events.get_nowait()
+            except queue.Empty:
+                break
+            self._apply(event)
+        if self.running and self.process is not None and not self.process.is_alive():
+            # The final event may still be in the pipe right after the process exits
+            try:
+                self._apply(self.events.get(timeout=1))
+            except queue.Empty:
+                self._apply({"event": "failed", "error": f"worker exited with code {self.process.exitcode}"})
+        self.status["elapsed_s"] = round(time.time() - self.started, 1) if self.started else 0.0
+        return self.status
+
+    def _apply(self, event: Dict[str, Any]):
+        kind = event.get("event")
+        st = self.status
+        st.update({k: event[k] for k in self.STATUS_FIELDS if k in event})
+        if "sheet" in event:
+            st["sheet"] = event["sheet"]
+        if kind in FINAL_EVENTS:
+            st["state"] = kind
+            st["error"] = event.get("error")
+            st["sheet"] = None
+            self._save()
+
+    def cancel(self):
+        """Ask the worker to stop after its current embedding batch"""
+        if self.cancel_event is not None and self.running:
+            self.cancel_event.set()
+
+    def resume(self) -> "BuildJob":
+        """A new (not yet started) job for the unfinished partitions; finished ones are skipped as unchanged"""
+        return BuildJob(**{**self.params, "full": False})
+
+    def _save(self):
+        os.makedirs(self.params["index_dir"], exist_ok=True)
+        path = os.path.join(self.params["index_dir"], JOB_FILE)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"kind": self.KIND, "params": self.params, "status": self.status}, f, indent=2)
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def last(cls, index_dir: str) -> Optional["BuildJob"]:
+        """The job last recorded in index_dir (not running: its process belonged to an earlier app run)"""
+        path = os.path.join(index_dir, JOB_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            saved = json.load(f)
+        job = _JOB_KINDS.get(saved.get("kind"), cls)(**saved["params"])
+        job.status.update(saved["status"])
+        if job.status["state"] in ("running", "pending"):
+            job.status["state"] = "interrupted"
+        return job
+
+
+class IngestJob(BuildJob):
+    """Pipeline run on an uploaded export plus index build of a release, in one worker process"""
+
+    KIND = "ingest"
+    STATUS_FIELDS = BuildJob.STATUS_FIELDS + ("stage", "rows_processed", "upload_mb", "rows_per_s", "mb_per_s",
+                                              "docs_per_s", "peak_rss_mb")
+    worker = staticmethod(_ingest_worker)
+
+    def __init__(self, upload: str, data_dir: str, index_dir: str, release: Optional[str] = None,
+                 templates: Optional[str] = None, memory_mb: int = INGEST_MEMORY_MB, incremental: bool = True,
+                 process: bool = True):
+        super().__init__(data_dir, index_dir, release=release, templates=templates)
+        self.params.update(upload=upload, memory_mb=memory_mb, incremental=incremental, process=process)
+        del self.params["sheets"], self.params["full"]
+        self.status.update(stage="processing" if process else "indexing", rows_processed=0, upload_mb=0.0,
+                           rows_per_s=0.0, mb_per_s=0.0, docs_per_s=0.0, peak_rss_mb=None)
+
+    def cancel(self):
+        """Stop after the current embedding batch; a pipeline run cannot pause, so it is terminated"""
+        if self.running and self.status["stage"] == "processing" and self.process is not None:
+            # The release is not published yet, so a half-written data directory is never served
+            self.process.terminate()
+            self.process.join(5)
+            self._apply({"event": "cancelled"})
+        else:
+            super().cancel()
+
+    def resume(self) -> "IngestJob":
+        """A new job that skips processing when it had finished, else reprocesses the whole upload"""
+        if self.status["stage"] == "indexing":
+            job = IngestJob(**{**self.params, "process": False})
+            job.status.update({k: self.status[k] for k in ("rows_processed", "upload_mb", "rows_per_s", "mb_per_s")})
+            return job
+        # The data directory may be partly rewritten, so nothing in it can be reused
+        return IngestJob(**{**self.params, "incremental": False, "process": True})
+
+
+_JOB_KINDS = {BuildJob.KIND: BuildJob, IngestJob.KIND: IngestJob}
+
+# One build or ingest at a time per app process, shared by every Streamlit session
+_current: Optional[BuildJob] = None
+
+
+def current_job() -> Optional[BuildJob]:
+    return _current
+
+
+def start_job(job: BuildJob) -> BuildJob:
+    """Start `job` unless another build or ingest is still running"""
+    global _current
+    if _current is not None and _current.poll()["state"] == "running":
+        raise RuntimeError(f"A {_current.KIND} job is already running")
+    _current = job.start()
+    return _current
@@ -0,0 +1,159 @@
+"""
+Columnar storage for processed VEHS sheets.
+
+vehs_pipeline.py writes one Parquet file per sheet plus a manifest.json into
+DATA_DIR; bot.py and build_index.py read those files directly and only fall
+back to parsing the processed xlsx when no columnar dataset exists.
+
+Layout:
+  vehs_data/
+    manifest.json
+    row_fingerprints.parquet   (per-record hashes for incremental pipeline runs)
+    incident.parquet
+    hazard_id.parquet
+    ...
+"""
+import json
+import os
+import re
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+import pandas as pd
+
+import vehs_schema
+
+DATA_DIR = "vehs_data"
+XLSX_PATH = os.getenv("VEHS_XLSX_PATH", "EPCL_VEHS_Data_Processed.xlsx")
+MANIFEST_NAME = "manifest.json"
+FINGERPRINTS_NAME = "row_fingerprints.parquet"
+
+
+def sheet_file_name(sheet_name: str) -> str:
+    """File-system friendly Parquet name for a sheet, e.g. 'Hazard ID' -> 'hazard_id.parquet'."""
+    slug = re.sub(r"[^0-9a-zA-Z]+", "_", sheet_name).strip("_").lower()
+    return f"{slug or 'sheet'}.parquet"
+
+
+def _parquet_safe(df: pd.DataFrame) -> pd.DataFrame:
+    """Cast object columns holding mixed Python types to strings so Arrow can store them."""
+    out = df
+    for col in df.columns[df.dtypes == object]:
+        kinds = df[col].dropna().map(type).unique()
+        if len(kinds) > 1:
+            if out is df:
+                out = df.copy(deep=False)
+            out[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    return out
+
+
+def write_sheets(sheets: Dict[str, pd.DataFrame], data_dir: str = DATA_DIR,
+                 source: Optional[str] = None) -> Dict[str, Any]:
+    """Write each sheet to Parquet and a manifest describing them; returns the manifest."""
+    out_dir = Path(data_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    manifest: Dict[str, Any] = {
+        "created": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "source": source,
+        "sheets": [],
+    }
+    for sheet_name, df in sheets.items():
+        file_name = sheet_file_name(sheet_name)
+        _parquet_safe(df).to_parquet(out_dir / file_name, index=False)
+        manifest["sheets"].append({
+            "name": sheet_name,
+            "file": file_name,
+            "rows": int(len(df)),
+            "columns": int(len(df.columns)),
+            "dtypes": {str(c): str(t) for c, t in df.dtypes.items()},
+        })
+    (out_dir / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    return manifest
+
+
+def read_parquet(path) -> pd.DataFrame:
+    """Read a Parquet file, restoring text columns as Arrow-backed strings when pyarrow is present."""
+    try:
+        with pd.option_context("mode.string_storage", "pyarrow"):
+            return pd.read_parquet(path)
+    except (ImportError, ValueError, KeyError):
+        return pd.read_parquet(path)
+
+
+def read_manifest(data_dir: str = DATA_DIR) -> Optional[Dict[str, Any]]:
+    path = Path(data_dir) / MANIFEST_NAME
+    if not path.exists():
+        return None
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def coerce_date_columns(sheets: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
+    """Coerce common date columns found in reports (same rule the loaders always used)."""
+    for name, df in sheets.items():
+        for col in df.columns:
+            if any(k in col.lower() for k in ["date", "entered", "start"]):
+                if not pd.api.types.is_datetime64_any_dtype(df[col]):
+                    df[col] = pd.to_datetime(df[col], errors="coerce")
+    return sheets
+
+
+def read_sheets(data_dir: str = DATA_DIR) -> Dict[str, pd.DataFrame]:
+    """Read the columnar dataset exactly as written (no date coercion); empty if absent."""
+    manifest = read_manifest(data_dir)
+    if manifest is None:
+        return {}
+    return {
+        entry["name"]: read_parquet(Path(data_dir) / entry["file"])
+        for entry in manifest["sheets"]
+    }
+
+
+def load_sheets(data_dir: str = DATA_DIR, xlsx_path: str = XLSX_PATH,
+                memory_report: Optional[Dict[str, Dict[str, float]]] = None) -> Dict[str, pd.DataFrame]:
+    """Load processed sheets, preferring the columnar dataset over the xlsx export.
+
+    The declared dtypes from vehs_schema are applied to every known sheet; pass a
+    dict as memory_report to receive the before/after memory (MB) per sheet.
+    Returns an empty dict when neither exists.
+    """
+    sheets = read_sheets(data_dir)
+    if not sheets:
+        if not Path(xlsx_path).exists():
+            return {}
+        sheets = pd.read_excel(xlsx_path, sheet_name=None)
+    report = vehs_schema.apply_schemas(sheets)
+    if memory_report is not None:
+        memory_report.update(report)
+    return coerce_date_columns(sheets)
+
+
+def write_fingerprints(fingerprints: Dict[str, pd.Series], data_dir: str = DATA_DIR):
+    """Persist {sheet: Series(record_key -> uint64 fingerprint)} for the next incremental run.
+
+    An empty dict (no sheet with a record key) writes nothing and leaves an existing file alone.
+    """
+    path = Path(data_dir) / FINGERPRINTS_NAME
+    frames = [
+        pd.DataFrame({"sheet": sheet, "record_key": fp.index.astype(str), "fingerprint": fp.to_numpy()})
+        for sheet, fp in fingerprints.items()
+    ]
+    if not frames:
+        return
+    Path(data_dir).mkdir(parents=True, exist_ok=True)
+    pd.concat(frames, ignore_index=True).to_parquet(path, index=False)
+
+
+def read_fingerprints(data_dir: str = DATA_DIR) -> Optional[Dict[str, pd.Series]]:
+    path = Path(data_dir) / FINGERPRINTS_NAME
+    if not path.exists():
+        return None
+    df = read_parquet(path)
+    return {
+        sheet: group.set_index("record_key")["fingerprint"]
+        for sheet, group in df.groupby("sheet", sort=False)
+    }
+
+
+def data_available(data_dir: str = DATA_DIR, xlsx_path: str = XLSX_PATH) -> bool:
+    return (Path(data_dir) / MANIFEST_NAME).exists() or Path(xlsx_path).exists()
@@ -0,0 +1,134 @@
+"""
+Compact, token-budgeted context for the synthesis prompts in bot.py.
+
+The analytics used to go into the prompt as a Python dict repr, with every
+hazard's full playbook and sample list, followed by five 350-char snippets.
+build_context() renders the same information densely instead:
+  - one Markdown table row per hazard (count, severity, recency, score, cited IDs),
+  - the playbook steps once, referenced by hazard tag,
+  - retrieved snippets ranked by query overlap and FAISS score, trimmed,
+and then enforces a token cap (CONTEXT_TOKEN_BUDGET, counted with tiktoken
+via telemetry.count_tokens) by dropping the least relevant snippets first,
+then shortening the rest, then dropping the lowest-ranked hazards.
+
+legacy_context() reproduces the old format for before/after comparisons
+(benchmark.py --only synthesis).
+"""
+import os
+import re
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from telemetry import count_tokens
+
+# Token cap for analytics + snippets (the fixed instructions are not counted)
+CONTEXT_TOKEN_BUDGET = int(os.getenv("VEHS_CONTEXT_TOKENS", "900"))
+MAX_SNIPPETS = 5
+SNIPPET_CHARS = 240
+MIN_SNIPPET_CHARS = 80
+MAX_SAMPLE_IDS = 3
+
+# hazard_analytics() labels its sources with short codes; citations use sheet names
+SAMPLE_SHEETS = {"haz": "Hazard ID", "aud": "Audit Findings", "ins": "Inspection Findings"}
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def analytics_table(analytics: Dict[str, Any], max_rows: Optional[int] = None) -> str:
+    """Markdown table of the ranked hazards plus their playbook steps, each distinct list once"""
+    top = (analytics or {}).get("top") or []
+    if max_rows is not None:
+        top = top[:max_rows]
+    if not top:
+        return "none"
+    lines = ["| # | hazard | count | avg_sev | recent | score | cited |", "|---|---|---|---|---|---|---|"]
+    for i, h in enumerate(top, 1):
+        cited = ", ".join(f"{SAMPLE_SHEETS.get(s.get('source'), s.get('source'))}:{s.get('id')}"
+                          for s in (h.get("samples") or [])[:MAX_SAMPLE_IDS])
+        lines.append(f"| {i} | {h.get('hazard')} | {h.get('count')} | {h.get('avg_sev')} | "
+                     f"{h.get('recent')} | {h.get('concern_score')} | {cited} |")
+    # Hazards sharing a playbook (e.g. everything that falls back to "Other") list it once
+    playbook: Dict[Tuple[str, ...], List[str]] = {}
+    for h in top:
+        if h.get("steps"):
+            playbook.setdefault(tuple(h["steps"]), []).append(str(h.get("hazard")))
+    if playbook:
+        lines += ["", "Playbook (by hazard):"]
+        lines += [f"- {', '.join(names)}: {' '.join(steps)}" for steps, names in playbook.items()]
+    return "\n".join(lines)
+
+
+def _snippet(doc: Any, chars: int) -> str:
+    meta = doc.metadata or {}
+    content = " ".join((doc.page_content or "").split())
+    if len(content) > chars:
+        content = content[:chars].rsplit(" ", 1)[0] + "…"
+    return f"[{meta.get('source_sheet') or ''}:{meta.get('record_id') or ''}] {content}"
+
+
+def rank_docs(query: str, docs: List[Any]) -> List[Any]:
+    """Order docs by word overlap with the query, FAISS distance (lower is closer) breaking ties"""
+    words = set(_WORD_RE.findall((query or "").lower()))
+
+    def key(item: Tuple[int, Any]):
+        i, d = item
+        overlap = len(words & set(_WORD_RE.findall((d.page_content or "").lower())))
+        score = (d.metadata or {}).get("score")
+        return (-overlap, score if score is not None else float("inf"), i)
+
+    return [d for _, d in sorted(enumerate(docs), key=key)]
+
+
+def context_profile(docs: List[Any]) -> str:
+    sheet_counts: Counter = Counter()
+    ids: List[str] = []
+    for d in docs:
+        md = d.metadata or {}
+        sheet = md.get("source_sheet") or "Unknown"
+        sheet_counts[sheet] += 1
+        if md.get("record_id"):
+            ids.append(f"{sheet}:{md['record_id']}")
+    counts_str = ", ".join(f"{k}={v}" for k, v in sheet_counts.items()) or "none"
+    ids_str = ", ".join(ids[:10]) or "none"
+    return f"total={len(docs)}; by_sheet={counts_str}; ids={ids_str}"
+
+
+def build_context(query: str, analytics: Optional[Dict[str, Any]], docs: List[Any],
+                  budget: int = CONTEXT_TOKEN_BUDGET) -> Dict[str, Any]:
+    """{"analytics", "snippets", "context_profile", "tokens"} fitted to `budget` tokens (0 = no cap)"""
+    ranked = rank_docs(query, docs)[:MAX_SNIPPETS]
+    n_snippets, chars = len(ranked), SNIPPET_CHARS
+    n_hazards = len((analytics or {}).get("top") or [])
+
+    def render() -> Tuple[str, str, int]:
+        table = analytics_table(analytics, n_hazards) if analytics is not None else ""
+        snippets = "\n".join(_snippet(d, chars) for d in ranked[:n_snippets])
+        return table, snippets, count_tokens(table) + count_tokens(snippets)
+
+    table, snippets, tokens = render()
+    while budget and tokens > budget:
+        # Keep at least two snippets at full length before shortening them
+        if n_snippets > 2:
+            n_snippets -= 1
+        elif chars > MIN_SNIPPET_CHARS:
+            chars = max(MIN_SNIPPET_CHARS, chars * 2 // 3)
+        elif n_hazards > 1:
+            n_hazards -= 1
+        elif n_snippets > 0:
+            n_snippets -= 1
+        else:
+            break
+        table, snippets, tokens = render()
+    return {"analytics": table, "snippets": snippets, "context_profile": context_profile(docs), "tokens": tokens}
+
+
+def legacy_context(query: str, analytics: Optional[Dict[str, Any]], docs: List[Any]) -> Dict[str, Any]:
+    """The pre-budget prompt context: analytics dict repr and the first five 350-char snippets"""
+    snippets = "\n".join(
+        f"[{(d.metadata or {}).get('source_sheet') or ''}:{(d.metadata or {}).get('record_id') or ''}] "
+        + (d.page_content or "")[:350].replace("\n", " ")
+        for d in docs[:5]
+    )
+    table = str(analytics or {}) if analytics is not None else ""
+    return {"analytics": table, "snippets": snippets, "context_profile": context_profile(docs),
+            "tokens": count_tokens(table) + count_tokens(snippets)}
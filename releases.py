@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Versioned data/index releases with an atomic "current" pointer.
+
+Refreshing used to mean overwriting vehs_data/ and vehsvdb/ in place while
+the app was reading them. A release is instead a self-contained directory
+  releases/
+    CURRENT                      (name of the live release; replaced atomically)
+    20261019-061433/
+      vehs_data/                 (vehs_pipeline.py --data-dir)
+      vehsvdb/                   (build_index.py --index-dir)
+      upload.xlsx                (raw export, when ingested from the Streamlit app)
+that is prepared offline and then published by rewriting CURRENT
+(write-then-rename, so readers see either the old or the new name).
+Running processes poll CURRENT with PointerWatcher, load the new release in
+the background and swap it in under a SwapLock: requests hold the read side
+for their whole run, so in-flight requests finish on the old release.
+
+Usage:
+  python releases.py create              # new release seeded with a copy of the current one
+  python vehs_pipeline.py --no-excel --incremental --data-dir releases/<version>/vehs_data
+  python build_index.py --data-dir releases/<version>/vehs_data --index-dir releases/<version>/vehsvdb
+  python releases.py publish <version>   # switch CURRENT; releases older than the newest KEEP are removed
+  python releases.py list
+"""
+import contextlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+import data_store
+
+RELEASES_DIR = os.getenv("VEHS_RELEASES_DIR", "releases")
+CURRENT_FILE = "CURRENT"
+DATA_SUBDIR = "vehs_data"
+INDEX_SUBDIR = "vehsvdb"
+KEEP = 3
+POLL_SECONDS = 5.0
+
+
+def release_dirs(version: str, root: str = RELEASES_DIR) -> Tuple[str, str]:
+    """(data_dir, index_dir) of a release"""
+    base = os.path.join(root, version)
+    return os.path.join(base, DATA_SUBDIR), os.path.join(base, INDEX_SUBDIR)
+
+
+def current_version(root: str = RELEASES_DIR) -> Optional[str]:
+    path = Path(root) / CURRENT_FILE
+    try:
+        return path.read_text(encoding="utf-8").strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def resolve(data_dir: str, index_dir: str, root: str = RELEASES_DIR) -> Tuple[str, str, Optional[str]]:
+    """(data_dir, index_dir, version) of the current release, else the given unversioned directories"""
+    version = current_version(root)
+    if version is None:
+        return data_dir, index_dir, None
+    return (*release_dirs(version, root), version)
+
+
+def list_versions(root: str = RELEASES_DIR) -> List[str]:
+    if not os.path.isdir(root):
+        return []
+    return sorted(d for d in os.listdir(root) if os.path.isdir(os.path.join(root, d)))
+
+
+def create(root: str = RELEASES_DIR, base: Optional[str] = None,
+           seed: Optional[Tuple[str, str]] = None) -> str:
+    """New release directory seeded with a copy of `base` (default: the current release),
+    or of the (data_dir, index_dir) in `seed` when there is no release yet.
+
+    The copy lets vehs_pipeline.py --incremental and build_index.py reuse the
+    previous data and partitions; files are copied, not linked, because both
+    tools rewrite files in place.
+    """
+    version = time.strftime("%Y%m%d-%H%M%S")
+    while os.path.exists(os.path.join(root, version)):
+        time.sleep(1)
+        version = time.strftime("%Y%m%d-%H%M%S")
+    data_dir, index_dir = release_dirs(version, root)
+    base = base or current_version(root)
+    sources = release_dirs(base, root) if base else seed
+    if sources:
+        for src, dst in zip(sources, (data_dir, index_dir)):
+            if os.path.isdir(src):
+                shutil.copytree(src, dst, ignore=shutil.ignore_patterns("*.tmp", "build_job.json"))
+    os.makedirs(data_dir, exist_ok=True)
+    os.makedirs(index_dir, exist_ok=True)
+    return version
+
+
+def is_complete(version: str, root: str = RELEASES_DIR) -> bool:
+    """A release can go live once it has a dataset manifest and a vector index"""
+    data_dir, index_dir = release_dirs(version, root)
+    index = Path(index_dir)
+    if not (Path(data_dir) / data_store.MANIFEST_NAME).exists():
+        return False
+    if (index / "partitions.json").exists():
+        # build_index.py writes the file as it goes; an empty one is a build that has not finished a partition
+        return bool(json.loads((index / "partitions.json").read_text(encoding="utf-8")))
+    return (index / "index.faiss").exists()
+
+
+def publish(version: str, root: str = RELEASES_DIR, keep: int = KEEP):
+    """Point CURRENT at `version` atomically, then prune old releases"""
+    if not is_complete(version, root):
+        raise ValueError(f"Release {version} in {root}/ has no dataset manifest or vector index")
+    fd, tmp = tempfile.mkstemp(dir=root, prefix=CURRENT_FILE, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(version + "\n")
+    os.replace(tmp, os.path.join(root, CURRENT_FILE))
+    prune(root, keep)
+
+
+def prune(root: str = RELEASES_DIR, keep: int = KEEP) -> List[str]:
+    """Remove releases older than the current one except the `keep` newest; returns the removed names.
+
+    Releases newer than the current one may still be in preparation and are left alone.
+    """
+    current = current_version(root)
+    if current is None:
+        return []
+    others = [v for v in list_versions(root) if v < current]
+    old = others[:-keep] if keep else others
+    for v in old:
+        shutil.rmtree(os.path.join(root, v), ignore_errors=True)
+    return old
+
+
+class SwapLock:
+    """Readers (requests) share the lock; the writer (a release swap) waits until no request is running.
+
+    A waiting writer holds off new readers, so steady traffic cannot postpone a swap indefinitely.
+    Readers must not nest reading() calls, or they would wait on the writer that waits on them.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer_waiting = False
+
+    @contextlib.contextmanager
+    def reading(self):
+        with self._cond:
+            self._cond.wait_for(lambda: not self._writer_waiting)
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextlib.contextmanager
+    def writing(self):
+        with self._cond:
+            # One writer at a time; each then waits for the readers already inside
+            self._cond.wait_for(lambda: not self._writer_waiting)
+            self._writer_waiting = True
+            try:
+                self._cond.wait_for(lambda: self._readers == 0)
+                yield
+            finally:
+                self._writer_waiting = False
+                self._cond.notify_all()
+
+
+class PointerWatcher(threading.Thread):
+    """Polls CURRENT and calls on_change(version) (in this thread) whenever it names a new release"""
+
+    def __init__(self, on_change: Callable[[str], object], version: Optional[str] = None,
+                 root: str = RELEASES_DIR, interval: float = POLL_SECONDS):
+        super().__init__(name="vehs-release-watcher", daemon=True)
+        self.on_change = on_change
+        self.version = version
+        self.root = root
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            version = current_version(self.root)
+            if version is None or version == self.version:
+                continue
+            try:
+                self.on_change(version)
+            except Exception as e:
+                print(f"Warning: could not load release {version}: {e}")
+            # A release that failed to load is not retried until CURRENT changes again
+            self.version = version
+
+    def stop(self):
+        self.stopped.set()
+
+
+def main(argv: Optional[list] = None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Manage versioned VEHS data/index releases")
+    parser.add_argument("--root", default=RELEASES_DIR, help="Releases directory (default: %(default)s)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("create", help="Create a release seeded with the current one; prints its name")
+    pub = sub.add_parser("publish", help="Make a release current")
+    pub.add_argument("version")
+    pub.add_argument("--keep", type=int, default=KEEP, help="Releases to keep (default: %(default)s)")
+    sub.add_parser("list", help="List releases")
+    args = parser.parse_args(argv)
+
+    if args.command == "create":
+        version = create(args.root)
+        data_dir, index_dir = release_dirs(version, args.root)
+        print(version)
+        print(f"  data:  {data_dir}\n  index: {index_dir}")
+    elif args.command == "publish":
+        publish(args.version, args.root, args.keep)
+        print(f"Current release: {args.version}")
+    else:
+        current = current_version(args.root)
+        for v in list_versions(args.root):
+            print(f"{'*' if v == current else ' '} {v}{'' if is_complete(v, args.root) else ' (incomplete)'}")
+
+
+if __name__ == "__main__":
+    main()
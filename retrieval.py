@@ -0,0 +1,283 @@
+"""
+Multi-query retrieval over the FAISS store for bot.retrieve_docs.
+
+Compound questions ("PPE issues in incidents and what audits found about
+permits") get thin, sheet-skewed context from one similarity search. Here
+the question is split deterministically into sub-queries:
+  - the whole question (so results never lose what a single search finds),
+  - its clauses, split at ';', '?', 'as well as', 'versus'/'vs', 'compared
+    to/with' and at 'and' when a new question starts ("... and what ..."),
+  - one sheet-focused query per sheet the question mentions, when it
+    mentions more than one.
+All sub-queries are embedded in one batched request and searched with one
+batched FAISS call. Hits are deduplicated by (sheet, record_id), keeping
+the best distance (so the passages of a long record collapse into its best
+one), and every mentioned sheet gets up to SHEET_QUOTA of the
+k results before the rest are filled by distance.
+
+PartitionedStore holds one FAISS sub-index per source sheet (written by
+build_index.py under vehsvdb/partitions/). route() picks the partitions a
+question needs, so audit questions no longer search incident vectors or
+the text report, and search_by_vectors() merges the partitions' hits by
+distance (all partitions share one embedder, so distances compare).
+
+rerank() reorders an over-fetched candidate set (RERANK_CANDIDATES) with
+cheap vectorized features instead of a cross-encoder: vector similarity,
+query/document word overlap, agreement with the location/department/date
+filters, recency and record severity, combined with RERANK_WEIGHTS.
+"""
+import json
+import os
+import re
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from langchain_core.documents import Document
+
+MAX_SUBQUERIES = 5
+FETCH_MULTIPLIER = 3
+SHEET_QUOTA = 2
+
+# Question wording -> the sheet that holds those records
+SHEET_TERMS: Dict[str, str] = {
+    "Incident": r"\bincidents?\b",
+    "Hazard ID": r"\bhazard (?:ids?|reports?|observations?)\b|\bnear[- ]miss(?:es)?\b",
+    "Audit Findings": r"\baudits?\b|\baudit findings?\b",
+    "Inspection Findings": r"\binspections?\b|\binspection findings?\b",
+}
+
+RERANK_CANDIDATES = 50
+RERANK_WEIGHTS: Dict[str, float] = {
+    "similarity": 1.0,
+    "lexical": 0.5,
+    "filters": 0.5,
+    "recency": 0.2,
+    "severity": 0.2,
+}
+RECENCY_HALF_LIFE_DAYS = 180
+MAX_SEVERITY = 3.0
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = {"the", "a", "an", "and", "or", "of", "in", "on", "at", "to", "for", "what", "which", "how", "are",
+              "is", "was", "were", "do", "did", "we", "our", "should", "with", "about", "from", "by", "it", "that"}
+
+PARTITIONS_FILE = "partitions.json"
+PARTITIONS_SUBDIR = "partitions"
+
+# Record sheets searched for hazard questions without a sheet mention
+HAZARD_SHEETS = ["Incident", "Hazard ID", "Audit Findings", "Inspection Findings"]
+# A mentioned findings sheet also routes to its parent sheet (titles, scope, dates)
+SHEET_COMPANIONS: Dict[str, List[str]] = {
+    "Audit Findings": ["Audit"],
+    "Inspection Findings": ["Inspection"],
+}
+
+_CLAUSE_SPLIT_RE = re.compile(
+    r"\s*(?:;|\?|\bas well as\b|\bversus\b|\bvs\.?(?=\s)|\bcompared (?:to|with)\b|"
+    r",?\s+and\s+(?=(?:what|which|how|why|where|when|who|list|show|summari[sz]e|describe|are|is|do|did)\b))\s*",
+    re.IGNORECASE,
+)
+
+
+def mentioned_sheets(question: str) -> List[str]:
+    ql = (question or "").lower()
+    return [sheet for sheet, pat in SHEET_TERMS.items() if re.search(pat, ql)]
+
+
+def split_query(question: str) -> List[str]:
+    """Whole question, then its clauses and per-sheet variants (deduplicated, at most MAX_SUBQUERIES)"""
+    question = " ".join((question or "").split())
+    clauses = [c.strip(" ,.") for c in _CLAUSE_SPLIT_RE.split(question)]
+    queries = [question] + [c for c in clauses if len(c.split()) >= 2]
+    sheets = mentioned_sheets(question)
+    if len(sheets) > 1:
+        queries += [f"{sheet}: {question}" for sheet in sheets]
+    # Dedupe ignoring case and punctuation, so "top hazards?" does not become two queries
+    unique: Dict[str, str] = {}
+    for q in queries:
+        key = " ".join(re.sub(r"[^\w\s]", " ", q.lower()).split())
+        if key and key not in unique:
+            unique[key] = q
+    return list(unique.values())[:MAX_SUBQUERIES]
+
+
+def search_by_vectors(vstore: Any, vectors: Sequence[Sequence[float]], k: int,
+                      sheets: Optional[Sequence[str]] = None) -> List[List[Tuple[Document, float]]]:
+    """One batched FAISS search; per query, (document copy, distance) pairs like similarity_search_with_score.
+
+    vstore is a FAISS store or a PartitionedStore; sheets limits a PartitionedStore to those partitions.
+    """
+    if isinstance(vstore, PartitionedStore):
+        return vstore.search_by_vectors(vectors, k, sheets)
+    x = np.asarray(vectors, dtype=np.float32)
+    if getattr(vstore, "_normalize_L2", False):
+        x = x / np.maximum(np.linalg.norm(x, axis=1, keepdims=True), 1e-12)
+    distances, indices = vstore.index.search(x, k)
+    results = []
+    for row_d, row_i in zip(distances, indices):
+        hits = []
+        for dist, i in zip(row_d, row_i):
+            if i == -1:
+                continue
+            doc = vstore.docstore.search(vstore.index_to_docstore_id[i])
+            if isinstance(doc, Document):
+                # Copies: the stored documents are shared between concurrent requests
+                hits.append((Document(page_content=doc.page_content, metadata=dict(doc.metadata or {})), float(dist)))
+        results.append(hits)
+    return results
+
+
+def dedupe_hits(hit_lists: List[List[Tuple[Document, float]]]) -> List[Tuple[Document, float]]:
+    """All hits, one per (sheet, record_id) with its best distance (best passage of a chunked record), closest first"""
+    best: Dict[Tuple[Any, Any], Tuple[Document, float]] = {}
+    for hits in hit_lists:
+        for doc, dist in hits:
+            md = doc.metadata or {}
+            key = (md.get("source_sheet"), md.get("record_id") or doc.page_content[:80])
+            if key not in best or dist < best[key][1]:
+                best[key] = (doc, dist)
+    return sorted(best.values(), key=lambda h: h[1])
+
+
+def select_hits(ranked: List[Tuple[Document, float]], k: int, quota_sheets: Sequence[str] = (),
+                quota: int = SHEET_QUOTA) -> List[Document]:
+    """Top k of a ranked list, after first giving each of quota_sheets up to `quota` places"""
+    position = {id(h[0]): i for i, h in enumerate(ranked)}
+    chosen: List[Tuple[Document, float]] = []
+    for sheet in quota_sheets:
+        chosen += [h for h in ranked if (h[0].metadata or {}).get("source_sheet") == sheet][:quota]
+    chosen = chosen[:k]
+    picked = {id(h[0]) for h in chosen}
+    chosen += [h for h in ranked if id(h[0]) not in picked][:k - len(chosen)]
+    chosen.sort(key=lambda h: position[id(h[0])])
+
+    docs = []
+    for doc, dist in chosen:
+        doc.metadata["score"] = dist
+        docs.append(doc)
+    return docs
+
+
+def merge_hits(hit_lists: List[List[Tuple[Document, float]]], k: int, quota_sheets: Sequence[str] = (),
+               quota: int = SHEET_QUOTA) -> List[Document]:
+    """Dedupe by (sheet, record_id) keeping the best distance; fill quotas for quota_sheets, then by distance"""
+    return select_hits(dedupe_hits(hit_lists), k, quota_sheets, quota)
+
+
+def _contains_any(values: List[Any], needle: Optional[str]) -> np.ndarray:
+    needle = str(needle or "").lower()
+    return np.array([needle in str(v).lower() if v is not None else False for v in values], dtype=bool)
+
+
+def rerank(query: str, candidates: List[Tuple[Document, float]], filters: Optional[Dict[str, Any]] = None,
+           severity: Optional[Dict[str, Dict[str, float]]] = None, today: Optional[pd.Timestamp] = None,
+           weights: Optional[Dict[str, float]] = None) -> List[Tuple[Document, float]]:
+    """Candidates reordered by a weighted sum of per-feature scores in [0, 1]; best first.
+
+    severity maps sheet -> record_id -> severity (0-3). The combined score is
+    stored in each document's metadata as "rerank_score".
+    """
+    if not candidates:
+        return []
+    weights = weights or RERANK_WEIGHTS
+    filters = filters or {}
+    metas = [d.metadata or {} for d, _ in candidates]
+
+    dist = np.array([h[1] for h in candidates], dtype=float)
+    similarity = 1.0 / (1.0 + dist)
+    spread = similarity.max() - similarity.min()
+    similarity = (similarity - similarity.min()) / spread if spread > 0 else np.ones_like(similarity)
+
+    q_words = set(_WORD_RE.findall((query or "").lower())) - _STOPWORDS
+    lexical = np.array([len(q_words & set(_WORD_RE.findall(d.page_content.lower()))) for d, _ in candidates], dtype=float)
+    lexical = lexical / len(q_words) if q_words else np.zeros(len(candidates))
+
+    dates = pd.to_datetime(pd.Series([m.get("date") for m in metas], dtype=object), errors="coerce")
+    checks = []
+    for key in ("location", "department"):
+        if filters.get(key):
+            checks.append(_contains_any([m.get(key) for m in metas], filters[key]))
+    if filters.get("start_date") or filters.get("end_date"):
+        in_range = dates.notna().to_numpy()
+        if filters.get("start_date"):
+            in_range &= (dates >= pd.to_datetime(filters["start_date"], errors="coerce")).to_numpy()
+        if filters.get("end_date"):
+            in_range &= (dates <= pd.to_datetime(filters["end_date"], errors="coerce")).to_numpy()
+        checks.append(in_range)
+    filter_match = np.mean(checks, axis=0) if checks else np.zeros(len(candidates))
+
+    today = today if today is not None else pd.Timestamp.today()
+    age_days = (today - dates).dt.days.to_numpy(dtype=float, na_value=np.nan)
+    recency = np.nan_to_num(np.exp2(-np.clip(age_days, 0, None) / RECENCY_HALF_LIFE_DAYS), nan=0.0)
+
+    severity = severity or {}
+    sev = np.array([severity.get(m.get("source_sheet"), {}).get(str(m.get("record_id")), 0.0) for m in metas], dtype=float)
+    sev = np.nan_to_num(sev / MAX_SEVERITY)
+
+    score = (weights.get("similarity", 0) * similarity + weights.get("lexical", 0) * lexical
+             + weights.get("filters", 0) * filter_match + weights.get("recency", 0) * recency
+             + weights.get("severity", 0) * sev)
+    order = np.argsort(-score, kind="stable")
+    for i in order:
+        metas[i]["rerank_score"] = round(float(score[i]), 4)
+    return [candidates[i] for i in order]
+
+
+def partition_dir(sheet: str) -> str:
+    """Sub-directory of the index directory holding one sheet's FAISS files"""
+    return os.path.join(PARTITIONS_SUBDIR, re.sub(r"[^A-Za-z0-9]+", "_", sheet).strip("_") or "sheet")
+
+
+def read_partitions(index_dir: str) -> Dict[str, Dict[str, Any]]:
+    """{sheet: {"dir", "docs", "content_hash", "built"}} from partitions.json (empty if missing)"""
+    path = os.path.join(index_dir, PARTITIONS_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+class PartitionedStore:
+    """One FAISS index per source sheet, searched through a router"""
+
+    def __init__(self, partitions: Dict[str, Any]):
+        self.partitions = partitions
+
+    @classmethod
+    def load(cls, index_dir: str, embeddings: Any) -> Optional["PartitionedStore"]:
+        """The partitions listed in index_dir/partitions.json, or None when the index is not partitioned"""
+        from langchain_community.vectorstores import FAISS
+
+        entries = read_partitions(index_dir)
+        if not entries:
+            return None
+        partitions = {
+            sheet: FAISS.load_local(os.path.join(index_dir, entry["dir"]), embeddings,
+                                    allow_dangerous_deserialization=True)
+            for sheet, entry in entries.items()
+        }
+        return cls(partitions)
+
+    def route(self, question: str, filters: Optional[Dict[str, Any]] = None, hazard: bool = False) -> List[str]:
+        """Partitions to search: the sheets the question names (plus their parent sheets); for hazard
+        questions or location/department filters the record sheets; otherwise every partition"""
+        sheets = mentioned_sheets(question)
+        if sheets:
+            sheets += [c for s in sheets for c in SHEET_COMPANIONS.get(s, [])]
+        elif hazard or any((filters or {}).get(key) for key in ("location", "department")):
+            sheets = HAZARD_SHEETS
+        routed = [s for s in dict.fromkeys(sheets) if s in self.partitions]
+        return routed or list(self.partitions)
+
+    def search_by_vectors(self, vectors: Sequence[Sequence[float]], k: int,
+                          sheets: Optional[Sequence[str]] = None) -> List[List[Tuple[Document, float]]]:
+        """Top-k per query over the given partitions (default: all), merged by distance"""
+        merged: List[List[Tuple[Document, float]]] = [[] for _ in vectors]
+        for sheet in sheets or list(self.partitions):
+            store = self.partitions.get(sheet)
+            if store is None or store.index.ntotal == 0:
+                continue
+            for row, hits in zip(merged, search_by_vectors(store, vectors, min(k, store.index.ntotal))):
+                row.extend(hits)
+        return [sorted(row, key=lambda h: h[1])[:k] for row in merged]
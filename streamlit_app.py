@@ -5,10 +5,12 @@ Run:
   streamlit run streamlit_app.py
 """
 import os
+import shutil
+import time
 import uuid
 from datetime import date
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 
 # Ensure OpenMP duplicate runtime doesn't crash FAISS on Windows
 os.environ.setdefault("KMP_DUPLICATE_LIB_OK", "TRUE")
@@ -22,7 +24,18 @@ except Exception:
     Image = None
 
 # Import the compiled LangGraph app from bot.py
-from bot import app as graph_app, is_hazard_query
+import backends
+import bot
+import build_jobs
+import data_store
+import releases
+from bot import app as graph_app, is_hazard_query, serving
+from telemetry import waterfall
+
+# Swap in newly published data/index releases (releases.py) without a restart
+bot.watch_releases()
+# Local backends (VEHS_BACKEND=local) run without an OpenAI key
+KEY_REQUIRED = backends.needs_openai_key()
 
 st.set_page_config(page_title="EPCL Data Analyst", layout="wide")
 
@@ -130,6 +143,235 @@ def get_assistant_avatar():
     st.session_state.assistant_avatar = avatar
     return avatar
 
+# Number of most recent turns rendered in full; older turns collapse to a one-line summary
+RECENT_TURNS_EXPANDED = 3
+
+
+def rows_from_retrieved(retrieved: List[Any]) -> List[Dict[str, Any]]:
+    """Flatten retrieved documents into the lightweight rows stored with each turn."""
+    rows = []
+    for d in retrieved[:12]:
+        meta = getattr(d, "metadata", {}) or {}
+        cid = meta.get("record_id") or ""
+        src = meta.get("source_sheet") or ""
+        score = meta.get("score")
+        content = (getattr(d, "page_content", "") or "")[:220].replace("\n", " ")
+        rows.append({
+            "source": src,
+            "id": cid,
+            "score": score,
+            "preview": content,
+        })
+    return rows
+
+
+def build_turn_view(rows: List[Dict[str, Any]], analytics: Dict[str, Any]) -> Dict[str, Any]:
+    """Precompute the DataFrames and chart series for a turn once, so reruns only redraw them."""
+    df = pd.DataFrame(rows)
+    view: Dict[str, Any] = {"table": df, "src_counts": None, "scores": None, "hazards": None}
+    if not df.empty:
+        if "source" in df.columns:
+            view["src_counts"] = df["source"].fillna("Unknown").value_counts()
+        if "score" in df.columns and df["score"].notna().any():
+            view["scores"] = df["score"].dropna()
+    top = (analytics.get("top") or []) if isinstance(analytics, dict) else []
+    if isinstance(top, list) and top:
+        hdf = pd.DataFrame(top)
+        if {"hazard", "concern_score"}.issubset(hdf.columns):
+            hdf = hdf.sort_values("concern_score", ascending=False)
+            view["hazards"] = hdf.set_index("hazard")["concern_score"]
+    return view
+
+
+def get_turn_view(turn: Dict[str, Any]) -> Dict[str, Any]:
+    """Return the cached view for a turn, building it on first access (e.g. for older logs)."""
+    view = turn.get("view")
+    if view is None:
+        view = build_turn_view(turn.get("chunks") or [], turn.get("analytics") or {})
+        turn["view"] = view
+    return view
+
+
+def summarize_turn(turn: Dict[str, Any], max_chars: int = 160) -> str:
+    """One-line summary used for collapsed turns."""
+    answer = (turn.get("answer") or "").strip()
+    # Skip Markdown headings ("### Summary") and use the first line of prose
+    first = next((ln.strip() for ln in answer.splitlines() if ln.strip() and not ln.lstrip().startswith("#")), "")
+    if len(first) > max_chars:
+        first = first[:max_chars].rstrip() + "…"
+    n_src = len(turn.get("chunks") or [])
+    return f"{first} _({n_src} sources)_" if first else f"_({n_src} sources)_"
+
+
+def latency_waterfall_html(metrics: List[Dict[str, Any]]) -> str:
+    """Per-node latency bars positioned on the turn's timeline, with token and cache counts."""
+    bars = waterfall(metrics)
+    total = max((b["offset_ms"] + b["duration_ms"] for b in bars), default=0) or 1
+    rows = []
+    for bar, m in zip(bars, metrics):
+        left = 100 * bar["offset_ms"] / total
+        width = max(100 * bar["duration_ms"] / total, 0.5)
+        color = "#d9534f" if m.get("error") else "#4e79a7"
+        tokens = f"{m.get('input_tokens', 0)}/{m.get('output_tokens', 0)}" if m.get("llm_calls") else ""
+        lookups = m.get("cache_hits", 0) + m.get("cache_misses", 0)
+        cache = f"{m.get('cache_hits', 0)}/{lookups}" if lookups else ""
+        rows.append(
+            "<tr>"
+            f"<td style='white-space:nowrap;padding-right:8px'>{bar['node']}</td>"
+            "<td style='width:100%'><div style='position:relative;height:14px;background:#f0f2f6'>"
+            f"<div style='position:absolute;left:{left:.2f}%;width:{width:.2f}%;height:100%;background:{color}'></div>"
+            "</div></td>"
+            f"<td style='text-align:right;white-space:nowrap;padding-left:8px'>{bar['duration_ms']:.0f} ms</td>"
+            f"<td style='text-align:right;padding-left:8px'>{tokens}</td>"
+            f"<td style='text-align:right;padding-left:8px'>{cache}</td>"
+            "</tr>"
+        )
+    header = ("<tr><th></th><th style='text-align:left'>timeline</th><th>latency</th>"
+              "<th>tokens in/out</th><th>cache hits</th></tr>")
+    return f"<table style='width:100%;font-size:0.8rem'>{header}{''.join(rows)}</table>"
+
+
+def render_turn_details(view: Dict[str, Any], rows: List[Dict[str, Any]], sources_label: str = "Thoughts ",
+                        metrics: Optional[List[Dict[str, Any]]] = None):
+    """Render the sources table, snippets, charts and latency waterfall from a precomputed turn view."""
+    if rows:
+        with st.expander(sources_label):
+            st.dataframe(view["table"], use_container_width=True)
+            st.markdown("Snippets:")
+            for r in rows[:10]:
+                st.markdown(f"- **[{r['source']}:{r['id']}]** (score={r['score']}) {r['preview']}")
+    if rows or view.get("hazards") is not None:
+        with st.expander("Charts"):
+            if view.get("src_counts") is not None:
+                st.markdown("**Retrieved by source**")
+                st.bar_chart(view["src_counts"], use_container_width=True)
+            if view.get("scores") is not None:
+                st.markdown("**Similarity scores**")
+                st.bar_chart(view["scores"], use_container_width=True)
+            if view.get("hazards") is not None:
+                st.markdown("**Top hazards by concern score**")
+                st.bar_chart(view["hazards"], use_container_width=True)
+    if metrics:
+        total_ms = sum(m.get("duration_ms", 0) for m in metrics)
+        with st.expander(f"Latency ({total_ms:.0f} ms)"):
+            st.markdown(latency_waterfall_html(metrics), unsafe_allow_html=True)
+
+
+# Seconds between index-build progress refreshes (with st.fragment; older Streamlit refreshes on rerun)
+BUILD_POLL_SECONDS = 2
+# Where an uploaded raw export is kept inside its release directory
+UPLOAD_NAME = "upload.xlsx"
+
+
+def resumable_build() -> Optional[build_jobs.BuildJob]:
+    """An unfinished build of a release newer than the current one (e.g. interrupted by an app restart)."""
+    current = releases.current_version()
+    for version in reversed(releases.list_versions()):
+        if current is not None and version <= current:
+            break
+        job = build_jobs.BuildJob.last(releases.release_dirs(version)[1])
+        if job is not None and job.status["state"] != "finished":
+            return job
+    return None
+
+
+def start_index_build(job: Optional[build_jobs.BuildJob] = None):
+    """Start `job`, or a build of a new release seeded with the data currently served, in a worker process."""
+    if job is None:
+        version = releases.create(seed=(bot.DATA_DIR, bot.PERSIST_DIR))
+        data_dir, index_dir = releases.release_dirs(version)
+        if data_store.read_manifest(data_dir) is None and bot.SHEETS:
+            # Serving the processed xlsx: the release gets its own columnar copy
+            data_store.write_sheets(bot.SHEETS, data_dir, source=bot.XLSX_PATH)
+        job = build_jobs.BuildJob(data_dir, index_dir, release=version)
+    try:
+        build_jobs.start_job(job)
+    except RuntimeError as e:
+        st.warning(str(e))
+
+
+def start_ingest(upload) -> None:
+    """Stage an uploaded raw export in a new release, then process and index it in a worker process."""
+    current = build_jobs.current_job()
+    if current is not None and current.poll()["state"] == "running":
+        st.warning(f"A {current.KIND} job is already running")
+        return
+    version = releases.create(seed=(bot.DATA_DIR, bot.PERSIST_DIR))
+    data_dir, index_dir = releases.release_dirs(version)
+    path = os.path.join(releases.RELEASES_DIR, version, UPLOAD_NAME)
+    try:
+        build_jobs.stage_upload(upload, path)
+        build_jobs.start_job(build_jobs.IngestJob(path, data_dir, index_dir, release=version))
+    except (ValueError, RuntimeError) as e:
+        shutil.rmtree(os.path.join(releases.RELEASES_DIR, version), ignore_errors=True)
+        st.warning(str(e))
+
+
+def ingest_summary(status: Dict[str, Any]) -> str:
+    """Throughput line of an ingest job."""
+    parts = []
+    if status.get("rows_processed"):
+        parts.append(f"{status['rows_processed']:,} rows from {status['upload_mb']} MB "
+                     f"({status['rows_per_s']:,.0f} rows/s, {status['mb_per_s']} MB/s)")
+    if status.get("docs_per_s"):
+        parts.append(f"{status['docs_per_s']:,.0f} docs/s embedded")
+    if status.get("peak_rss_mb"):
+        parts.append(f"peak memory {status['peak_rss_mb']:,.0f} MB")
+    return " · ".join(parts)
+
+
+def index_build_panel():
+    """Progress of the background index build or data ingest, with start/cancel/resume controls."""
+    job = build_jobs.current_job()
+    status = job.poll() if job is not None else None
+    if status is not None and status["state"] == "running" and status.get("stage") == "processing":
+        st.progress(0.0, text=f"Processing uploaded export · {status['elapsed_s']} s")
+        if st.button("Cancel ingest"):
+            job.cancel()
+        return
+    if status is not None and status["state"] == "running":
+        total = status["docs_prepared"]
+        st.progress(min(status["docs_added"] / total, 1.0) if total else 0.0,
+                    text=f"{status['docs_added']}/{total or '?'} docs indexed")
+        st.caption(f"Embedded {status['docs_embedded']} · {status['partitions_done']} partitions"
+                   + (f" · {status['sheet']}" if status.get("sheet") else "") + f" · {status['elapsed_s']} s")
+        if st.button(f"Cancel {job.KIND}"):
+            job.cancel()
+        return
+    if status is not None:
+        if status["state"] == "finished":
+            done = "Export ingested and indexed" if job.KIND == "ingest" else "Index built"
+            st.success(f"{done} in {status['elapsed_s']} s; release {job.params['release']} published")
+            if job.KIND == "ingest":
+                st.caption(ingest_summary(status))
+        elif status["state"] == "cancelled":
+            st.info(f"{job.KIND.capitalize()} cancelled after {status['partitions_done']} partitions")
+        else:
+            st.error(f"{job.KIND.capitalize()} failed: {status.get('error')}")
+    resumable = job if status is not None and status["state"] in ("cancelled", "failed") else \
+        (resumable_build() if job is None else None)
+    if resumable is not None and st.button(f"Resume {resumable.KIND}"):
+        start_index_build(resumable.resume())
+        st.rerun()
+    if st.button("Rebuild index"):
+        start_index_build()
+        st.rerun()
+
+
+if hasattr(st, "fragment"):
+    # Refresh only the panel while a build runs, never the chat
+    index_build_panel = st.fragment(run_every=BUILD_POLL_SECONDS)(index_build_panel)
+
+
+def record_render_time(history_len: int, started: float) -> float:
+    """Keep a small rolling benchmark of rerun render time vs. history length."""
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    timings = st.session_state.setdefault("render_timings", [])
+    timings.append({"turns": history_len, "render_ms": round(elapsed_ms, 1)})
+    del timings[:-50]
+    return elapsed_ms
+
+
 # Session-scoped thread for checkpointer/memory continuity
 if "thread_id" not in st.session_state:
     st.session_state.thread_id = f"ui-{uuid.uuid4()}"
@@ -148,13 +390,30 @@ with st.sidebar:
         end_dt = st.date_input("End date", value=None)
 
     st.markdown("---")
+    if bot.RELEASE:
+        st.caption(f"Data release: {bot.RELEASE}")
     # Generic service key presence (no vendor naming)
-    if os.environ.get("OPENAI_API_KEY"):
+    if not KEY_REQUIRED:
+        st.caption("Local backends: no service key needed")
+    elif os.environ.get("OPENAI_API_KEY"):
         st.success("Service key detected")
     else:
         st.warning("Service key not set")
+    with st.expander("Index build"):
+        index_build_panel()
+    with st.expander("Data ingest"):
+        # Processed in a worker process into a new release, which is swapped in when its index is built
+        upload = st.file_uploader("Raw VEHS export (.xlsx)", type=["xlsx"])
+        if upload is not None and st.button("Ingest export"):
+            start_ingest(upload)
+    timings = st.session_state.get("render_timings") or []
+    if timings:
+        with st.expander("Render timings"):
+            st.caption(f"Last rerun: {timings[-1]['turns']} turns in {timings[-1]['render_ms']} ms")
+            st.line_chart(pd.DataFrame(timings).groupby("turns")["render_ms"].median(), use_container_width=True)
     if st.button("Clear History"):
         st.session_state.qna_log = []
+        st.session_state.render_timings = []
         # Reset conversational context for the backend as well
         st.session_state.thread_id = f"ui-{uuid.uuid4()}"
         if "chat_history" in st.session_state:
@@ -165,48 +424,29 @@ _ = "Chat-like interface using Streamlit chat elements"
 USE_CHAT = hasattr(st, "chat_message") and hasattr(st, "chat_input")
 
 if USE_CHAT:
-    # Render existing conversation
-    # Assistant avatar uses padded Engro logo to avoid cropping
+    # Render existing conversation. Only the most recent turns are drawn in full; older
+    # turns collapse to a summary and render their details on demand.
+    render_started = time.perf_counter()
     assistant_avatar = get_assistant_avatar()
-    for turn in st.session_state.qna_log:
+    history = st.session_state.qna_log
+    n_collapsed = max(0, len(history) - RECENT_TURNS_EXPANDED)
+    for i, turn in enumerate(history):
         with st.chat_message("user"):
             st.markdown(turn.get("query", ""))
         with st.chat_message("assistant", avatar=assistant_avatar):
             if turn.get("context_included"):
                 st.caption("Context included")
+            if i < n_collapsed and not st.checkbox("Show full answer", key=f"turn-expand-{i}"):
+                st.markdown(summarize_turn(turn))
+                continue
             st.markdown(turn.get("answer", ""))
-            rows = turn.get("chunks") or []
-            if rows:
-                with st.expander("Thoughts "):
-                    st.dataframe(pd.DataFrame(rows), use_container_width=True)
-                    st.markdown("Snippets:")
-                    for r in rows[:10]:
-                        st.markdown(f"- **[{r['source']}:{r['id']}]** (score={r['score']}) {r['preview']}")
-                # Basic charts from retrieved items
-                with st.expander("Charts"):
-                    df = pd.DataFrame(rows)
-                    if not df.empty:
-                        if "source" in df.columns:
-                            src_counts = df["source"].fillna("Unknown").value_counts()
-                            st.markdown("**Retrieved by source**")
-                            st.bar_chart(src_counts, use_container_width=True)
-                        if "score" in df.columns and df["score"].notna().any():
-                            st.markdown("**Similarity scores**")
-                            st.bar_chart(df["score"].dropna(), use_container_width=True)
-                    # Hazard analytics, if saved with the turn
-                    ana = turn.get("analytics") or {}
-                    top = (ana.get("top") or []) if isinstance(ana, dict) else []
-                    if isinstance(top, list) and top:
-                        hdf = pd.DataFrame(top)
-                        if {"hazard", "concern_score"}.issubset(hdf.columns):
-                            hdf = hdf.sort_values("concern_score", ascending=False)
-                            st.markdown("**Top hazards by concern score**")
-                            st.bar_chart(hdf.set_index("hazard")["concern_score"], use_container_width=True)
+            render_turn_details(get_turn_view(turn), turn.get("chunks") or [], metrics=turn.get("metrics"))
+    record_render_time(len(history), render_started)
 
     # Bottom chat input
     prompt = st.chat_input("Ask a question")
     if prompt:
-        if not os.environ.get("OPENAI_API_KEY"):
+        if KEY_REQUIRED and not os.environ.get("OPENAI_API_KEY"):
             st.error("OPENAI_API_KEY is not set. Please set it in your environment and restart.")
             st.stop()
 
@@ -237,6 +477,7 @@ if USE_CHAT:
             "retrieved": [],
             "analytics": {},
             "answer": "",
+            "metrics": [],
         }
         config = {"configurable": {"thread_id": st.session_state.thread_id}}
 
@@ -246,54 +487,20 @@ if USE_CHAT:
         with st.chat_message("assistant", avatar=assistant_avatar):
             with st.spinner("Thinking..."):
                 try:
-                    final = graph_app.invoke(state, config=config)
+                    with serving():
+                        final = graph_app.invoke(state, config=config)
                 except Exception as e:
                     final = {"answer": f"There was an error generating a response: {e}", "retrieved": []}
 
             answer = final.get("answer", "")
-            retrieved = final.get("retrieved", [])
             analytics = final.get("analytics", {}) or {}
-            rows = []
-            for d in retrieved[:12]:
-                meta = getattr(d, "metadata", {}) or {}
-                cid = meta.get("record_id") or ""
-                src = meta.get("source_sheet") or ""
-                score = meta.get("score")
-                content = (getattr(d, "page_content", "") or "")[:220].replace("\n", " ")
-                rows.append({
-                    "source": src,
-                    "id": cid,
-                    "score": score,
-                    "preview": content,
-                })
+            rows = rows_from_retrieved(final.get("retrieved", []))
+            view = build_turn_view(rows, analytics)
 
             if context_included:
                 st.caption("Context included")
             st.markdown(answer or "")
-            if rows:
-                with st.expander("Sources"):
-                    st.dataframe(pd.DataFrame(rows), use_container_width=True)
-                    st.markdown("Snippets:")
-                    for r in rows[:10]:
-                        st.markdown(f"- **[{r['source']}:{r['id']}]** (score={r['score']}) {r['preview']}")
-            # Inline charts for this turn
-            with st.expander("Charts"):
-                df = pd.DataFrame(rows)
-                if not df.empty:
-                    if "source" in df.columns:
-                        src_counts = df["source"].fillna("Unknown").value_counts()
-                        st.markdown("**Retrieved by source**")
-                        st.bar_chart(src_counts, use_container_width=True)
-                    if "score" in df.columns and df["score"].notna().any():
-                        st.markdown("**Similarity scores**")
-                        st.bar_chart(df["score"].dropna(), use_container_width=True)
-                top = (analytics.get("top") or []) if isinstance(analytics, dict) else []
-                if isinstance(top, list) and top:
-                    hdf = pd.DataFrame(top)
-                    if {"hazard", "concern_score"}.issubset(hdf.columns):
-                        hdf = hdf.sort_values("concern_score", ascending=False)
-                        st.markdown("**Top hazards by concern score**")
-                        st.bar_chart(hdf.set_index("hazard")["concern_score"], use_container_width=True)
+            render_turn_details(view, rows, sources_label="Sources", metrics=final.get("metrics"))
 
         st.session_state.qna_log.append({
             "query": prompt,
@@ -301,6 +508,8 @@ if USE_CHAT:
             "chunks": rows,
             "context_included": context_included,
             "analytics": analytics,
+            "view": view,
+            "metrics": final.get("metrics") or [],
         })
 else:
     # Fallback simple input for older Streamlit versions
@@ -310,7 +519,7 @@ else:
     question = st.text_area("Question", value=default_q, height=100)
     ask = st.button("Ask", type="primary")
     if ask:
-        if not os.environ.get("OPENAI_API_KEY"):
+        if KEY_REQUIRED and not os.environ.get("OPENAI_API_KEY"):
             st.error("OPENAI_API_KEY is not set. Please set it in your environment and restart.")
             st.stop()
         filters: Dict[str, Any] = {}
@@ -328,34 +537,25 @@ else:
             "retrieved": [],
             "analytics": {},
             "answer": "",
+            "metrics": [],
         }
         config = {"configurable": {"thread_id": st.session_state.thread_id}}
         with st.spinner("Thinking..."):
             try:
-                final = graph_app.invoke(state, config=config)
+                with serving():
+                    final = graph_app.invoke(state, config=config)
             except Exception as e:
                 final = {"answer": f"There was an error generating a response: {e}", "retrieved": []}
         answer = final.get("answer", "")
-        retrieved = final.get("retrieved", [])
         analytics = final.get("analytics", {}) or {}
-        rows = []
-        for d in retrieved[:12]:
-            meta = getattr(d, "metadata", {}) or {}
-            cid = meta.get("record_id") or ""
-            src = meta.get("source_sheet") or ""
-            score = meta.get("score")
-            content = (getattr(d, "page_content", "") or "")[:220].replace("\n", " ")
-            rows.append({
-                "source": src,
-                "id": cid,
-                "score": score,
-                "preview": content,
-            })
+        rows = rows_from_retrieved(final.get("retrieved", []))
         st.session_state.qna_log.append({
             "query": question,
             "answer": answer,
             "chunks": rows,
             "analytics": analytics,
+            "view": build_turn_view(rows, analytics),
+            "metrics": final.get("metrics") or [],
         })
 
 # Footer removed to avoid extra bottom spacing
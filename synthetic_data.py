@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Synthetic VEHS workbooks for benchmarking.
+
+Scales the sample sheets in extracted_data/ (first 5 processed rows per sheet)
+into a raw-format workbook that vehs_pipeline.py can process, so stage timings
+can be measured at 10x or 100x the production size without production data.
+
+Each sample block is repeated as a whole, keeping the multi-row record layout
+(a record's first row carries the data, follow-up rows are mostly empty).
+Incident/audit numbers get a per-block suffix so every copy is a distinct
+record, and dates are shifted by a random offset per block.
+
+make_processed_sheets() builds already-processed sheets instead (the layout
+bot.py and build_index.py read), with configurable row counts, hazard tag mix
+and date span; column dtypes come from excel_data_analysis.md. benchmark.py
+uses it for its workloads.
+
+Usage:
+  python synthetic_data.py --scale 10              # -> synthetic_vehs_x10.xlsx
+  python synthetic_data.py --scale 100 --output big.xlsx
+  python vehs_pipeline.py --input synthetic_vehs_x10.xlsx --no-excel --data-dir vehs_data_x10 \\
+      --report bench_x10.json
+"""
+import json
+import os
+import importlib.util
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from vehs_pipeline import VEHSDataPipeline
+
+SAMPLE_DIR = "extracted_data"
+SAMPLE_SUFFIX = "_first_5_rows.csv"
+REPORT_PATH = "VEHS_Data_Quality_Report.json"
+SCHEMA_DOC = "excel_data_analysis.md"
+
+# Sheets produced by the pipeline itself; not part of a raw export
+DERIVED_SHEETS = ["Relationships", "Location_Summary", "Department_Summary"]
+
+# Columns added by the pipeline's enrichment step
+DERIVED_COLUMNS = [
+    "severity_score", "estimated_cost_impact", "estimated_manhours_impact", "risk_score",
+    "department_avg_risk", "compliance_systems_involved", "reporting_delay_days", "resolution_time_days",
+]
+
+# Processed ID columns that must stay unique per synthetic record
+ID_COLUMNS = ["incident_id", "audit_id"]
+
+# Rows per sheet when no quality report is available to size "1x"
+DEFAULT_BASE_ROWS = 1000
+
+# Phrases that trigger each of bot.TAG_RULES (and one that matches none -> "Other")
+TAG_PHRASES: Dict[str, List[str]] = {
+    "Permit Management": ["work permit not available at the work front", "permit closed before job completion"],
+    "Isolation Plan Accuracy": ["isolation plan did not match field valves", "line re-energized without verification"],
+    "Firewater System Misuse": ["firewater hose used for floor washing", "process tie-in on firewater header"],
+    "Housekeeping/Trip": ["loose cable across the walkway", "poor housekeeping near pump bay"],
+    "PPE Compliance": ["worker without gloves on the platform", "goggles not worn during sampling"],
+    "Barrication/Tools": ["excavation not barricaded", "warning lights missing at barricade"],
+    "Mechanical Integrity/Aging": ["pipe support at end of service life", "vessel has not yet been inspected"],
+    "LOPC/Leakage": ["minor leak from flange gasket", "leakage observed at pump seal"],
+    "Other": ["general observation noted during area walkthrough"],
+}
+
+# Free-text columns that carry the hazard narrative, per processed sheet
+TEXT_COLUMNS: Dict[str, List[str]] = {
+    "Incident": ["title", "description"],
+    "Hazard ID": ["title", "description"],
+    "Audit": ["audit_title"],
+    "Audit Findings": ["finding"],
+    "Inspection": ["audit_title"],
+    "Inspection Findings": ["finding"],
+}
+
+
+def load_samples(sample_dir: str = SAMPLE_DIR) -> Dict[str, pd.DataFrame]:
+    """Read the per-sheet sample CSVs, skipping sheets the pipeline derives itself"""
+    samples = {}
+    for path in sorted(Path(sample_dir).glob(f"*{SAMPLE_SUFFIX}")):
+        sheet_name = path.name[:-len(SAMPLE_SUFFIX)]
+        if sheet_name not in DERIVED_SHEETS:
+            samples[sheet_name] = pd.read_csv(path)
+    return samples
+
+
+def base_row_counts(report_path: str = REPORT_PATH) -> Dict[str, int]:
+    """Production row counts per sheet from the last quality report (what 'scale 1' means)"""
+    if not os.path.exists(report_path):
+        return {}
+    with open(report_path) as f:
+        report = json.load(f)
+    return {name: int(stats["rows_total"]) for name, stats in report.get("sheets", {}).items()
+            if "rows_total" in stats}
+
+
+def to_raw_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Map processed column names back to raw export names and drop enrichment output"""
+    inverse = {v: k for k, v in VEHSDataPipeline("").field_standardization.items()}
+    df = df.drop(columns=[c for c in df.columns if c in DERIVED_COLUMNS or c.endswith("_is_missing")])
+    return df.rename(columns=lambda c: inverse.get(c, c.replace("_", " ").title()))
+
+
+def read_column_schemas(doc_path: str = SCHEMA_DOC) -> Dict[str, Dict[str, str]]:
+    """{sheet: {column: dtype}} from the 'Data Types' tables in excel_data_analysis.md"""
+    schemas: Dict[str, Dict[str, str]] = {}
+    if not os.path.exists(doc_path):
+        return schemas
+    sheet, in_types = None, False
+    for line in Path(doc_path).read_text(encoding="utf-8").splitlines():
+        if line.startswith("## "):
+            sheet, in_types = line[3:].strip(), False
+        elif line.startswith("### "):
+            in_types = line.strip() == "### Data Types"
+        elif in_types and line.startswith("|"):
+            cells = [c.strip() for c in line.strip().strip("|").split("|")]
+            if len(cells) >= 2 and cells[0] != "Column" and not set(cells[0]) <= {"-"}:
+                schemas.setdefault(sheet, {})[cells[0]] = cells[1]
+    return schemas
+
+
+def _is_date_column(col: str, schema: Optional[Dict[str, str]] = None) -> bool:
+    if schema and col in schema:
+        return schema[col].startswith("datetime")
+    return any(k in col for k in ["date", "entered", "start"])
+
+
+def scale_sheet(sample: pd.DataFrame, rows: int, rng: np.random.Generator,
+                date_span_days: int = 365, date_start: Optional[str] = None,
+                schema: Optional[Dict[str, str]] = None) -> pd.DataFrame:
+    """Repeat a processed sample block to `rows` rows with unique IDs and shifted dates.
+    
+    Dates are spread over date_span_days, starting at date_start when given
+    (otherwise at the sample's own dates).
+    """
+    block = len(sample)
+    blocks = max(1, -(-rows // block))
+    positions = np.tile(np.arange(block), blocks)[:rows]
+    out = sample.iloc[positions].reset_index(drop=True)
+    block_no = out.index.to_numpy() // block
+
+    for col in ID_COLUMNS:
+        if col in out.columns:
+            ids = out[col].astype("string")
+            out[col] = ids.where(ids.isna(), ids + "-" + pd.Series(block_no, index=out.index).map("{:05d}".format))
+
+    # One offset per block keeps the dates of a record consistent with each other
+    offsets = pd.to_timedelta(rng.integers(0, max(date_span_days, 1), blocks)[block_no], unit="D")
+    date_cols = [col for col in out.columns if _is_date_column(col, schema)]
+    dates = {col: pd.to_datetime(out[col], errors="coerce") for col in date_cols}
+    if date_start is not None:
+        earliest = min((d.min() for d in dates.values() if d.notna().any()), default=None)
+        if earliest is not None:
+            offsets = offsets + (pd.Timestamp(date_start) - earliest.normalize())
+    for col, values in dates.items():
+        if values.notna().any():
+            out[col] = values + offsets
+    return out
+
+
+def apply_tag_mix(df: pd.DataFrame, sheet_name: str, tag_mix: Dict[str, float],
+                  rng: np.random.Generator) -> pd.DataFrame:
+    """Rewrite the narrative columns so hazard tags occur in the given proportions"""
+    cols = [c for c in TEXT_COLUMNS.get(sheet_name, []) if c in df.columns]
+    if not cols or not tag_mix:
+        return df
+    tags = [t for t in tag_mix if t in TAG_PHRASES]
+    weights = np.array([tag_mix[t] for t in tags], dtype=float)
+    picks = rng.choice(len(tags), size=len(df), p=weights / weights.sum())
+    for col in cols:
+        # Any of the picked tag's phrases, chosen uniformly
+        phrases = np.array([phrase for t in tags for phrase in TAG_PHRASES[t]], dtype=object)
+        first = np.cumsum([0] + [len(TAG_PHRASES[t]) for t in tags])
+        counts = np.diff(first)[picks]
+        text = pd.Series(phrases[first[picks] + rng.integers(0, counts)], index=df.index)
+        df[col] = text.where(df[col].notna(), df[col])
+    return df
+
+
+def make_processed_sheets(rows: Union[int, Dict[str, int]] = 1000, tag_mix: Optional[Dict[str, float]] = None,
+                          date_start: Optional[str] = None, date_span_days: int = 365, seed: int = 0,
+                          sample_dir: str = SAMPLE_DIR, schema_doc: str = SCHEMA_DOC) -> Dict[str, pd.DataFrame]:
+    """Processed-layout sheets (as read by bot.py/build_index.py) for benchmarking.
+    
+    rows is either one count for every sheet or a {sheet: rows} dict; tag_mix
+    maps TAG_PHRASES names to relative weights (default: uniform).
+    """
+    rng = np.random.default_rng(seed)
+    schemas = read_column_schemas(schema_doc)
+    tag_mix = tag_mix or {tag: 1.0 for tag in TAG_PHRASES}
+    sheets = {}
+    for sheet_name, sample in load_samples(sample_dir).items():
+        n = rows.get(sheet_name, DEFAULT_BASE_ROWS) if isinstance(rows, dict) else rows
+        df = scale_sheet(sample, n, rng, date_span_days, date_start, schemas.get(sheet_name))
+        sheets[sheet_name] = apply_tag_mix(df, sheet_name, tag_mix, rng)
+    return sheets
+
+
+def make_workbook(scale: float = 10, sample_dir: str = SAMPLE_DIR, report_path: str = REPORT_PATH,
+                  seed: int = 0, date_span_days: int = 365) -> Dict[str, pd.DataFrame]:
+    """Raw-format sheets sized scale x the production row counts"""
+    rng = np.random.default_rng(seed)
+    base_rows = base_row_counts(report_path)
+    sheets = {}
+    for sheet_name, sample in load_samples(sample_dir).items():
+        rows = max(1, int(base_rows.get(sheet_name, DEFAULT_BASE_ROWS) * scale))
+        sheets[sheet_name] = to_raw_columns(scale_sheet(sample, rows, rng, date_span_days))
+    return sheets
+
+
+def write_workbook(sheets: Dict[str, pd.DataFrame], output_path: str):
+    engine = "xlsxwriter" if importlib.util.find_spec("xlsxwriter") is not None else "openpyxl"
+    with pd.ExcelWriter(output_path, engine=engine, datetime_format="YYYY-MM-DD") as writer:
+        for sheet_name, df in sheets.items():
+            df.to_excel(writer, sheet_name=sheet_name[:31], index=False)
+            print(f"  Wrote sheet: {sheet_name} ({len(df)} rows, {len(df.columns)} columns)")
+
+
+def main(argv: Optional[list] = None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Generate a scaled synthetic VEHS raw workbook")
+    parser.add_argument("--scale", type=float, default=10,
+                        help="Multiple of the production row counts (default: %(default)s)")
+    parser.add_argument("--output", help="Workbook path (default: synthetic_vehs_x<scale>.xlsx)")
+    parser.add_argument("--sample-dir", default=SAMPLE_DIR)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--date-span-days", type=int, default=365,
+                        help="Spread record dates over this many days (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    output_path = args.output or f"synthetic_vehs_x{args.scale:g}.xlsx"
+    print(f"Generating synthetic workbook at {args.scale:g}x: {output_path}")
+    sheets = make_workbook(args.scale, args.sample_dir, seed=args.seed, date_span_days=args.date_span_days)
+    write_workbook(sheets, output_path)
+    print(f"Saved {len(sheets)} sheets, {sum(len(df) for df in sheets.values())} rows")
+
+
+if __name__ == "__main__":
+    main()
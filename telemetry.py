@@ -0,0 +1,192 @@
+"""
+Per-node latency, token-usage and cache-hit counters for the LangGraph app.
+
+bot.py wraps every graph node with instrument(). Each call produces one record:
+  {"node", "started_at", "duration_ms", "llm_calls", "input_tokens", "output_tokens",
+   "embedding_calls", "embedding_tokens", "cache_hits", "cache_misses"[, "error"]}
+Code running inside a node adds to the active record through record_llm_usage(),
+record_embedding() and record_cache().
+
+Records are
+  - returned in the graph state under "metrics" (one list per turn; pass
+    "metrics": [] in the input state to start a new turn),
+  - appended to a size-rotated JSON Lines file, and
+  - aggregated into a Prometheus text-format file (node_exporter textfile style).
+
+Environment:
+  VEHS_TELEMETRY=0        disable the files (state metrics are always kept)
+  VEHS_TELEMETRY_DIR      output directory (default: telemetry)
+"""
+import contextvars
+import functools
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from logging.handlers import RotatingFileHandler
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+TELEMETRY_DIR = os.getenv("VEHS_TELEMETRY_DIR", "telemetry")
+ENABLED = os.getenv("VEHS_TELEMETRY", "1") != "0"
+JSONL_NAME = "node_metrics.jsonl"
+PROM_NAME = "vehs_metrics.prom"
+MAX_BYTES = 5 * 1024 * 1024
+BACKUP_COUNT = 3
+
+COUNTERS = ["llm_calls", "input_tokens", "output_tokens", "embedding_calls", "embedding_tokens",
+            "cache_hits", "cache_misses"]
+
+_current: contextvars.ContextVar = contextvars.ContextVar("vehs_node_record", default=None)
+
+
+def add_node_metrics(current: Optional[List[Dict[str, Any]]], update: Optional[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """GraphState reducer: nodes append their records; an empty list (the graph input) starts a new turn"""
+    if not update:
+        return []
+    return (current or []) + update
+
+
+_encoder = None
+
+
+def count_tokens(text: str) -> int:
+    """tiktoken count (cl100k_base) when available, else an estimate (~4 characters per token)"""
+    global _encoder
+    if _encoder is None:
+        try:
+            import tiktoken
+            _encoder = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoder = False
+    if _encoder:
+        return len(_encoder.encode(text or ""))
+    text = text or ""
+    return max(len(text.split()), -(-len(text) // 4))
+
+
+def _add(key: str, value: int):
+    record = _current.get()
+    if record is not None:
+        record[key] += int(value or 0)
+
+
+def record_llm_usage(message: Any, prompt_messages: Optional[Iterable[Any]] = None):
+    """Count one LLM call; uses the provider's usage metadata, else estimates with count_tokens"""
+    usage = getattr(message, "usage_metadata", None) or {}
+    if not usage:
+        token_usage = (getattr(message, "response_metadata", None) or {}).get("token_usage") or {}
+        usage = {"input_tokens": token_usage.get("prompt_tokens"), "output_tokens": token_usage.get("completion_tokens")}
+    input_tokens = usage.get("input_tokens")
+    if input_tokens is None and prompt_messages is not None:
+        input_tokens = sum(count_tokens(str(getattr(m, "content", m))) for m in prompt_messages)
+    output_tokens = usage.get("output_tokens")
+    if output_tokens is None:
+        output_tokens = count_tokens(str(getattr(message, "content", "")))
+    _add("llm_calls", 1)
+    _add("input_tokens", input_tokens)
+    _add("output_tokens", output_tokens)
+
+
+def record_embedding(texts: Iterable[str]):
+    texts = list(texts)
+    _add("embedding_calls", 1)
+    _add("embedding_tokens", sum(count_tokens(t) for t in texts))
+
+
+def record_cache(hit: bool):
+    _add("cache_hits" if hit else "cache_misses", 1)
+
+
+class _Sink:
+    """Writes records to the rotating JSONL file and keeps the Prometheus aggregates"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.logger: Optional[logging.Logger] = None
+        self.totals: Dict[str, Dict[str, float]] = {}
+
+    def _open(self):
+        os.makedirs(self.directory, exist_ok=True)
+        logger = logging.getLogger("vehs.telemetry")
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        handler = RotatingFileHandler(os.path.join(self.directory, JSONL_NAME),
+                                      maxBytes=MAX_BYTES, backupCount=BACKUP_COUNT, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        self.logger = logger
+
+    def write(self, record: Dict[str, Any]):
+        with self.lock:
+            if self.logger is None:
+                self._open()
+            self.logger.info(json.dumps(record, default=str))
+            totals = self.totals.setdefault(record["node"], {"count": 0, "errors": 0, "seconds": 0.0,
+                                                             **{c: 0 for c in COUNTERS}})
+            totals["count"] += 1
+            totals["errors"] += 1 if record.get("error") else 0
+            totals["seconds"] += record["duration_ms"] / 1000
+            for c in COUNTERS:
+                totals[c] += record[c]
+            self._write_prometheus()
+
+    def _write_prometheus(self):
+        lines = [
+            "# HELP vehs_node_latency_seconds Time spent in each LangGraph node.",
+            "# TYPE vehs_node_latency_seconds summary",
+        ]
+        for node, t in self.totals.items():
+            lines.append(f'vehs_node_latency_seconds_sum{{node="{node}"}} {t["seconds"]:.6f}')
+            lines.append(f'vehs_node_latency_seconds_count{{node="{node}"}} {t["count"]}')
+        lines += ["# HELP vehs_node_errors_total Node calls that raised.", "# TYPE vehs_node_errors_total counter"]
+        lines += [f'vehs_node_errors_total{{node="{node}"}} {t["errors"]}' for node, t in self.totals.items()]
+        for c in COUNTERS:
+            lines += [f"# TYPE vehs_{c}_total counter"]
+            lines += [f'vehs_{c}_total{{node="{node}"}} {t[c]}' for node, t in self.totals.items()]
+        # Write-then-rename so scrapers never see a partial file
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp, os.path.join(self.directory, PROM_NAME))
+
+
+_sink = _Sink(TELEMETRY_DIR)
+
+
+def instrument(name: str, fn: Callable[[Dict[str, Any]], Dict[str, Any]]) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+    """Wrap a graph node so its latency and counters land in state["metrics"] and the telemetry files"""
+    @functools.wraps(fn)
+    def node(state: Dict[str, Any]) -> Dict[str, Any]:
+        record: Dict[str, Any] = {"node": name, "started_at": time.time(), "duration_ms": 0.0,
+                                  **{c: 0 for c in COUNTERS}}
+        token = _current.set(record)
+        start = time.perf_counter()
+        try:
+            update = fn(state)
+        except Exception as e:
+            record["error"] = type(e).__name__
+            raise
+        finally:
+            record["duration_ms"] = round((time.perf_counter() - start) * 1000, 2)
+            _current.reset(token)
+            if ENABLED:
+                try:
+                    _sink.write(record)
+                except OSError as e:
+                    print(f"Warning: could not write telemetry to {TELEMETRY_DIR}/: {e}")
+        update = dict(update or {})
+        update["metrics"] = [record]
+        return update
+    return node
+
+
+def waterfall(metrics: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Per-node offsets (ms from the first node's start) and durations for a latency waterfall"""
+    if not metrics:
+        return []
+    t0 = min(m["started_at"] for m in metrics)
+    return [{"node": m["node"], "offset_ms": round((m["started_at"] - t0) * 1000, 1),
+             "duration_ms": m["duration_ms"]} for m in metrics]
@@ -0,0 +1,56 @@
+import threading
+
+import pytest
+
+pytest.importorskip("langchain_core")
+
+import backends
+
+
+def make_cache(maxsize):
+    return backends.CachedQueryEmbeddings(backends.HashingEmbeddings(), maxsize=maxsize)
+
+
+def test_embed_queries_survives_eviction_of_its_own_hits():
+    emb = make_cache(4)
+    emb.embed_queries(["a1", "a2", "a3", "a4"])
+    vectors = emb.embed_queries(["a1", "new1"])
+    assert vectors == backends.HashingEmbeddings().embed_documents(["a1", "new1"])
+    assert "a1" in emb._cache and "a2" not in emb._cache
+
+
+def test_cache_never_grows_past_maxsize():
+    emb = make_cache(2)
+    vectors = emb.embed_queries(["q1", "q2", "q3", "q1"])
+    assert len(vectors) == 4 and vectors[0] == vectors[3]
+    assert emb.maxsize == 2 and len(emb._cache) == 2
+
+
+def test_concurrent_queries_keep_the_cache_consistent():
+    emb = make_cache(8)
+
+    def work(i):
+        for j in range(300):
+            emb.embed_queries([f"q{(i * j) % 20}", f"q{j % 13}"])
+            emb.embed_query(f"q{(i + j) % 17}")
+
+    threads = [threading.Thread(target=work, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(emb._cache) == 8
+
+
+@pytest.mark.parametrize("env, required", [
+    ({}, True),
+    ({"VEHS_BACKEND": "local"}, False),
+    ({"VEHS_BACKEND": "local", "VEHS_LLM": "openai"}, True),
+    ({"VEHS_EMBEDDINGS": "hashing", "VEHS_LLM": "extractive"}, False),
+])
+def test_openai_key_only_needed_for_openai_backends(monkeypatch, env, required):
+    for name in ("VEHS_BACKEND", "VEHS_EMBEDDINGS", "VEHS_LLM"):
+        monkeypatch.delenv(name, raising=False)
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+    assert backends.needs_openai_key() is required
@@ -0,0 +1,34 @@
+import builtins
+import io
+
+import pytest
+
+import build_jobs
+
+
+def test_stage_upload_copies_the_workbook(tmp_path):
+    data = b"PK" + b"x" * (3 * build_jobs.UPLOAD_CHUNK_BYTES)
+    path = tmp_path / "release" / "upload.xlsx"
+    assert build_jobs.stage_upload(io.BytesIO(data), str(path)) == 3.0
+    assert path.read_bytes() == data
+    assert list(path.parent.iterdir()) == [path]
+
+
+@pytest.mark.parametrize("data, message", [
+    (b"", "empty"),
+    (b"hello", "not an .xlsx"),
+    (b"PK" + b"x" * (2 * 1024 * 1024), "larger than 1 MB"),
+])
+def test_stage_upload_rejects_and_cleans_up(tmp_path, data, message):
+    with pytest.raises(ValueError, match=message):
+        build_jobs.stage_upload(io.BytesIO(data), str(tmp_path / "upload.xlsx"), max_mb=1)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_stage_upload_reports_the_open_error(tmp_path, monkeypatch):
+    def deny(*args, **kwargs):
+        raise PermissionError("read-only file system")
+
+    monkeypatch.setattr(builtins, "open", deny)
+    with pytest.raises(PermissionError, match="read-only"):
+        build_jobs.stage_upload(io.BytesIO(b"PK"), str(tmp_path / "upload.xlsx"))
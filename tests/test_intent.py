@@ -0,0 +1,34 @@
+import pytest
+
+pytest.importorskip("langchain_community")
+pytest.importorskip("langgraph")
+
+import bot
+
+
+@pytest.mark.parametrize("question", [
+    "What are the most concerned hazards and what steps should we take to avoid it turning into an incident?",
+    "top hazards in HTDC last quarter",
+    "In HTDC last quarter, what hazards are most concerning and how do we prevent incidents?",
+    "Which PPE issues keep coming up?",
+    "How many permit hazards were reported?",
+])
+def test_hazard_theme_rankings_use_analytics(question):
+    assert bot.classify_intent(question) == "analytics"
+
+
+@pytest.mark.parametrize("question", [
+    "How many incidents were reported in HTDC last month?",
+    "Which department had the most incidents this year?",
+    "Top incident locations in 2024",
+    "Which department has the most PPE hazards?",
+    "Top hazards by department",
+    "Why did the leak happen at HTDC?",
+])
+def test_incident_counts_and_breakdowns_use_retrieval(question):
+    assert bot.classify_intent(question) == "hazard"
+
+
+def test_context_prefix_is_ignored():
+    q = "Context: top hazards last quarter\nQuestion: How many incidents were reported in HTDC last month?"
+    assert bot.classify_intent(q) == "hazard"
@@ -0,0 +1,123 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from vehs_pipeline import VEHSDataPipeline
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def legacy_cost(pipeline, row):
+    """estimated_cost_impact as the row-wise DataFrame.apply computed it"""
+    severity = row.get('severity_score', 1)
+    if pd.isna(severity):
+        severity = 1  # the row-wise version raised here; NaN is treated as C1
+    return pipeline._estimate_cost(row.get('category', 'Unknown'), severity, pipeline.cost_multipliers)
+
+
+def legacy_manhours(pipeline, row):
+    """estimated_manhours_impact as the row-wise DataFrame.apply computed it"""
+    return pipeline.base_hours.get(row.get('category', 'Incident'), 20) * (row.get('severity_score', 1) + 1)
+
+
+@pytest.fixture
+def frame():
+    return pd.DataFrame({
+        'category': ['Incident', 'Hazard ID', 'Audit', 'Inspection', None, 'Hazard ID', 'Audit', 'Incident',
+                     'Unknown', 'Audit'],
+        'severity_score': [0, 1, 2, 3, 2, np.nan, 7, 3.5, 4, -1],
+    })
+
+
+@pytest.mark.parametrize("dtype", [object, 'category'])
+def test_vectorized_cost_and_manhours_match_rowwise_apply(frame, dtype):
+    pipeline = VEHSDataPipeline('unused.xlsx')
+    frame['category'] = frame['category'].astype(dtype)
+    expected_cost = frame.apply(lambda row: legacy_cost(pipeline, row), axis=1)
+    expected_hours = frame.apply(lambda row: legacy_manhours(pipeline, row), axis=1)
+
+    enriched = pipeline._enrich_sheet(frame)
+
+    np.testing.assert_array_equal(enriched['estimated_cost_impact'].to_numpy(dtype=float),
+                                  expected_cost.to_numpy(dtype=float))
+    np.testing.assert_array_equal(enriched['estimated_manhours_impact'].to_numpy(dtype=float),
+                                  expected_hours.to_numpy(dtype=float))
+
+
+def test_empty_fingerprints_keep_the_existing_file(tmp_path):
+    import data_store
+    fingerprints = {'Incident': pd.Series([1, 2], index=['HSE-1', 'HSE-2'], dtype='uint64')}
+    data_store.write_fingerprints(fingerprints, str(tmp_path))
+    data_store.write_fingerprints({}, str(tmp_path))
+    assert data_store.read_fingerprints(str(tmp_path))['Incident'].tolist() == [1, 2]
+
+
+def test_incremental_cannot_run_in_parallel():
+    with pytest.raises(ValueError):
+        VEHSDataPipeline('unused.xlsx').run_pipeline(workers=2, incremental=True)
+
+
+def run_pipeline(workbook, data_dir, incremental=False):
+    pipeline = VEHSDataPipeline(str(workbook))
+    pipeline.run_pipeline(chained=True, incremental=incremental, data_dir=str(data_dir), excel_output=False)
+
+
+def test_incremental_run_matches_full_run(tmp_path):
+    import data_store
+    import synthetic_data
+
+    sheets = synthetic_data.make_workbook(0.3, sample_dir=str(ROOT / synthetic_data.SAMPLE_DIR),
+                                          report_path=str(ROOT / synthetic_data.REPORT_PATH))
+    incident = sheets['Incident']
+    records = incident['Incident Number'].unique()
+
+    def set_title(record, title):
+        incident.loc[incident['Incident Number'] == records[record], 'Title'] = title
+
+    # A record whose blank Title is forward-filled from the record above it in both exports
+    set_title(4, None)
+    synthetic_data.write_workbook(sheets, str(tmp_path / 'before.xlsx'))
+    run_pipeline(tmp_path / 'before.xlsx', tmp_path / 'incremental')
+
+    # The record above it gets a new Title, and another record's Title is blanked
+    set_title(3, 'Reformer tube leak')
+    set_title(1, None)
+    synthetic_data.write_workbook(sheets, str(tmp_path / 'after.xlsx'))
+    run_pipeline(tmp_path / 'after.xlsx', tmp_path / 'incremental', incremental=True)
+    run_pipeline(tmp_path / 'after.xlsx', tmp_path / 'full')
+
+    incremental = data_store.read_sheets(str(tmp_path / 'incremental'))
+    full = data_store.read_sheets(str(tmp_path / 'full'))
+    assert incremental.keys() == full.keys()
+    for name in full:
+        pd.testing.assert_frame_equal(incremental[name], full[name], obj=name)
+
+
+def test_ids_and_text_load_as_strings(tmp_path):
+    workbook = tmp_path / 'raw.xlsx'
+    pd.DataFrame({
+        'Incident Number': [1042, None, 1043],
+        'Title': ['Valve leak', None, 'Trip'],
+        'Description': ['Flange', 'Gasket', '12'],
+    }).to_excel(workbook, sheet_name='Incident', index=False)
+    pipeline = VEHSDataPipeline(str(workbook))
+    pipeline.load_data()
+    raw = pipeline.raw_data['Incident']
+    assert raw['Incident Number'].tolist()[::2] == ['1042', '1043'] and pd.isna(raw['Incident Number'][1])
+    assert raw['Description'].tolist() == ['Flange', 'Gasket', '12']
+
+
+def test_report_includes_the_xlsx_export(tmp_path):
+    import synthetic_data
+
+    sheets = synthetic_data.make_workbook(0.05, sample_dir=str(ROOT / synthetic_data.SAMPLE_DIR),
+                                          report_path=str(ROOT / synthetic_data.REPORT_PATH))
+    synthetic_data.write_workbook(sheets, str(tmp_path / 'raw.xlsx'))
+    pipeline = VEHSDataPipeline(str(tmp_path / 'raw.xlsx'))
+    report = pipeline.run_pipeline(str(tmp_path / 'processed.xlsx'), chained=True, data_dir=str(tmp_path / 'data'))
+    # The export is joined before run_pipeline returns and is part of the one report it builds
+    assert (tmp_path / 'processed.xlsx').exists()
+    assert 'save_processed_data' in report['stage_timings_seconds']
+    assert 'save_processed_data' in report['benchmark']['stages']
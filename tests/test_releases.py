@@ -0,0 +1,52 @@
+import threading
+import time
+
+import releases
+
+
+def test_waiting_writer_is_not_starved_by_new_readers():
+    lock = releases.SwapLock()
+    stop = threading.Event()
+    swapped = threading.Event()
+
+    def reader():
+        # Overlapping requests: without writer preference there is always one inside
+        while not stop.is_set():
+            with lock.reading():
+                time.sleep(0.01)
+
+    def writer():
+        with lock.writing():
+            swapped.set()
+
+    readers = [threading.Thread(target=reader) for _ in range(4)]
+    for t in readers:
+        t.start()
+    time.sleep(0.05)
+    threading.Thread(target=writer, daemon=True).start()
+    try:
+        assert swapped.wait(2)
+    finally:
+        stop.set()
+        for t in readers:
+            t.join()
+
+
+def test_writer_waits_for_readers_inside():
+    lock = releases.SwapLock()
+    order = []
+    entered = threading.Event()
+
+    def reader():
+        with lock.reading():
+            entered.set()
+            time.sleep(0.1)
+            order.append("read")
+
+    t = threading.Thread(target=reader)
+    t.start()
+    entered.wait(1)
+    with lock.writing():
+        order.append("write")
+    t.join()
+    assert order == ["read", "write"]
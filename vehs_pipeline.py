@@ -12,8 +12,15 @@ Requirements:
 - pandas
 - openpyxl
 - numpy
+- pyarrow (Parquet output in vehs_data/, Arrow-backed text columns, --workers N)
+- python-calamine (optional; faster workbook reader used when installed)
+- xlsxwriter (optional; faster writer for the xlsx export when installed)
 - datetime
 - re
+
+Outputs:
+- vehs_data/ (one Parquet file per sheet + manifest.json; read by bot.py and build_index.py)
+- EPCL_VEHS_Data_Processed.xlsx (optional export, written in a background thread alongside the Parquet save)
 """
 
 import pandas as pd
@@ -21,10 +28,66 @@ import numpy as np
 from datetime import datetime, timedelta
 import re
 import os
+import sys
+import time
+import tempfile
+import threading
+import importlib.util
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager, nullcontext
 from typing import Dict, List, Tuple, Optional
 import warnings
 warnings.filterwarnings('ignore')
 
+import data_store
+import vehs_schema
+
+# Raw export read by main() when --input is not given
+RAW_INPUT_PATH = os.getenv('VEHS_RAW_INPUT', "EPCL VEHS Data (Mar23 - Mar24).xlsx")
+
+# Text columns are stored as Arrow-backed strings when pyarrow is installed
+TEXT_DTYPE = 'string[pyarrow]' if importlib.util.find_spec('pyarrow') is not None else 'string'
+
+# Bump when the layout of the report's 'benchmark' section changes; runs with a
+# different version are not compared
+BENCHMARK_FORMAT_VERSION = 1
+
+# A stage is flagged when it is this much slower than the baseline run (0.25 = 25%)
+REGRESSION_THRESHOLD = 0.25
+
+# Raw ID and free-text columns read as strings rather than by type inference, which
+# turns numeric-looking values into floats (ID 1042 -> 1042.0, template version 1.10 -> 1.1)
+_AUDIT_TEXT_COLUMNS = ['Audit Number', 'Audit Title', 'Template Version', 'Question', 'Regulatory Reference',
+                       'Help Text', 'Answer', 'Recommendation', 'Response', 'Finding']
+_ACTION_TEXT_COLUMNS = ['Action Item Number', 'Action Item Title', 'Action Item Description',
+                        'Action Item Verification Details', 'Action Item Progress Notes']
+_EVENT_TEXT_COLUMNS = ['Incident Number', 'Title', 'Description', 'Corrective Actions']
+LOAD_TEXT_COLUMNS: Dict[str, List[str]] = {
+    'Incident': _EVENT_TEXT_COLUMNS + [
+        'Sequence Of Events', 'Why 1', 'Answer 1', 'Why 2', 'Answer 2', 'Why 3', 'Answer 3', 'Conclusion',
+        'Root Cause', 'Equipment Id', 'Tier 3 Description', 'Key Factor', 'Contributing Factor',
+    ],
+    'Hazard ID': _EVENT_TEXT_COLUMNS,
+    'Audit': _AUDIT_TEXT_COLUMNS,
+    'Audit Findings': _AUDIT_TEXT_COLUMNS,
+    'Inspection': _AUDIT_TEXT_COLUMNS + _ACTION_TEXT_COLUMNS,
+    'Inspection Findings': _AUDIT_TEXT_COLUMNS + _ACTION_TEXT_COLUMNS,
+}
+
+# Column-name cleaning, compiled once
+_NON_WORD_RE = re.compile(r'[^\w\s]')
+_WHITESPACE_RE = re.compile(r'\s+')
+_UNDERSCORES_RE = re.compile(r'_+')
+
+
+def preferred_excel_engine() -> str:
+    """Use the Rust-based calamine reader when available (pandas >= 2.2), else openpyxl"""
+    pandas_version = tuple(int(part) for part in pd.__version__.split('.')[:2])
+    if pandas_version >= (2, 2) and importlib.util.find_spec('python_calamine') is not None:
+        return 'calamine'
+    return 'openpyxl'
+
 
 class VEHSDataPipeline:
     """Comprehensive VEHS data cleaning and enhancement pipeline"""
@@ -67,20 +130,155 @@ class VEHSDataPipeline:
             'C2 - Serious': 2,
             'C3 - Severe': 3
         }
+        
+        # Cost and man-hour estimation tables (severity index C0-C3)
+        self.cost_multipliers = {
+            'Incident': {'base': 5000, 'multiplier': [1, 2, 5, 15]},  # C0-C3
+            'Hazard ID': {'base': 1000, 'multiplier': [0.5, 1, 2, 5]},
+            'Audit': {'base': 2000, 'multiplier': [1, 1.5, 3, 8]}
+        }
+        self.base_hours = {'Incident': 40, 'Hazard ID': 8, 'Audit': 16}
+        
+        # Wall-clock seconds per pipeline stage, filled by run_pipeline
+        self.stage_timings = {}
+        
+        # Benchmark profile: {stage: metrics} and {sheet: {stage: metrics}} with wall/CPU
+        # seconds, rows and rows/s (plus peak traced memory when profile_memory is set)
+        self.stage_profile = {}
+        self.sheet_profile = {}
+        self.run_profile = {}
+        self._memory_peaks = []
+        
+        # Workbook reader engine and per-sheet {column: dtype} for loading (columns missing
+        # from a sheet are ignored; the rest are inferred)
+        self.excel_engine = preferred_excel_engine()
+        self.load_dtypes = {sheet: {col: str for col in cols} for sheet, cols in LOAD_TEXT_COLUMNS.items()}
+        
+        # Record tracemalloc peak memory per stage and sheet (slows the run down)
+        self.profile_memory = False
+        
+        # When True, stages take ownership of their input frame instead of copying it
+        self.copy_free = False
+        
+        # Raw columns forward-filled from the row above when empty (continuation rows)
+        self.sequence_columns = ['Incident Number', 'Audit Number', 'Title', 'Description']
+        
+        # Raw columns identifying a record (first one present is used) and the
+        # per-record fingerprints used by incremental runs
+        self.record_key_columns = ['Incident Number', 'Audit Number']
+        self.row_fingerprints = {}
+        self.schema_memory = {}
+    
+    @contextmanager
+    def _profiled(self, rows: Optional[int] = None):
+        """Measure wall and CPU time (and optionally tracemalloc peak) of a block.
+        
+        Yields the metrics dict; callers may set 'rows' inside the block when the
+        row count is only known afterwards. Measurements nest: an inner block's
+        memory peak is folded into the enclosing one.
+        """
+        if self.profile_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            if self._memory_peaks:
+                self._memory_peaks[-1] = max(self._memory_peaks[-1], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+            self._memory_peaks.append(0)
+        metrics = {'rows': rows}
+        start, cpu_start = time.perf_counter(), time.process_time()
+        try:
+            yield metrics
+        finally:
+            metrics['wall_seconds'] = time.perf_counter() - start
+            metrics['cpu_seconds'] = time.process_time() - cpu_start
+            if self.profile_memory:
+                peak = max(self._memory_peaks.pop(), tracemalloc.get_traced_memory()[1])
+                if self._memory_peaks:
+                    self._memory_peaks[-1] = max(self._memory_peaks[-1], peak)
+                metrics['peak_memory_mb'] = peak / 1024 ** 2
+    
+    @staticmethod
+    def _accumulate(profile: dict, metrics: dict):
+        """Add one measurement to a profile entry (times and rows add up, peaks take the max)"""
+        for key in ('wall_seconds', 'cpu_seconds'):
+            profile[key] = round(profile.get(key, 0) + metrics[key], 4)
+        if metrics.get('rows') is not None:
+            profile['rows'] = profile.get('rows', 0) + int(metrics['rows'])
+            profile['rows_per_second'] = (
+                round(profile['rows'] / profile['wall_seconds'], 1) if profile['wall_seconds'] > 0 else None
+            )
+        if 'peak_memory_mb' in metrics:
+            profile['peak_memory_mb'] = round(max(profile.get('peak_memory_mb', 0), metrics['peak_memory_mb']), 2)
+    
+    @contextmanager
+    def _timed_stage(self, stage_name: str, rows: Optional[int] = None):
+        """Profile a pipeline stage into stage_profile/stage_timings.
+        
+        Repeated calls for the same stage (e.g. once per sheet in chained mode)
+        accumulate time and rows and keep the highest memory peak.
+        """
+        with self._profiled(rows) as metrics:
+            yield metrics
+        profile = self.stage_profile.setdefault(stage_name, {})
+        self._accumulate(profile, metrics)
+        self.stage_timings[stage_name] = profile['wall_seconds']
+        message = f"  [{stage_name}] {metrics['wall_seconds'] * 1000:.1f} ms (cpu {metrics['cpu_seconds'] * 1000:.1f} ms)"
+        if 'peak_memory_mb' in metrics:
+            message += f", peak {metrics['peak_memory_mb']:.1f} MB"
+        print(message)
+    
+    @contextmanager
+    def _timed_sheet(self, sheet_name: str, stage_name: str, rows: Optional[int] = None):
+        """Profile one sheet's pass through a stage into sheet_profile"""
+        with self._profiled(rows) as metrics:
+            yield metrics
+        self._accumulate(self.sheet_profile.setdefault(sheet_name, {}).setdefault(stage_name, {}), metrics)
+    
+    @staticmethod
+    def _row_count(sheets: Dict[str, pd.DataFrame]) -> int:
+        return int(sum(len(df) for df in sheets.values()))
+    
+    def _stage_input(self, df: pd.DataFrame, deep: bool = True) -> pd.DataFrame:
+        """Frame a stage works on: the input itself in copy-free mode, otherwise a copy"""
+        if self.copy_free:
+            return df
+        return df.copy(deep=deep)
+    
+    @staticmethod
+    def _copy_on_write():
+        """Enable pandas copy-on-write where supported (pandas >= 1.5)"""
+        try:
+            pd.get_option('mode.copy_on_write')
+        except (KeyError, pd.errors.OptionError):
+            return nullcontext()
+        return pd.option_context('mode.copy_on_write', True)
     
     def load_data(self):
-        """Load all sheets from Excel file"""
-        print("Loading Excel data...")
+        """Load all sheets from Excel file
+        
+        The workbook is opened once (openpyxl in read-only mode, or calamine when
+        installed) and every sheet is parsed from that single handle, instead of
+        re-opening and re-parsing the zip/XML for each sheet.
+        """
+        print(f"Loading Excel data (engine: {self.excel_engine})...")
         try:
-            excel_file = pd.ExcelFile(self.excel_file_path)
-            for sheet_name in excel_file.sheet_names:
-                print(f"  Loading sheet: {sheet_name}")
-                self.raw_data[sheet_name] = pd.read_excel(
-                    self.excel_file_path, 
-                    sheet_name=sheet_name,
-                    parse_dates=False  # We'll handle dates manually
-                )
-            print(f"Loaded {len(self.raw_data)} sheets successfully")
+            load_start = time.perf_counter()
+            total_rows = 0
+            with pd.ExcelFile(self.excel_file_path, engine=self.excel_engine) as excel_file:
+                for sheet_name in excel_file.sheet_names:
+                    with self._timed_sheet(sheet_name, 'load_data') as metrics:
+                        self.raw_data[sheet_name] = excel_file.parse(
+                            sheet_name,
+                            dtype=self.load_dtypes.get(sheet_name),
+                            parse_dates=False  # We'll handle dates manually
+                        )
+                        metrics['rows'] = rows = len(self.raw_data[sheet_name])
+                    elapsed = metrics['wall_seconds']
+                    total_rows += rows
+                    print(f"  Loaded sheet: {sheet_name} ({rows} rows, {rows / max(elapsed, 1e-9):,.0f} rows/s)")
+            elapsed = time.perf_counter() - load_start
+            print(f"Loaded {len(self.raw_data)} sheets successfully "
+                  f"({total_rows} rows in {elapsed:.2f}s, {total_rows / max(elapsed, 1e-9):,.0f} rows/s)")
         except Exception as e:
             print(f"Error loading Excel file: {e}")
             raise
@@ -91,57 +289,67 @@ class VEHSDataPipeline:
         
         for sheet_name, df in self.raw_data.items():
             print(f"\nProcessing sheet: {sheet_name}")
-            cleaned_df = df.copy()
-            
-            # Calculate null percentages for reporting
-            null_percentages = (df.isnull().sum() / len(df)) * 100
-            high_null_cols = null_percentages[null_percentages > 80].index.tolist()
-            
-            if high_null_cols:
-                print(f"  High null columns (>80%): {len(high_null_cols)}")
-            
-            # Strategy 1: Drop columns with >95% nulls (likely unused fields)
-            very_high_null_cols = null_percentages[null_percentages > 95].index.tolist()
-            if very_high_null_cols:
-                cleaned_df = cleaned_df.drop(columns=very_high_null_cols)
-                print(f"  Dropped {len(very_high_null_cols)} columns with >95% nulls")
-            
-            # Strategy 2: Fill common categorical nulls
-            categorical_fills = {
-                'Status': 'Unknown',
-                'Category': 'Not Specified',
-                'Priority': 'Medium',
-                'Department': 'Not Assigned',
-                'Location': 'Not Specified',
-                'Audit Status': 'Unknown'
-            }
-            
-            for col, fill_value in categorical_fills.items():
-                if col in cleaned_df.columns:
-                    filled_count = cleaned_df[col].isnull().sum()
-                    cleaned_df[col] = cleaned_df[col].fillna(fill_value)
-                    if filled_count > 0:
-                        print(f"  Filled {filled_count} nulls in {col}")
-            
-            # Strategy 3: Forward fill for sequential data
-            sequence_cols = ['Incident Number', 'Audit Number', 'Title', 'Description']
-            for col in sequence_cols:
-                if col in cleaned_df.columns:
-                    before_nulls = cleaned_df[col].isnull().sum()
-                    cleaned_df[col] = cleaned_df[col].fillna(method='ffill')
-                    after_nulls = cleaned_df[col].isnull().sum()
-                    filled = before_nulls - after_nulls
-                    if filled > 0:
-                        print(f"  Forward filled {filled} nulls in {col}")
-            
-            # Strategy 4: Create null indicator columns for important fields
-            important_cols = ['Root Cause', 'Corrective Actions', 'Investigation Team Leader']
-            for col in important_cols:
-                if col in cleaned_df.columns:
-                    null_indicator = f"{col}_is_missing"
-                    cleaned_df[null_indicator] = cleaned_df[col].isnull()
-            
-            self.cleaned_data[sheet_name] = cleaned_df
+            with self._timed_sheet(sheet_name, 'clean_null_values', len(df)):
+                self.cleaned_data[sheet_name] = self._clean_sheet(df)
+    
+    def _clean_sheet(self, df: pd.DataFrame, null_reference: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+        """Null handling for a single sheet
+        
+        null_reference is the frame used to decide which columns are mostly
+        empty; incremental runs pass the full sheet so a small batch of changed
+        rows drops the same columns as a full run would.
+        """
+        cleaned_df = self._stage_input(df)
+        reference = df if null_reference is None else null_reference
+        
+        # Calculate null percentages for reporting
+        null_percentages = (reference.isnull().sum() / len(reference)) * 100
+        high_null_cols = null_percentages[null_percentages > 80].index.tolist()
+        
+        if high_null_cols:
+            print(f"  High null columns (>80%): {len(high_null_cols)}")
+        
+        # Strategy 1: Drop columns with >95% nulls (likely unused fields)
+        very_high_null_cols = null_percentages[null_percentages > 95].index.tolist()
+        if very_high_null_cols:
+            cleaned_df = cleaned_df.drop(columns=very_high_null_cols)
+            print(f"  Dropped {len(very_high_null_cols)} columns with >95% nulls")
+        
+        # Strategy 2: Fill common categorical nulls
+        categorical_fills = {
+            'Status': 'Unknown',
+            'Category': 'Not Specified',
+            'Priority': 'Medium',
+            'Department': 'Not Assigned',
+            'Location': 'Not Specified',
+            'Audit Status': 'Unknown'
+        }
+        
+        for col, fill_value in categorical_fills.items():
+            if col in cleaned_df.columns:
+                filled_count = cleaned_df[col].isnull().sum()
+                cleaned_df[col] = cleaned_df[col].fillna(fill_value)
+                if filled_count > 0:
+                    print(f"  Filled {filled_count} nulls in {col}")
+        
+        # Strategy 3: Forward fill for sequential data
+        for col in self.sequence_columns:
+            if col in cleaned_df.columns:
+                before_nulls = cleaned_df[col].isnull().sum()
+                cleaned_df[col] = cleaned_df[col].ffill()
+                after_nulls = cleaned_df[col].isnull().sum()
+                filled = before_nulls - after_nulls
+                if filled > 0:
+                    print(f"  Forward filled {filled} nulls in {col}")
+        
+        # Strategy 4: Create null indicator columns for important fields
+        important_cols = ['Root Cause', 'Corrective Actions', 'Investigation Team Leader']
+        for col in important_cols:
+            if col in cleaned_df.columns:
+                null_indicator = f"{col}_is_missing"
+                cleaned_df[null_indicator] = cleaned_df[col].isnull()
+        
+        return cleaned_df
     
     def standardize_formats(self):
         """Standardize date formats and field naming"""
@@ -149,67 +357,84 @@ class VEHSDataPipeline:
         
         for sheet_name, df in self.cleaned_data.items():
             print(f"\nProcessing sheet: {sheet_name}")
-            standardized_df = df.copy()
-            
-            # 1. Standardize column names
-            rename_mapping = {}
-            for old_name in standardized_df.columns:
-                if old_name in self.field_standardization:
-                    new_name = self.field_standardization[old_name]
-                    rename_mapping[old_name] = new_name
-                else:
-                    # Clean column names: lowercase, replace spaces/special chars with underscores
-                    clean_name = re.sub(r'[^\w\s]', '', old_name.lower())
-                    clean_name = re.sub(r'\s+', '_', clean_name.strip())
-                    clean_name = re.sub(r'_+', '_', clean_name)
-                    if clean_name != old_name and clean_name not in rename_mapping.values():
-                        rename_mapping[old_name] = clean_name
-            
-            if rename_mapping:
-                standardized_df = standardized_df.rename(columns=rename_mapping)
-                print(f"  Renamed {len(rename_mapping)} columns")
-            
-            # 2. Standardize date formats
-            date_cols_found = []
-            for col in standardized_df.columns:
-                if any(date_keyword in col.lower() for date_keyword in ['date', 'entered', 'time']):
-                    if standardized_df[col].dtype == 'object' or 'datetime' in str(standardized_df[col].dtype):
-                        try:
-                            standardized_df[col] = pd.to_datetime(standardized_df[col], errors='coerce')
-                            date_cols_found.append(col)
-                        except:
-                            pass
-            
-            if date_cols_found:
-                print(f"  Standardized {len(date_cols_found)} date columns")
-            
-            # 3. Standardize categorical values
-            categorical_standardization = {
-                'status': {'CLOSED': 'Closed', 'OPEN': 'Open', 'IN PROGRESS': 'In Progress'},
-                'priority': {'HIGH': 'High', 'MEDIUM': 'Medium', 'LOW': 'Low'},
-                'category': {'INCIDENT': 'Incident', 'HAZARD ID': 'Hazard ID', 'AUDIT': 'Audit'}
-            }
-            
-            for col in standardized_df.columns:
-                col_lower = col.lower()
-                if col_lower in categorical_standardization:
-                    mapping = categorical_standardization[col_lower]
-                    standardized_df[col] = standardized_df[col].replace(mapping)
-            
-            # 4. Clean text fields
-            text_columns = standardized_df.select_dtypes(include=['object']).columns
-            for col in text_columns:
-                try:
-                    if col in standardized_df.columns and standardized_df[col].dtype == 'object':
-                        # Remove extra whitespace and standardize
-                        standardized_df[col] = standardized_df[col].astype(str).str.strip()
-                        standardized_df[col] = standardized_df[col].replace('nan', np.nan)
-                        standardized_df[col] = standardized_df[col].replace('None', np.nan)
-                except (AttributeError, KeyError):
-                    # Skip columns that cause issues
-                    continue
-            
-            self.cleaned_data[sheet_name] = standardized_df
+            with self._timed_sheet(sheet_name, 'standardize_formats', len(df)):
+                self.cleaned_data[sheet_name] = self._standardize_sheet(df)
+    
+    def _standardize_sheet(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Column naming, date and text standardization for a single sheet"""
+        standardized_df = self._stage_input(df)
+        
+        # 1. Standardize column names
+        rename_mapping = {}
+        for old_name in standardized_df.columns:
+            if old_name in self.field_standardization:
+                new_name = self.field_standardization[old_name]
+                rename_mapping[old_name] = new_name
+            else:
+                # Clean column names: lowercase, replace spaces/special chars with underscores
+                clean_name = _NON_WORD_RE.sub('', old_name.lower())
+                clean_name = _WHITESPACE_RE.sub('_', clean_name.strip())
+                clean_name = _UNDERSCORES_RE.sub('_', clean_name)
+                if clean_name != old_name and clean_name not in rename_mapping.values():
+                    rename_mapping[old_name] = clean_name
+        
+        if rename_mapping:
+            standardized_df = standardized_df.rename(columns=rename_mapping)
+            print(f"  Renamed {len(rename_mapping)} columns")
+        
+        # 2. Standardize date formats
+        date_cols_found = []
+        for col in standardized_df.columns:
+            if any(date_keyword in col.lower() for date_keyword in ['date', 'entered', 'time']):
+                if standardized_df[col].dtype == 'object' or 'datetime' in str(standardized_df[col].dtype):
+                    try:
+                        standardized_df[col] = pd.to_datetime(standardized_df[col], errors='coerce')
+                        date_cols_found.append(col)
+                    except:
+                        pass
+        
+        if date_cols_found:
+            print(f"  Standardized {len(date_cols_found)} date columns")
+        
+        # 3. Standardize categorical values
+        categorical_standardization = {
+            'status': {'CLOSED': 'Closed', 'OPEN': 'Open', 'IN PROGRESS': 'In Progress'},
+            'priority': {'HIGH': 'High', 'MEDIUM': 'Medium', 'LOW': 'Low'},
+            'category': {'INCIDENT': 'Incident', 'HAZARD ID': 'Hazard ID', 'AUDIT': 'Audit'}
+        }
+        
+        for col in standardized_df.columns:
+            col_lower = col.lower()
+            if col_lower in categorical_standardization:
+                mapping = categorical_standardization[col_lower]
+                standardized_df[col] = standardized_df[col].replace(mapping)
+        
+        # 4. Clean text fields
+        text_columns = standardized_df.select_dtypes(include=['object']).columns
+        if self.profile_memory and len(text_columns):
+            before_mb = standardized_df[text_columns].memory_usage(deep=True).sum() / 1024 ** 2
+        for col in text_columns:
+            try:
+                if col in standardized_df.columns and standardized_df[col].dtype == 'object':
+                    standardized_df[col] = self._normalize_text(standardized_df[col])
+            except (AttributeError, KeyError):
+                # Skip columns that cause issues
+                continue
+        if self.profile_memory and len(text_columns):
+            after_mb = standardized_df[text_columns].memory_usage(deep=True).sum() / 1024 ** 2
+            print(f"  Text columns: {before_mb:.2f} MB -> {after_mb:.2f} MB")
+        
+        return standardized_df
+    
+    @staticmethod
+    def _normalize_text(values: pd.Series) -> pd.Series:
+        """Strip whitespace and null out literal 'nan'/'None' in one pass over a text column.
+        
+        Converts to TEXT_DTYPE first, so real nulls stay nulls (no 'nan' string
+        round trip) and non-string cells are stringified as before.
+        """
+        text = values.astype(TEXT_DTYPE).str.strip()
+        return text.mask(text.isin(['nan', 'None']))
     
     def enrich_data(self):
         """Add context fields like cost impact, man-hours, risk scores"""
@@ -217,88 +442,295 @@ class VEHSDataPipeline:
         
         for sheet_name, df in self.cleaned_data.items():
             print(f"\nProcessing sheet: {sheet_name}")
-            enriched_df = df.copy()
-            
-            # 1. Calculate severity scores
-            if 'worst_case_consequence_incident' in enriched_df.columns:
-                enriched_df['severity_score'] = enriched_df['worst_case_consequence_incident'].map(
-                    self.severity_mapping
-                ).fillna(1)  # Default to minor if unknown
-            elif 'worst_case_consequence_potential_hazard_id' in enriched_df.columns:
-                enriched_df['severity_score'] = enriched_df['worst_case_consequence_potential_hazard_id'].map(
-                    self.severity_mapping
-                ).fillna(1)
-            
-            # 2. Calculate time-based metrics
-            if 'occurrence_date' in enriched_df.columns and 'reported_date' in enriched_df.columns:
-                enriched_df['reporting_delay_days'] = (
-                    enriched_df['reported_date'] - enriched_df['occurrence_date']
-                ).dt.days.fillna(0)
-            
-            if 'reported_date' in enriched_df.columns and 'completion_date' in enriched_df.columns:
-                enriched_df['resolution_time_days'] = (
-                    enriched_df['completion_date'] - enriched_df['reported_date']
-                ).dt.days
-            
-            # 3. Estimate cost impact based on severity and type
-            cost_multipliers = {
-                'Incident': {'base': 5000, 'multiplier': [1, 2, 5, 15]},  # C0-C3
-                'Hazard ID': {'base': 1000, 'multiplier': [0.5, 1, 2, 5]},
-                'Audit': {'base': 2000, 'multiplier': [1, 1.5, 3, 8]}
-            }
-            
-            if 'category' in enriched_df.columns and 'severity_score' in enriched_df.columns:
-                enriched_df['estimated_cost_impact'] = enriched_df.apply(
-                    lambda row: self._estimate_cost(
-                        row.get('category', 'Unknown'),
-                        row.get('severity_score', 1),
-                        cost_multipliers
-                    ), axis=1
-                )
-            
-            # 4. Estimate man-hours lost
-            if 'severity_score' in enriched_df.columns:
-                base_hours = {'Incident': 40, 'Hazard ID': 8, 'Audit': 16}
-                enriched_df['estimated_manhours_impact'] = enriched_df.apply(
-                    lambda row: base_hours.get(row.get('category', 'Incident'), 20) * 
-                               (row.get('severity_score', 1) + 1), axis=1
-                )
-            
-            # 5. Risk score calculation
-            if 'severity_score' in enriched_df.columns:
-                # Combine severity with other risk factors
-                enriched_df['risk_score'] = enriched_df['severity_score'].fillna(1)
-                
-                # Increase risk for repeated incidents
-                if 'repeated_incident' in enriched_df.columns:
-                    mask = enriched_df['repeated_incident'].str.lower() == 'yes'
-                    enriched_df.loc[mask, 'risk_score'] *= 1.5
-                
-                # Increase risk for overdue items
-                if 'resolution_time_days' in enriched_df.columns:
-                    overdue_mask = enriched_df['resolution_time_days'] > 30
-                    enriched_df.loc[overdue_mask, 'risk_score'] *= 1.3
-            
-            # 6. Department risk profiling
-            if 'department' in enriched_df.columns:
-                dept_risk = enriched_df.groupby('department')['risk_score'].mean().to_dict()
-                enriched_df['department_avg_risk'] = enriched_df['department'].map(dept_risk)
-            
-            # 7. Compliance indicators
-            compliance_fields = ['management_system_non_compliance', 'psm', 'ems', 'ohih']
-            compliance_counts = []
-            for field in compliance_fields:
-                if field in enriched_df.columns:
-                    compliance_counts.append(enriched_df[field].notna().astype(int))
-            
-            if compliance_counts:
-                # Sum across all compliance fields for each row
-                enriched_df['compliance_systems_involved'] = pd.concat(compliance_counts, axis=1).sum(axis=1)
+            with self._timed_sheet(sheet_name, 'enrich_data', len(df)):
+                self.enriched_data[sheet_name] = self._enrich_sheet(df)
+            print(f"  Added enrichment fields for {sheet_name}")
+    
+    def _enrich_sheet(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Derived risk, cost and compliance fields for a single sheet"""
+        # Shallow copy: enrichment only adds or reassigns columns, never mutates existing data
+        enriched_df = self._stage_input(df, deep=False)
+        
+        # 1. Calculate severity scores
+        if 'worst_case_consequence_incident' in enriched_df.columns:
+            enriched_df['severity_score'] = enriched_df['worst_case_consequence_incident'].map(
+                self.severity_mapping
+            ).fillna(1)  # Default to minor if unknown
+        elif 'worst_case_consequence_potential_hazard_id' in enriched_df.columns:
+            enriched_df['severity_score'] = enriched_df['worst_case_consequence_potential_hazard_id'].map(
+                self.severity_mapping
+            ).fillna(1)
+        
+        # 2. Calculate time-based metrics
+        if 'occurrence_date' in enriched_df.columns and 'reported_date' in enriched_df.columns:
+            enriched_df['reporting_delay_days'] = (
+                enriched_df['reported_date'] - enriched_df['occurrence_date']
+            ).dt.days.fillna(0)
+        
+        if 'reported_date' in enriched_df.columns and 'completion_date' in enriched_df.columns:
+            enriched_df['resolution_time_days'] = (
+                enriched_df['completion_date'] - enriched_df['reported_date']
+            ).dt.days
+        
+        # 3. Estimate cost impact based on severity and type
+        if 'category' in enriched_df.columns and 'severity_score' in enriched_df.columns:
+            enriched_df['estimated_cost_impact'] = self._estimate_cost_vectorized(
+                enriched_df['category'], enriched_df['severity_score']
+            )
+        
+        # 4. Estimate man-hours lost
+        if 'severity_score' in enriched_df.columns:
+            if 'category' in enriched_df.columns:
+                hours = enriched_df['category'].map(self.base_hours).astype(float).fillna(20).to_numpy()
             else:
-                enriched_df['compliance_systems_involved'] = 0
+                hours = self.base_hours['Incident']
+            enriched_df['estimated_manhours_impact'] = hours * (enriched_df['severity_score'].to_numpy() + 1)
+        
+        # 5. Risk score calculation
+        if 'severity_score' in enriched_df.columns:
+            # Combine severity with other risk factors
+            enriched_df['risk_score'] = enriched_df['severity_score'].fillna(1)
+        
+            # Increase risk for repeated incidents
+            if 'repeated_incident' in enriched_df.columns:
+                mask = enriched_df['repeated_incident'].str.lower().eq('yes').fillna(False).astype(bool)
+                enriched_df.loc[mask, 'risk_score'] *= 1.5
+        
+            # Increase risk for overdue items
+            if 'resolution_time_days' in enriched_df.columns:
+                overdue_mask = enriched_df['resolution_time_days'] > 30
+                enriched_df.loc[overdue_mask, 'risk_score'] *= 1.3
+        
+        # 6. Department risk profiling
+        self._add_department_avg_risk(enriched_df)
+        
+        # 7. Compliance indicators
+        compliance_fields = ['management_system_non_compliance', 'psm', 'ems', 'ohih']
+        compliance_counts = []
+        for field in compliance_fields:
+            if field in enriched_df.columns:
+                compliance_counts.append(enriched_df[field].notna().astype(int))
+        
+        if compliance_counts:
+            # Sum across all compliance fields for each row
+            enriched_df['compliance_systems_involved'] = pd.concat(compliance_counts, axis=1).sum(axis=1)
+        else:
+            enriched_df['compliance_systems_involved'] = 0
+        
+        return enriched_df
+    
+    def _add_department_avg_risk(self, df: pd.DataFrame):
+        """Sheet-level aggregate: mean risk_score per department, mapped back onto each row"""
+        if 'department' in df.columns:
+            dept_risk = df.groupby('department', observed=True)['risk_score'].mean().to_dict()
+            df['department_avg_risk'] = df['department'].map(dept_risk)
+    
+    def _run_sheet_stages(self, sheet_name: str, df: pd.DataFrame,
+                          null_reference: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+        """Clean, standardize and enrich one sheet, profiling each stage"""
+        rows = len(df)
+        for stage_name, stage in [('clean_null_values', lambda frame: self._clean_sheet(frame, null_reference)),
+                                  ('standardize_formats', self._standardize_sheet),
+                                  ('enrich_data', self._enrich_sheet)]:
+            with self._timed_stage(stage_name, rows), self._timed_sheet(sheet_name, stage_name, rows):
+                df = stage(df)
+        return df
+    
+    def process_sheets_chained(self):
+        """Clean, standardize and enrich each sheet as a single chain.
+        
+        Each raw sheet is popped from raw_data and passed through the stages
+        without defensive copies (copy-on-write protects shared data), so only
+        one intermediate version of one sheet is alive at a time. raw_data and
+        cleaned_data are left empty afterwards.
+        """
+        print("\nProcessing sheets (chained, copy-free)...")
+        self.copy_free = True
+        try:
+            with self._copy_on_write():
+                for sheet_name in list(self.raw_data):
+                    df = self.raw_data.pop(sheet_name)
+                    print(f"\nProcessing sheet: {sheet_name}")
+                    self.enriched_data[sheet_name] = self._run_sheet_stages(sheet_name, df)
+                    del df
+        finally:
+            self.copy_free = False
+            self.cleaned_data.clear()
+    
+    def _record_keys(self, df: pd.DataFrame) -> Optional[pd.Series]:
+        """Record key per raw row: the forward-filled incident/audit number (None if the sheet has neither)"""
+        for col in self.record_key_columns:
+            if col in df.columns:
+                return df[col].ffill().astype(str).str.strip()
+        return None
+    
+    def _fill_sequences(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Shallow copy of a raw sheet with the sequence columns forward-filled over all of its rows"""
+        filled = df.copy(deep=False)
+        for col in self.sequence_columns:
+            if col in filled.columns:
+                filled[col] = filled[col].ffill()
+        return filled
+    
+    def compute_fingerprints(self):
+        """Hash every raw record (all of its rows, in order) into one 64-bit fingerprint per key
+        
+        Hashes are taken after forward-filling the sequence columns, so a record
+        that inherits a Title/Description from the record above it changes
+        fingerprint when that value changes.
+        """
+        self.row_fingerprints = {}
+        for sheet_name, df in self.raw_data.items():
+            keys = self._record_keys(df)
+            if keys is None:
+                continue
+            row_hash = pd.util.hash_pandas_object(self._fill_sequences(df), index=False)
+            position = keys.groupby(keys).cumcount()
+            combined = pd.util.hash_pandas_object(
+                pd.DataFrame({'key': keys, 'position': position, 'row': row_hash}), index=False
+            )
+            # uint64 sums wrap around, which is fine for a fingerprint
+            self.row_fingerprints[sheet_name] = combined.groupby(keys.to_numpy()).sum()
+    
+    def _merge_incremental_sheet(self, sheet_name: str, raw_df: pd.DataFrame,
+                                 prior_df: pd.DataFrame, prior_fp: pd.Series) -> Optional[pd.DataFrame]:
+        """Reprocess only new/changed records of one sheet and merge them with the previous output.
+        
+        Returns None when the previous output cannot be reused (e.g. the column
+        layout changed), in which case the caller processes the whole sheet.
+        """
+        keys = self._record_keys(raw_df)
+        key_col = next(col for col in self.record_key_columns if col in raw_df.columns)
+        prior_key_col = self.field_standardization.get(key_col, key_col)
+        if prior_key_col not in prior_df.columns:
+            return None
+        
+        current_fp = self.row_fingerprints[sheet_name]
+        unchanged = current_fp.index[current_fp.eq(prior_fp.reindex(current_fp.index)).to_numpy()]
+        delta_mask = ~keys.isin(unchanged)
+        
+        prior_keys = prior_df[prior_key_col].astype(str).str.strip()
+        kept = prior_df[prior_keys.isin(unchanged).to_numpy()]
+        kept_keys = prior_keys[prior_keys.isin(unchanged)]
+        raw_kept_keys = keys[~delta_mask]
+        if len(kept) != len(raw_kept_keys):
+            return None
+        
+        # Give reused rows the index labels of their rows in the current export, so the
+        # merged sheet has the same row order and index as a full run would produce
+        raw_labels = pd.Series(raw_kept_keys.index, index=pd.MultiIndex.from_arrays(
+            [raw_kept_keys.to_numpy(), raw_kept_keys.groupby(raw_kept_keys).cumcount().to_numpy()]
+        ))
+        kept_labels = raw_labels.reindex(pd.MultiIndex.from_arrays(
+            [kept_keys.to_numpy(), kept_keys.groupby(kept_keys).cumcount().to_numpy()]
+        ))
+        if kept_labels.isna().any():
+            return None
+        kept = kept.set_axis(kept_labels.to_numpy(dtype=np.int64), axis=0)
+        
+        n_changed = int(keys[delta_mask].nunique())
+        n_removed = int((~prior_fp.index.isin(current_fp.index)).sum())
+        print(f"  {n_changed} new/changed records ({int(delta_mask.sum())} rows), "
+              f"{n_removed} removed, {len(kept)} rows reused")
+        
+        if not delta_mask.any():
+            merged = kept
+        else:
+            # Forward-fill over the whole sheet first: a changed record's leading blanks take
+            # their value from the row above it, which is usually not part of the delta
+            delta = self._run_sheet_stages(sheet_name, self._fill_sequences(raw_df)[delta_mask],
+                                           null_reference=raw_df)
+            if set(delta.columns) != set(prior_df.columns):
+                return None
+            delta = delta[prior_df.columns]
+            for col in prior_df.columns:
+                prior_is_date = pd.api.types.is_datetime64_any_dtype(prior_df[col])
+                delta_is_date = pd.api.types.is_datetime64_any_dtype(delta[col])
+                if prior_is_date and not delta_is_date:
+                    # e.g. an all-empty column in the delta that was never parsed as dates
+                    delta[col] = pd.to_datetime(delta[col], errors='coerce')
+                    delta_is_date = pd.api.types.is_datetime64_any_dtype(delta[col])
+                if prior_is_date != delta_is_date:
+                    # Date parsing of this column differs between the delta and the
+                    # previous output; only a full pass gives a consistent dtype
+                    return None
+            merged = pd.concat([kept, delta]).sort_index()
+        
+        # Sheet-level aggregates depend on every row, so recompute them over the merged sheet
+        if 'risk_score' in merged.columns:
+            self._add_department_avg_risk(merged)
+        return merged
+    
+    def process_sheets_incremental(self, data_dir: str = data_store.DATA_DIR):
+        """Process only records that are new or changed since the last run in data_dir.
+        
+        Records are keyed by incident/audit number and compared by fingerprint
+        with the previous run's row_fingerprints. Unchanged records are reused
+        from the previous columnar output; changed ones go through the cleaning,
+        standardization and enrichment stages. Sheets without a record key, or
+        without previous output, are processed in full.
+        """
+        print(f"\nProcessing sheets incrementally against {data_dir}/...")
+        prior_sheets = data_store.read_sheets(data_dir)
+        prior_fingerprints = data_store.read_fingerprints(data_dir) or {}
+        if not prior_sheets or not prior_fingerprints:
+            print("  No previous run found; processing all rows")
+            self.process_sheets_chained()
+            return
+        
+        self.copy_free = True
+        try:
+            with self._copy_on_write():
+                for sheet_name in list(self.raw_data):
+                    raw_df = self.raw_data.pop(sheet_name)
+                    print(f"\nProcessing sheet: {sheet_name}")
+                    merged = None
+                    if sheet_name in self.row_fingerprints and sheet_name in prior_sheets \
+                            and sheet_name in prior_fingerprints:
+                        merged = self._merge_incremental_sheet(
+                            sheet_name, raw_df, prior_sheets.pop(sheet_name), prior_fingerprints[sheet_name]
+                        )
+                    if merged is None:
+                        print("  Processing all rows")
+                        merged = self._run_sheet_stages(sheet_name, raw_df)
+                    self.enriched_data[sheet_name] = merged
+                    del raw_df
+        finally:
+            self.copy_free = False
+            self.cleaned_data.clear()
+    
+    def process_sheets_parallel(self, workers: int):
+        """Load, clean, standardize and enrich sheets in a process pool.
+        
+        Each worker handles one sheet end to end and hands its result back as a
+        Parquet file in a scratch directory (Arrow columnar data instead of a
+        pickled DataFrame). Results are stored in enriched_data in workbook order,
+        and each worker's record fingerprints in row_fingerprints, so a later
+        incremental run can start from this one.
+        """
+        print(f"\nProcessing sheets in parallel ({workers} workers)...")
+        with pd.ExcelFile(self.excel_file_path, engine=self.excel_engine) as excel_file:
+            sheet_names = excel_file.sheet_names
+        
+        with tempfile.TemporaryDirectory(prefix='vehs_sheets_') as scratch_dir:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [
+                    pool.submit(_process_sheet_worker, self.excel_file_path, sheet_name,
+                                os.path.join(scratch_dir, f"sheet_{i}.parquet"), self.profile_memory)
+                    for i, sheet_name in enumerate(sheet_names)
+                ]
+                results = [future.result() for future in futures]
             
-            self.enriched_data[sheet_name] = enriched_df
-            print(f"  Added enrichment fields for {sheet_name}")
+            self.row_fingerprints = {}
+            for sheet_name, parquet_path, profile, fingerprints in results:
+                self.enriched_data[sheet_name] = data_store.read_parquet(parquet_path)
+                self.sheet_profile[sheet_name] = profile
+                if fingerprints is not None:
+                    self.row_fingerprints[sheet_name] = fingerprints
+                print(f"  {sheet_name}: {len(self.enriched_data[sheet_name])} rows "
+                      f"in {sum(stage['wall_seconds'] for stage in profile.values()):.2f}s")
+        
+        print(f"Processed {len(self.enriched_data)} sheets in parallel")
     
     def _estimate_cost(self, category: str, severity: float, cost_multipliers: dict) -> float:
         """Estimate cost impact based on category and severity"""
@@ -311,111 +743,125 @@ class VEHSDataPipeline:
         
         return base_cost * multiplier
     
+    def _estimate_cost_vectorized(self, category: pd.Series, severity: pd.Series) -> np.ndarray:
+        """Vectorized _estimate_cost: index a (category x severity) cost matrix"""
+        categories = list(self.cost_multipliers)
+        cost_matrix = np.array([
+            [self._estimate_cost(cat, sev, self.cost_multipliers) for sev in range(4)]
+            for cat in categories
+        ])
+        # Unknown categories fall back to 'Incident', matching _estimate_cost
+        cat_idx = category.map({cat: i for i, cat in enumerate(categories)}).astype(float)
+        cat_idx = cat_idx.fillna(categories.index('Incident')).to_numpy(dtype=np.intp)
+        # Missing severities count as C1, the default severity_score uses for unknown consequences
+        # (the row-wise version raised on NaN); int() truncation, the C3 cap and negative indexing match it
+        sev = np.nan_to_num(severity.to_numpy(dtype=float), nan=1.0)
+        sev_idx = np.minimum(sev, 3).astype(np.intp)
+        return cost_matrix[cat_idx, sev_idx]
+    
+    # Typed edge list written to the Relationships sheet
+    relationship_dtypes = {
+        'source_type': 'category',
+        'source_id': 'string',
+        'target_type': 'category',
+        'target_id': 'string',
+        'relationship_type': 'category'
+    }
+    
+    def _edges(self, source_ids: pd.Series, target_ids: pd.Series,
+               source_type: str, target_type: str, relationship_type: str) -> pd.DataFrame:
+        """Build a block of relationship edges from aligned source/target ID columns"""
+        return pd.DataFrame({
+            'source_type': source_type,
+            'source_id': source_ids.to_numpy(),
+            'target_type': target_type,
+            'target_id': target_ids.to_numpy(),
+            'relationship_type': relationship_type
+        }, columns=list(self.relationship_dtypes))
+    
+    def _finding_edges(self, findings_df: pd.DataFrame, source_type: str,
+                       target_type: str, relationship_type: str) -> pd.DataFrame:
+        """Link each finding row to its parent audit/inspection via audit_id"""
+        if 'audit_id' not in findings_df.columns:
+            return self._edges(pd.Series(dtype=object), pd.Series(dtype=object),
+                               source_type, target_type, relationship_type)
+        audit_ids = findings_df['audit_id'].dropna()
+        target_ids = audit_ids.astype(str) + '_Finding_' + audit_ids.index.astype(str)
+        return self._edges(audit_ids, target_ids, source_type, target_type, relationship_type)
+    
+    def _group_sheets_by(self, keyword: str, key_name: str) -> pd.DataFrame:
+        """Summarize which sheets mention each distinct value of the first column matching keyword"""
+        pairs = []
+        for sheet_name, df in self.enriched_data.items():
+            key_cols = [col for col in df.columns if keyword in col.lower()]
+            if key_cols:
+                key_col = key_cols[0]  # Use first matching column found
+                try:
+                    values = df[key_col].dropna().drop_duplicates()
+                except (AttributeError, KeyError, TypeError):
+                    continue
+                pairs.append(pd.DataFrame({key_name: values.to_numpy(), 'sheet': sheet_name}))
+        
+        if not pairs:
+            return pd.DataFrame(columns=[key_name, 'sheets_involved', 'sheet_list'])
+        
+        # sort=False keeps first-appearance order of values and sheets
+        grouped = pd.concat(pairs, ignore_index=True).groupby(key_name, sort=False)['sheet']
+        return pd.DataFrame({
+            'sheets_involved': grouped.size(),
+            'sheet_list': grouped.agg(', '.join)
+        }).reset_index()
+    
     def create_relationships(self):
         """Link related records between incidents, audits, and corrective actions"""
         print("\nCreating relationships between records...")
         
-        # Create master relationship table
-        relationships = []
+        edge_blocks = []
         
         # 1. Extract corrective action references from incidents
         if 'Incident' in self.enriched_data:
             incident_df = self.enriched_data['Incident']
-            for idx, row in incident_df.iterrows():
-                incident_id = row.get('incident_id')
-                if pd.notna(incident_id):
-                    # Look for corrective actions
-                    corrective_actions = row.get('corrective_actions', '')
-                    if pd.notna(corrective_actions):
-                        # Extract action IDs (format: AC-XXX-YYYYMMDD-NNN)
-                        action_ids = re.findall(r'AC-[A-Z]+-\d{8}-\d{3}', str(corrective_actions))
-                        for action_id in action_ids:
-                            relationships.append({
-                                'source_type': 'Incident',
-                                'source_id': incident_id,
-                                'target_type': 'Corrective_Action',
-                                'target_id': action_id,
-                                'relationship_type': 'generates'
-                            })
+            if 'incident_id' in incident_df.columns and 'corrective_actions' in incident_df.columns:
+                mask = incident_df['incident_id'].notna() & incident_df['corrective_actions'].notna()
+                # Extract action IDs (format: AC-XXX-YYYYMMDD-NNN); one row per match
+                matches = incident_df.loc[mask, 'corrective_actions'].astype(str).str.extractall(
+                    r'(AC-[A-Z]+-\d{8}-\d{3})'
+                )[0]
+                row_idx = matches.index.get_level_values(0)
+                edge_blocks.append(self._edges(
+                    incident_df.loc[row_idx, 'incident_id'], matches,
+                    'Incident', 'Corrective_Action', 'generates'
+                ))
         
         # 2. Link audit findings to parent audits
         if 'Audit' in self.enriched_data and 'Audit Findings' in self.enriched_data:
-            audit_df = self.enriched_data['Audit']
-            findings_df = self.enriched_data['Audit Findings']
-            
-            for idx, finding in findings_df.iterrows():
-                audit_id = finding.get('audit_id')
-                if pd.notna(audit_id):
-                    relationships.append({
-                        'source_type': 'Audit',
-                        'source_id': audit_id,
-                        'target_type': 'Audit_Finding',
-                        'target_id': f"{audit_id}_Finding_{idx}",
-                        'relationship_type': 'contains'
-                    })
-        
-        # 3. Link inspections to findings
+            edge_blocks.append(self._finding_edges(
+                self.enriched_data['Audit Findings'], 'Audit', 'Audit_Finding', 'contains'
+            ))
+        
+        # 3. Link inspections to findings (Inspection uses same ID field)
         if 'Inspection' in self.enriched_data and 'Inspection Findings' in self.enriched_data:
-            inspection_df = self.enriched_data['Inspection']
-            findings_df = self.enriched_data['Inspection Findings']
-            
-            for idx, finding in findings_df.iterrows():
-                audit_id = finding.get('audit_id')  # Inspection uses same ID field
-                if pd.notna(audit_id):
-                    relationships.append({
-                        'source_type': 'Inspection',
-                        'source_id': audit_id,
-                        'target_type': 'Inspection_Finding',
-                        'target_id': f"{audit_id}_Finding_{idx}",
-                        'relationship_type': 'identifies'
-                    })
-        
-        # 4. Create location-based relationships
-        location_groups = {}
-        for sheet_name, df in self.enriched_data.items():
-            location_cols = [col for col in df.columns if 'location' in col.lower()]
-            if location_cols:
-                location_col = location_cols[0]  # Use first location column found
-                try:
-                    for location in df[location_col].dropna().unique():
-                        if location not in location_groups:
-                            location_groups[location] = []
-                        location_groups[location].append(sheet_name)
-                except (AttributeError, KeyError):
-                    continue
+            edge_blocks.append(self._finding_edges(
+                self.enriched_data['Inspection Findings'], 'Inspection', 'Inspection_Finding', 'identifies'
+            ))
         
-        # 5. Create department-based relationships
-        dept_groups = {}
-        for sheet_name, df in self.enriched_data.items():
-            dept_cols = [col for col in df.columns if 'department' in col.lower()]
-            if dept_cols:
-                dept_col = dept_cols[0]  # Use first department column found
-                try:
-                    for dept in df[dept_col].dropna().unique():
-                        if dept not in dept_groups:
-                            dept_groups[dept] = []
-                        dept_groups[dept].append(sheet_name)
-                except (AttributeError, KeyError):
-                    continue
+        # 4-5. Location- and department-based groupings
+        location_summary = self._group_sheets_by('location', 'location')
+        department_summary = self._group_sheets_by('department', 'department')
         
         # Store relationships
-        if relationships:
-            self.enriched_data['Relationships'] = pd.DataFrame(relationships)
+        edge_blocks = [block for block in edge_blocks if not block.empty]
+        if edge_blocks:
+            relationships = pd.concat(edge_blocks, ignore_index=True).astype(self.relationship_dtypes)
+            self.enriched_data['Relationships'] = relationships
             print(f"  Created {len(relationships)} relationship records")
         
         # Create summary tables
-        self.enriched_data['Location_Summary'] = pd.DataFrame([
-            {'location': loc, 'sheets_involved': len(sheets), 'sheet_list': ', '.join(sheets)}
-            for loc, sheets in location_groups.items()
-        ])
+        self.enriched_data['Location_Summary'] = location_summary
+        self.enriched_data['Department_Summary'] = department_summary
         
-        self.enriched_data['Department_Summary'] = pd.DataFrame([
-            {'department': dept, 'sheets_involved': len(sheets), 'sheet_list': ', '.join(sheets)}
-            for dept, sheets in dept_groups.items()
-        ])
-        
-        print(f"  Created location groups: {len(location_groups)}")
-        print(f"  Created department groups: {len(dept_groups)}")
+        print(f"  Created location groups: {len(location_summary)}")
+        print(f"  Created department groups: {len(department_summary)}")
     
     def generate_data_quality_report(self):
         """Generate comprehensive data quality report"""
@@ -446,15 +892,32 @@ class VEHSDataPipeline:
         
         return report
     
+    def apply_output_schema(self):
+        """Cast processed sheets to the dtypes declared in vehs_schema and report memory saved"""
+        self.schema_memory = vehs_schema.apply_schemas(self.enriched_data)
+        before = sum(m['before_mb'] for m in self.schema_memory.values())
+        after = sum(m['after_mb'] for m in self.schema_memory.values())
+        print(f"\nApplied sheet schemas: {before:.1f} MB -> {after:.1f} MB")
+    
+    def save_columnar_data(self, data_dir: str = data_store.DATA_DIR):
+        """Save all processed sheets as Parquet files plus a manifest (primary output)"""
+        print(f"\nSaving columnar data to: {data_dir}/")
+        manifest = data_store.write_sheets(self.enriched_data, data_dir, source=self.excel_file_path)
+        for entry in manifest['sheets']:
+            print(f"  Saved sheet: {entry['name']} -> {entry['file']} ({entry['rows']} rows, {entry['columns']} columns)")
+        print(f"Successfully saved {len(manifest['sheets'])} sheets with manifest")
+    
     def save_processed_data(self, output_path: str = None):
         """Save all processed data to Excel file"""
         if not output_path:
             base_name = os.path.splitext(self.excel_file_path)[0]
             output_path = f"{base_name}_processed.xlsx"
         
-        print(f"\nSaving processed data to: {output_path}")
+        # xlsxwriter is several times faster than openpyxl for large sheets
+        engine = 'xlsxwriter' if importlib.util.find_spec('xlsxwriter') is not None else 'openpyxl'
+        print(f"\nSaving processed data to: {output_path} (engine: {engine})")
         
-        with pd.ExcelWriter(output_path, engine='openpyxl', datetime_format='YYYY-MM-DD') as writer:
+        with pd.ExcelWriter(output_path, engine=engine, datetime_format='YYYY-MM-DD') as writer:
             for sheet_name, df in self.enriched_data.items():
                 # Truncate sheet name if too long for Excel
                 excel_sheet_name = sheet_name[:31] if len(sheet_name) > 31 else sheet_name
@@ -463,33 +926,121 @@ class VEHSDataPipeline:
         
         print(f"Successfully saved processed data with {len(self.enriched_data)} sheets")
     
-    def run_pipeline(self, output_path: str = None):
-        """Run the complete data pipeline"""
+    def start_excel_export(self, output_path: str = None) -> threading.Thread:
+        """Write the xlsx export in a background thread; join it with wait_for_excel_export"""
+        def export():
+            # Thread CPU time: process CPU would include the main thread's work
+            start, cpu_start = time.perf_counter(), time.thread_time()
+            self.save_processed_data(output_path)
+            profile = self.stage_profile.setdefault('save_processed_data', {})
+            self._accumulate(profile, {'wall_seconds': time.perf_counter() - start,
+                                       'cpu_seconds': time.thread_time() - cpu_start,
+                                       'rows': self._row_count(self.enriched_data)})
+            self.stage_timings['save_processed_data'] = profile['wall_seconds']
+        
+        self._excel_thread = threading.Thread(target=export, name='vehs-xlsx-export')
+        self._excel_thread.start()
+        return self._excel_thread
+    
+    def wait_for_excel_export(self):
+        """Block until a background xlsx export (if any) has finished"""
+        thread = getattr(self, '_excel_thread', None)
+        if thread is not None:
+            thread.join()
+            self._excel_thread = None
+    
+    def run_pipeline(self, output_path: str = None, chained: bool = False, workers: int = 1,
+                     data_dir: str = data_store.DATA_DIR, excel_output: bool = True,
+                     incremental: bool = False):
+        """Run the complete data pipeline
+        
+        The columnar dataset in data_dir is the primary output. When excel_output
+        is set, the xlsx export runs in a background thread alongside the quality
+        report and the columnar save, and is joined before this method returns.
+        
+        With chained=True, cleaning, standardization and enrichment run per
+        sheet via process_sheets_chained instead of as three whole-workbook passes.
+        With workers > 1, loading through enrichment runs per sheet in a process
+        pool (process_sheets_parallel) and takes precedence over chained.
+        With incremental=True, only records that changed since the last run in
+        data_dir are reprocessed (process_sheets_incremental); it cannot be
+        combined with workers > 1.
+        """
+        if workers > 1 and incremental:
+            raise ValueError("incremental runs are single-process; use workers=1")
         print("=" * 60)
         print("VEHS DATA CLEANING AND ENHANCEMENT PIPELINE")
         print("=" * 60)
         
+        run_start, run_cpu_start = time.perf_counter(), time.process_time()
+        mode = ('parallel' if workers > 1 else 'incremental' if incremental
+                else 'chained' if chained else 'batch')
         try:
-            # Step 1: Load data
-            self.load_data()
-            
-            # Step 2: Clean null values
-            self.clean_null_values()
+            if workers > 1:
+                # Steps 1-4 per sheet in worker processes
+                with self._timed_stage('process_sheets_parallel') as stage:
+                    self.process_sheets_parallel(workers)
+                    stage['rows'] = input_rows = self._row_count(self.enriched_data)
+            else:
+                # Step 1: Load data
+                with self._timed_stage('load_data') as stage:
+                    self.load_data()
+                    stage['rows'] = input_rows = self._row_count(self.raw_data)
+                with self._timed_stage('compute_fingerprints', input_rows):
+                    self.compute_fingerprints()
+                
+                if incremental:
+                    # Steps 2-4 only for new/changed records
+                    self.process_sheets_incremental(data_dir)
+                elif chained:
+                    # Steps 2-4 per sheet, releasing intermediates as they are consumed
+                    self.process_sheets_chained()
+                else:
+                    # Step 2: Clean null values
+                    with self._timed_stage('clean_null_values', input_rows):
+                        self.clean_null_values()
+                    
+                    # Step 3: Standardize formats
+                    with self._timed_stage('standardize_formats', input_rows):
+                        self.standardize_formats()
+                    
+                    # Step 4: Enrich data
+                    with self._timed_stage('enrich_data', input_rows):
+                        self.enrich_data()
             
-            # Step 3: Standardize formats
-            self.standardize_formats()
+            # Step 5: Create relationships
+            with self._timed_stage('create_relationships', self._row_count(self.enriched_data)):
+                self.create_relationships()
             
-            # Step 4: Enrich data
-            self.enrich_data()
+            output_rows = self._row_count(self.enriched_data)
+            # Step 5b: Compact dtypes (categoricals, dates, numerics) for the saved dataset
+            with self._timed_stage('apply_schema', output_rows):
+                self.apply_output_schema()
             
-            # Step 5: Create relationships
-            self.create_relationships()
+            # Step 6: Start the xlsx export; it only reads enriched_data, so it overlaps
+            # the quality report and the columnar save below
+            if excel_output:
+                self.start_excel_export(output_path)
             
-            # Step 6: Generate quality report
+            # Step 7: Generate quality report
             quality_report = self.generate_data_quality_report()
             
-            # Step 7: Save processed data
-            self.save_processed_data(output_path)
+            # Step 8: Save processed data (columnar is the primary output)
+            with self._timed_stage('save_columnar_data', output_rows):
+                self.save_columnar_data(data_dir)
+                data_store.write_fingerprints(self.row_fingerprints, data_dir)
+            self.run_profile = {
+                'mode': mode,
+                'rows': input_rows,
+                'wall_seconds': round(time.perf_counter() - run_start, 4),
+                'cpu_seconds': round(time.process_time() - run_cpu_start, 4),
+            }
+            # Timings and benchmark are taken once, after the export's own stage is recorded
+            self.wait_for_excel_export()
+            quality_report['stage_timings_seconds'] = dict(self.stage_timings)
+            quality_report['benchmark'] = self.benchmark_report()
+            if self.schema_memory:
+                quality_report['schema_memory_mb'] = dict(self.schema_memory)
             
             print("\n" + "=" * 60)
             print("PIPELINE COMPLETED SUCCESSFULLY!")
@@ -507,21 +1058,175 @@ class VEHSDataPipeline:
         except Exception as e:
             print(f"Pipeline failed with error: {e}")
             raise
+    
+    def benchmark_report(self) -> Dict:
+        """Profile of the last run in a stable layout that compare_benchmarks can diff across runs"""
+        return {
+            'format_version': BENCHMARK_FORMAT_VERSION,
+            'input': os.path.basename(self.excel_file_path),
+            **self.run_profile,
+            'profile_memory': self.profile_memory,
+            'process_peak_rss_mb': peak_rss_mb(),
+            'stages': {stage: dict(metrics) for stage, metrics in self.stage_profile.items()},
+            'sheets': {sheet: {stage: dict(metrics) for stage, metrics in stages.items()}
+                       for sheet, stages in self.sheet_profile.items()},
+        }
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process in MB (None where the resource module is unavailable)"""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in kilobytes on Linux and in bytes on macOS
+    return round(peak / (1024 ** 2 if sys.platform == 'darwin' else 1024), 1)
+
+
+def benchmarks_comparable(current: Dict, baseline: Optional[Dict]) -> bool:
+    """Runs are comparable when report format, processing mode and memory profiling match"""
+    return bool(baseline) and all(
+        baseline.get(key) == current.get(key) for key in ('format_version', 'mode', 'profile_memory')
+    )
+
+
+def compare_benchmarks(current: Dict, baseline: Dict, threshold: float = REGRESSION_THRESHOLD,
+                       min_seconds: float = 0.05) -> List[Dict]:
+    """Flag stages (overall and per sheet) that got slower than baseline by more than threshold.
+    
+    Throughput (rows/s) is compared when both runs recorded rows, so runs over
+    differently sized inputs stay comparable; otherwise wall time is compared.
+    Measurements shorter than min_seconds in both runs are ignored as noise, and
+    runs that are not benchmarks_comparable (e.g. tracemalloc was on in only one
+    of them) are not compared.
+    """
+    if not benchmarks_comparable(current, baseline):
+        return []
+    
+    pairs = [('all', stage, metrics, baseline.get('stages', {}).get(stage))
+             for stage, metrics in current.get('stages', {}).items()]
+    for sheet, stages in current.get('sheets', {}).items():
+        baseline_stages = baseline.get('sheets', {}).get(sheet, {})
+        pairs.extend((sheet, stage, metrics, baseline_stages.get(stage)) for stage, metrics in stages.items())
+    
+    regressions = []
+    for scope, stage, metrics, base in pairs:
+        if not base or max(metrics['wall_seconds'], base['wall_seconds']) < min_seconds:
+            continue
+        if metrics.get('rows_per_second') and base.get('rows_per_second'):
+            metric, slowdown = 'rows_per_second', base['rows_per_second'] / metrics['rows_per_second']
+        elif base['wall_seconds'] > 0:
+            metric, slowdown = 'wall_seconds', metrics['wall_seconds'] / base['wall_seconds']
+        else:
+            continue
+        if slowdown > 1 + threshold:
+            regressions.append({
+                'sheet': scope,
+                'stage': stage,
+                'metric': metric,
+                'baseline': base.get(metric),
+                'current': metrics.get(metric),
+                'slowdown': round(slowdown, 2),
+            })
+    return regressions
+
+
+def _process_sheet_worker(excel_file_path: str, sheet_name: str, parquet_path: str,
+                          profile_memory: bool = False) -> Tuple[str, str, Dict[str, Dict], Optional[pd.Series]]:
+    """Process-pool entry point: run stages 1-4 for one sheet and write it to Parquet.
+    
+    Returns the sheet's per-stage profile and record fingerprints (None without
+    a record key) alongside the Parquet path.
+    """
+    pipeline = VEHSDataPipeline(excel_file_path)
+    pipeline.copy_free = True  # the worker owns its frame; no defensive copies needed
+    pipeline.profile_memory = profile_memory
+    
+    with pipeline._timed_sheet(sheet_name, 'load_data') as metrics:
+        df = pd.read_excel(excel_file_path, sheet_name=sheet_name, engine=pipeline.excel_engine,
+                           dtype=pipeline.load_dtypes.get(sheet_name), parse_dates=False)
+        metrics['rows'] = len(df)
+    
+    # Fingerprint the raw rows before the stages take ownership of the frame
+    pipeline.raw_data = {sheet_name: df}
+    pipeline.compute_fingerprints()
+    pipeline.raw_data = {}
+    
+    with pipeline._copy_on_write():
+        for stage_name, stage in [('clean_null_values', pipeline._clean_sheet),
+                                  ('standardize_formats', pipeline._standardize_sheet),
+                                  ('enrich_data', pipeline._enrich_sheet)]:
+            with pipeline._timed_sheet(sheet_name, stage_name, len(df)):
+                df = stage(df)
+    
+    df.to_parquet(parquet_path)
+    return sheet_name, parquet_path, pipeline.sheet_profile[sheet_name], pipeline.row_fingerprints.get(sheet_name)
 
 
 def main():
     """Main function to run the pipeline"""
+    import argparse
+    parser = argparse.ArgumentParser(description="VEHS data cleaning and enhancement pipeline")
+    parser.add_argument('--chained', action='store_true',
+                        help="Process sheets as a copy-free per-sheet chain to reduce peak memory")
+    parser.add_argument('--profile-memory', action='store_true',
+                        help="Record tracemalloc peak memory per stage in the quality report")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Process sheets in a pool of N worker processes (requires pyarrow)")
+    parser.add_argument('--data-dir', default=data_store.DATA_DIR,
+                        help="Directory for the Parquet dataset and manifest (default: %(default)s)")
+    parser.add_argument('--no-excel', action='store_true',
+                        help="Skip the xlsx export and only write the columnar dataset")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Only reprocess records that are new or changed since the last run in --data-dir")
+    parser.add_argument('--input', default=RAW_INPUT_PATH,
+                        help="Raw VEHS export to process (default: %(default)s)")
+    parser.add_argument('--report', default="VEHS_Data_Quality_Report.json",
+                        help="Where to write the quality/benchmark report (default: %(default)s)")
+    parser.add_argument('--baseline',
+                        help="Report of an earlier run to check for regressions (default: the existing --report file)")
+    parser.add_argument('--regression-threshold', type=float, default=REGRESSION_THRESHOLD,
+                        help="Flag stages slower than the baseline by this fraction (default: %(default)s)")
+    args = parser.parse_args()
+    if args.workers > 1 and args.incremental:
+        parser.error("--incremental cannot be combined with --workers (incremental runs are single-process)")
+    
     # Configuration
-    excel_file_path = "EPCL VEHS Data (Mar23 - Mar24).xlsx"
-    output_path = "EPCL_VEHS_Data_Processed.xlsx"
+    excel_file_path = args.input
+    output_path = data_store.XLSX_PATH
+    report_path = args.report
+    
+    import json
+    baseline_path = args.baseline or report_path
+    baseline = None
+    if os.path.exists(baseline_path):
+        with open(baseline_path) as f:
+            baseline = json.load(f).get('benchmark')
     
     # Initialize and run pipeline
     pipeline = VEHSDataPipeline(excel_file_path)
-    quality_report = pipeline.run_pipeline(output_path)
+    pipeline.profile_memory = args.profile_memory
+    quality_report = pipeline.run_pipeline(output_path, chained=args.chained, workers=args.workers,
+                                           data_dir=args.data_dir, excel_output=not args.no_excel,
+                                           incremental=args.incremental)
+    
+    # Compare against the previous run
+    regressions = compare_benchmarks(quality_report['benchmark'], baseline, args.regression_threshold)
+    quality_report['regressions'] = regressions
+    if baseline is None:
+        print("\nNo baseline benchmark found; this run's profile will serve as the next baseline")
+    elif not benchmarks_comparable(quality_report['benchmark'], baseline):
+        print(f"\nBaseline in {baseline_path} used a different mode or profiling setting; not compared")
+    elif regressions:
+        print(f"\nPerformance regressions vs {baseline_path}:")
+        for r in regressions:
+            print(f"  {r['sheet']} / {r['stage']}: {r['slowdown']}x slower "
+                  f"({r['metric']} {r['baseline']} -> {r['current']})")
+    else:
+        print(f"\nNo performance regressions vs {baseline_path}")
     
     # Save quality report
-    report_path = "VEHS_Data_Quality_Report.json"
-    import json
     with open(report_path, 'w') as f:
         json.dump(quality_report, f, indent=2, default=str)
     
@@ -530,4 +1235,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
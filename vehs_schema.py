@@ -0,0 +1,117 @@
+"""
+Declared dtypes for the processed VEHS sheets.
+
+Low-cardinality text columns (location, department, status, ...) are stored as
+pandas categoricals, dates as datetime64 and derived scores as numeric, so
+every loader (vehs_pipeline.py, bot.py, build_index.py) works on the same
+compact representation. Column names are the standardized names produced by
+vehs_pipeline.py; columns missing from a sheet are skipped.
+"""
+from typing import Dict, List
+
+import pandas as pd
+
+# Shared by the Incident and Hazard ID sheets
+_EVENT_CATEGORICAL = [
+    "incident_type", "section", "status", "category", "company", "location", "sublocation",
+    "department", "sub_department", "dlevel_committee_number_epcl",
+]
+_EVENT_DATETIME = ["occurrence_date", "reported_date", "entered_date", "entered_review", "entered_closed"]
+_EVENT_NUMERIC = [
+    "severity_score", "reporting_delay_days", "estimated_cost_impact", "estimated_manhours_impact",
+    "risk_score", "department_avg_risk", "compliance_systems_involved",
+]
+
+# Shared by the Audit/Inspection sheets and their findings
+_AUDIT_CATEGORICAL = [
+    "audit_location", "audit_status", "audit_category", "auditing_body", "audit_rating", "company",
+    "location", "audit_type_epcl", "template", "template_version", "checklist_category",
+    "finding_location", "worst_case_consequence",
+]
+_AUDIT_DATETIME = [
+    "start_date", "entered_scheduled", "entered_in_progress", "entered_review",
+    "entered_pending_action_plan", "entered_review_action_plan", "entered_pending_closure", "entered_closed",
+]
+_INSPECTION_ACTION_CATEGORICAL = ["action_item_priority", "action_item_status", "action_item_effective"]
+
+SHEET_SCHEMAS: Dict[str, Dict[str, List[str]]] = {
+    "Incident": {
+        "categorical": _EVENT_CATEGORICAL + [
+            "repeated_incident", "relationship_of_person_involved", "type_of_equipment_failure",
+            "is_the_equipment_safety_critical", "pse_category", "hse_site_rules_category",
+            "relevant_consequence_incident", "worst_case_consequence_incident", "actual_consequence_incident",
+            "investigation_type", "management_system_noncompliance",
+        ],
+        "datetime": _EVENT_DATETIME + [
+            "date_shift_began", "target_completion_date", "completion_date",
+            "entered_investigation", "entered_pending_closure",
+        ],
+        "numeric": _EVENT_NUMERIC + ["resolution_time_days"],
+    },
+    "Hazard ID": {
+        "categorical": _EVENT_CATEGORICAL + [
+            "repeated_event", "relevant_consequence_hazard_id",
+            "worst_case_consequence_potential_hazard_id", "violation_type_hazard_id",
+        ],
+        "datetime": _EVENT_DATETIME,
+        "numeric": _EVENT_NUMERIC,
+    },
+    "Audit": {
+        "categorical": _AUDIT_CATEGORICAL + ["response"],
+        "datetime": _AUDIT_DATETIME,
+        "numeric": ["compliance_systems_involved"],
+    },
+    "Audit Findings": {
+        "categorical": _AUDIT_CATEGORICAL,
+        "datetime": _AUDIT_DATETIME,
+        "numeric": ["compliance_systems_involved"],
+    },
+    "Inspection": {
+        "categorical": _AUDIT_CATEGORICAL + _INSPECTION_ACTION_CATEGORICAL + ["response"],
+        "datetime": _AUDIT_DATETIME + ["action_item_due_date"],
+        "numeric": ["compliance_systems_involved"],
+    },
+    "Inspection Findings": {
+        "categorical": _AUDIT_CATEGORICAL + _INSPECTION_ACTION_CATEGORICAL,
+        "datetime": _AUDIT_DATETIME + ["action_item_due_date"],
+        "numeric": ["compliance_systems_involved"],
+    },
+    "Relationships": {
+        "categorical": ["source_type", "target_type", "relationship_type"],
+        "datetime": [],
+        "numeric": [],
+    },
+}
+
+
+def memory_mb(df: pd.DataFrame) -> float:
+    return round(float(df.memory_usage(deep=True).sum()) / 1024 ** 2, 2)
+
+
+def apply_schema(sheet_name: str, df: pd.DataFrame) -> pd.DataFrame:
+    """Cast the declared columns of one sheet in place; unknown sheets are returned unchanged."""
+    schema = SHEET_SCHEMAS.get(sheet_name)
+    if schema is None:
+        return df
+    for col in schema["datetime"]:
+        if col in df.columns and not pd.api.types.is_datetime64_any_dtype(df[col]):
+            df[col] = pd.to_datetime(df[col], errors="coerce")
+    for col in schema["numeric"]:
+        if col in df.columns and not pd.api.types.is_numeric_dtype(df[col]):
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+    for col in schema["categorical"]:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype("category")
+    return df
+
+
+def apply_schemas(sheets: Dict[str, pd.DataFrame]) -> Dict[str, Dict[str, float]]:
+    """Apply SHEET_SCHEMAS to every sheet in place; returns before/after memory (MB) per sheet."""
+    report: Dict[str, Dict[str, float]] = {}
+    for name, df in sheets.items():
+        if name not in SHEET_SCHEMAS:
+            continue
+        before = memory_mb(df)
+        sheets[name] = apply_schema(name, df)
+        report[name] = {"before_mb": before, "after_mb": memory_mb(sheets[name])}
+    return report